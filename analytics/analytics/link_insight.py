@@ -55,28 +55,26 @@ def compute_link_foliage(
         reverse_link_metrics: Dict = {}
         if network_tx_power_stats is None or network_rssi_stats is None:
             continue
+        # Index the RSSI series by link to pair them with the TX power series
+        rssi_index = {
+            (rssi["link_name"], rssi["link_direction"]): rssi
+            for rssi in network_rssi_stats
+        }
         for tx_power_per_link in network_tx_power_stats:
-            rssi_per_link = filter(
-                lambda x: x["link_name"] == tx_power_per_link["link_name"],
-                network_rssi_stats,
-            )
-            for rssi in rssi_per_link:
-                if (
-                    rssi["link_direction"] == "Z"
-                    and tx_power_per_link["link_direction"] == "A"
-                ):
-                    path_loss = calculate_path_loss(
-                        tx_power_per_link["values"], rssi["values"]
-                    )
-                    forward_link_metrics[tx_power_per_link["link_name"]] = path_loss
-                if (
-                    rssi["link_direction"] == "A"
-                    and tx_power_per_link["link_direction"] == "Z"
-                ):
-                    path_loss = calculate_path_loss(
-                        tx_power_per_link["values"], rssi["values"]
-                    )
-                    reverse_link_metrics[tx_power_per_link["link_name"]] = path_loss
+            link_name = tx_power_per_link["link_name"]
+            if tx_power_per_link["link_direction"] == "A":
+                # A transmits, Z receives
+                link_metrics, rx_direction = forward_link_metrics, "Z"
+            elif tx_power_per_link["link_direction"] == "Z":
+                link_metrics, rx_direction = reverse_link_metrics, "A"
+            else:
+                continue
+
+            rssi = rssi_index.get((link_name, rx_direction))
+            if rssi is not None:
+                link_metrics[link_name] = calculate_path_loss(
+                    tx_power_per_link["values"], rssi["values"]
+                )
 
         for link_name, forward_link_path_loss in forward_link_metrics.items():
             reverse_link_path_loss: Optional[Dict] = reverse_link_metrics.get(link_name)
@@ -109,28 +107,32 @@ def calculate_path_loss(tx_power: List, rssi: List) -> Dict:
     """Calculate pathloss using TX tx_power and RX rssi for synced timestamps.
 
     tx_power and rssi values could be sampled at different timestamps. Calculate
-    pathloss only for those timestamps that have both the stat values.
+    pathloss only for those timestamps that have both the stat values. Both series
+    must be sorted by timestamp, as returned by Prometheus.
     """
-    pathloss: Dict = {}
-    i, j = 0, 0
-    while i < len(tx_power) and j < len(rssi):
-        tx_power_time, tx_power_index = tx_power[i]
-        rssi_time, rx_rssi = rssi[j]
-        if tx_power_time > rssi_time:
-            j += 1
-            continue
-        if tx_power_time < rssi_time:
-            i += 1
-            continue
-        i += 1
-        j += 1
-        power_dBm = HardwareConfig.TXPOWERIDX_TO_TXPOWER["default_channel"][
-            "default_mcs"
-        ].get(int(tx_power_index))
-        if power_dBm is None:
-            continue
-        pathloss[tx_power_time] = power_dBm - int(rx_rssi)
-    return pathloss
+    if not tx_power or not rssi:
+        return {}
+
+    tx_power_times, tx_power_indices = (
+        np.array(column, dtype=np.float64) for column in zip(*tx_power)
+    )
+    rssi_times, rx_rssi = (np.array(column, dtype=np.float64) for column in zip(*rssi))
+
+    # Align the samples by timestamp
+    positions = np.searchsorted(rssi_times, tx_power_times)
+    positions[positions == len(rssi_times)] = 0
+    synced = rssi_times[positions] == tx_power_times
+
+    lookup_table = HardwareConfig.TXPOWER_LUT["default_channel"]["default_mcs"]
+    tx_power_indices = np.trunc(tx_power_indices[synced]).astype(np.int64)
+    power_dBm = np.full(len(tx_power_indices), np.nan)
+    known = (tx_power_indices >= 0) & (tx_power_indices < len(lookup_table))
+    power_dBm[known] = lookup_table[tx_power_indices[known]]
+    pathloss = power_dBm - np.trunc(rx_rssi[positions[synced]])
+
+    # Skip the unknown tx power indices
+    valid = ~np.isnan(pathloss)
+    return dict(zip(tx_power_times[synced][valid].tolist(), pathloss[valid].tolist()))
 
 
 def compute_single_link_foliage_factor(
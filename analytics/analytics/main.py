@@ -5,92 +5,67 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-import asyncio
-import dataclasses
 import json
 import logging
 import sys
-import time
-from typing import Any, Dict, NoReturn
+from typing import Any, Dict, Iterator, Tuple
 
 from tglib import init
 from tglib.clients import APIServiceClient, PrometheusClient
+from tglib.exceptions import RestartRequiredError
+from tglib.utils.reload import Changes, on_config_change
+from tglib.utils.scheduler import Scheduler, job_options
 
 from . import jobs
 from .utils.hardware_config import HardwareConfig
 
 
-@dataclasses.dataclass
-class Job:
-    """Struct for representing pipeline job configurations."""
+async def run_job(start_time: float, name: str, params: Dict[str, Any]) -> None:
+    """Run a pipeline job with its start time in milliseconds."""
+    function = getattr(jobs, name)
+    await function(int(round(start_time * 1e3)), **params)
 
-    name: str
-    start_time_ms: int
-    params: Dict
 
-
-async def produce(
-    queue: asyncio.Queue, name: str, pipeline: Dict[str, Any]
-) -> NoReturn:
-    """Add jobs from the pipeline configuration to the shared queue."""
-    while True:
-        start_time = time.time()
-
-        tasks = [
-            queue.put(
-                Job(
-                    name=job["name"],
-                    start_time_ms=int(round(start_time * 1e3)),
-                    params=job.get("params", {}),
-                )
-            )
-            for job in pipeline.get("jobs", [])
-            if job.get("enabled", False)
-        ]
-
-        # Add the jobs to the queue
-        await asyncio.gather(*tasks)
-
-        # Sleep until next invocation period
-        sleep_time = start_time + pipeline["period_s"] - time.time()
-
-        logging.info(
-            f"Done enqueuing jobs in '{name}'. "
-            f"Added {len(tasks)} job(s) to the queue. Sleeping for {sleep_time:0.2f}s"
-        )
-
-        await asyncio.sleep(sleep_time)
-
-
-async def consume(queue: asyncio.Queue) -> NoReturn:
-    """Consume and run a job from the shared queue."""
-    while True:
-        # Wait for a job from the producers
-        job = await queue.get()
-        logging.info(f"Starting the '{job.name}' job")
-
-        # Execute the job
-        function = getattr(jobs, job.name)
-        await function(job.start_time_ms, **job.params)
-        logging.info(f"Finished running the '{job.name}' job")
+def enabled_jobs(config: Dict[str, Any]) -> Iterator[Tuple[Dict, Dict]]:
+    """Yield the pipeline and job configurations of the enabled jobs."""
+    for pipeline in config["pipelines"].values():
+        for job in pipeline.get("jobs", []):
+            if job.get("enabled", False):
+                yield pipeline, job
 
 
 async def async_main(config: Dict[str, Any]) -> None:
     logging.info("#### Starting the 'analytics' service ####")
     logging.debug(f"service config: {config}")
 
-    q: asyncio.Queue = asyncio.Queue()
+    scheduler = Scheduler(config["max_concurrent_jobs"])
+    for pipeline, job in enabled_jobs(config):
+        scheduler.add_job(
+            job["name"],
+            run_job,
+            pipeline["period_s"],
+            params={"name": job["name"], "params": job.get("params", {})},
+            **job_options(pipeline),
+        )
 
-    # Create producer coroutines
-    producers = [
-        produce(q, name, pipeline) for name, pipeline in config["pipelines"].items()
-    ]
+    async def reschedule_jobs(new_config: Dict[str, Any], changes: Changes) -> None:
+        """Apply new periods, options and params of the running jobs live."""
+        new_jobs = list(enabled_jobs(new_config))
+        if [job["name"] for _, job in new_jobs] != [job.name for job in scheduler.jobs]:
+            raise RestartRequiredError("Enabling or disabling jobs needs a restart")
+
+        for pipeline, job in new_jobs:
+            scheduler.update_job(
+                job["name"],
+                pipeline["period_s"],
+                params={"name": job["name"], "params": job.get("params", {})},
+                **job_options(pipeline),
+            )
 
-    # Create consumer coroutines
-    consumers = [consume(q) for _ in range(config["num_consumers"])]
+    on_config_change(reschedule_jobs, "pipelines")
 
-    # Start the producer and consumer coroutines
-    await asyncio.gather(*producers, *consumers)
+    # Run the enabled jobs of every pipeline
+    await scheduler.run()
 
 
 def main() -> None:
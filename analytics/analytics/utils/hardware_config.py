@@ -7,10 +7,14 @@
 
 from typing import Dict, Tuple
 
+import numpy as np
+
 
 class HardwareConfig:
     # txPowerIdx to txPower map
     TXPOWERIDX_TO_TXPOWER: Dict[str, Dict[str, Dict[int, int]]]
+    # txPowerIdx to txPower lookup tables, NaN for the unknown indices
+    TXPOWER_LUT: Dict[str, Dict[str, np.ndarray]]
     # Map of beam index to tuple of beam angle, elevation and tile
     BEAM_IDX_TO_TILE_ELE_ANGLE: Dict[int, Tuple[str, str, float]]
 
@@ -26,9 +30,20 @@ class HardwareConfig:
                     tx_power_idx_to_tx_power[channel][mcs][int(tx_power_idx)] = tx_power
 
         cls.TXPOWERIDX_TO_TXPOWER = tx_power_idx_to_tx_power
+        cls.TXPOWER_LUT = {
+            channel: {mcs: to_lookup_table(tx_data) for mcs, tx_data in info.items()}
+            for channel, info in tx_power_idx_to_tx_power.items()
+        }
         cls.BEAM_IDX_TO_TILE_ELE_ANGLE = {
             int(beam_idx): (tile, elevation, beam_angle)
             for tile, tile_data in hardware_config["beam_idx_to_beam_angle"].items()
             for elevation, elevation_data in tile_data.items()
             for beam_idx, beam_angle in elevation_data.items()
         }
+
+
+def to_lookup_table(mapping: Dict[int, int]) -> np.ndarray:
+    """Convert a map of non-negative indices to an array, with NaN for the gaps."""
+    table = np.full(max(mapping, default=-1) + 1, np.nan)
+    table[list(mapping)] = list(mapping.values())
+    return table
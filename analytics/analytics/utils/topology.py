@@ -42,9 +42,7 @@ async def fetch_network_info() -> List[NetworkInfo]:
     """
 
     api_client = APIServiceClient(timeout=1)
-    results = await api_client.request_all(
-        endpoint="getTopology", return_exceptions=True
-    )
+    results = await api_client.get_topologies(return_exceptions=True)
 
     networks = []
     for name, topo in results.items():
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Microbenchmarks for the :mod:`analytics.link_insight` computations.
+
+Run with ``pytest benchmarks/link_insight_benchmarks.py`` (requires
+``pytest-benchmark``) and compare against a saved baseline with
+``--benchmark-compare``.
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pytest
+from analytics.link_insight import calculate_path_loss, compute_link_foliage
+from analytics.utils.hardware_config import HardwareConfig
+from tglib.testing import generate_topology
+
+
+# The find_link_foliage defaults: an hour of samples every 30 seconds
+QUERY_INTERVAL_S = 3600
+STEP_S = 30
+
+
+def make_series(
+    name: str, link_name: str, direction: str, values: np.ndarray
+) -> Dict[str, Any]:
+    """Build a ``query_range`` result series of a link end."""
+    return {
+        "metric": {
+            "__name__": name,
+            "linkName": link_name,
+            "linkDirection": direction,
+            "nodeName": f"{link_name}-{direction}",
+        },
+        "values": [
+            [1600000000 + i * STEP_S, str(value)] for i, value in enumerate(values)
+        ],
+    }
+
+
+def make_prom_results(num_links: int = 10000, seed: int = 0) -> Dict[str, List]:
+    """Build the tx_power and RSSI results of both ends of ``num_links`` links."""
+    rng = np.random.default_rng(seed)
+    topology = generate_topology(
+        num_sites=int(num_links * 0.6), num_links=num_links, seed=seed
+    )
+    num_samples = QUERY_INTERVAL_S // STEP_S + 1
+
+    prom_results: Dict[str, List] = {"tx_power": [], "rssi": []}
+    for link in topology["links"]:
+        for direction in ("A", "Z"):
+            prom_results["tx_power"].append(
+                make_series(
+                    "tx_power",
+                    link["name"],
+                    direction,
+                    rng.integers(0, 32, num_samples),
+                )
+            )
+            prom_results["rssi"].append(
+                make_series(
+                    "rssi", link["name"], direction, rng.integers(-70, -40, num_samples)
+                )
+            )
+
+    # Prometheus returns the series sorted by labels, not paired by link
+    for results in prom_results.values():
+        rng.shuffle(results)
+    return prom_results
+
+
+@pytest.fixture(scope="module", autouse=True)
+def hardware_config() -> None:
+    HardwareConfig.set_config(
+        {
+            "tx_power_idx_to_tx_power": {
+                "default_channel": {"default_mcs": {str(i): i - 10 for i in range(32)}}
+            },
+            "beam_idx_to_beam_angle": {},
+        }
+    )
+
+
+@pytest.fixture(scope="module")
+def prom_results() -> Dict[str, List]:
+    return make_prom_results()
+
+
+def test_calculate_path_loss(benchmark: Any, prom_results: Dict[str, List]) -> None:
+    tx_power = prom_results["tx_power"][0]["values"]
+    rssi = prom_results["rssi"][0]["values"]
+    benchmark(calculate_path_loss, tx_power, rssi)
+
+
+def test_compute_link_foliage(
+    benchmark: Any, monkeypatch: Any, prom_results: Dict[str, List]
+) -> None:
+    written: List = []
+    monkeypatch.setattr(
+        "analytics.link_insight.PrometheusClient.write_metrics", written.extend
+    )
+    benchmark.pedantic(
+        compute_link_foliage,
+        args=([("network", prom_results)], 5, 20, 0.0, QUERY_INTERVAL_S),
+        rounds=3,
+    )
+    assert len(written) == 3 * 10000
@@ -7,9 +7,12 @@
 
 import json
 import unittest
+from unittest.mock import patch
 
+import numpy as np
 from analytics.link_insight import (
     calculate_path_loss,
+    compute_link_foliage,
     compute_single_link_foliage_factor,
 )
 from analytics.utils.hardware_config import HardwareConfig
@@ -30,6 +33,55 @@ class LinkInsightTests(unittest.TestCase):
                 [(2, "-62"), (5, "-62"), (6, "-62")],
             ),
         )
+        # Unknown and invalid tx power indices are skipped
+        self.assertEqual(
+            {1: 99, 4: 100},
+            calculate_path_loss(
+                [(1, "20"), (2, "-1"), (3, "40"), (4, "20.5"), (5, "NaN"), (9, "20")],
+                [(1, "-60"), (2, "-61"), (3, "-62"), (4, "-61.5"), (5, "-60")],
+            ),
+        )
+
+    def test_tx_power_lookup_table(self) -> None:
+        lookup_table = HardwareConfig.TXPOWER_LUT["default_channel"]["default_mcs"]
+        self.assertEqual(len(lookup_table), 21)
+        self.assertEqual(lookup_table[20], 39)
+        self.assertTrue(np.isnan(lookup_table[:20]).all())
+
+    @patch("analytics.link_insight.PrometheusClient.write_metrics")
+    def test_compute_link_foliage(self, write_metrics) -> None:
+        def series(name, link_name, direction, values):
+            return {
+                "metric": {
+                    "__name__": name,
+                    "linkName": link_name,
+                    "linkDirection": direction,
+                    "nodeName": f"{link_name}-{direction}",
+                },
+                "values": [[t, str(value)] for t, value in enumerate(values)],
+            }
+
+        rssi = [-60, -62, -65, -61, -60, -63]
+        tx_power = ["20"] * len(rssi)
+        prom_results = {
+            "tx_power": [
+                series("tx_power", "link-a-b", "A", tx_power),
+                series("tx_power", "link-a-b", "Z", tx_power),
+                series("tx_power", "link-c-d", "A", tx_power),
+            ],
+            "rssi": [
+                series("rssi", "link-c-d", "Z", rssi),
+                series("rssi", "link-a-b", "A", [x - 1 for x in rssi]),
+                series("rssi", "link-a-b", "Z", rssi),
+            ],
+        }
+        compute_link_foliage([("network", prom_results)], 2, 3, 0.0, 300)
+
+        # link-c-d has no reverse path loss
+        metrics = write_metrics.call_args[0][0]
+        self.assertEqual(len(metrics), 1)
+        self.assertEqual(metrics[0].labels["linkName"], "link-a-b")
+        self.assertEqual(metrics[0].value, 1.385)
 
     def test_compute_single_link_foliage_factor(self) -> None:
         forward_link_path_loss = {
@@ -14,14 +14,10 @@ from copy import deepcopy
 from typing import Dict, Optional, List, Iterable
 
 import numpy as np
-from sklearn.covariance import EllipticEnvelope
-from sklearn.exceptions import NotFittedError
-from sklearn.impute import KNNImputer
-from sklearn.neighbors import LocalOutlierFactor
-from sklearn.preprocessing import MinMaxScaler
 from tglib.clients import APIServiceClient
 from tglib.clients.prometheus_client import consts, PrometheusClient, PrometheusMetric
 from tglib.exceptions import ClientRuntimeError
+from tglib.utils.process_pool import run_cpu_bound
 
 
 async def ad_single_metric_job(
@@ -42,50 +38,36 @@ async def ad_single_metric_job(
         f"Running anomaly detection job for {metric} from {start_time} to {end_time}"
     )
 
-    # Divide time into max_prom_samples chunks because only max_prom_samples
-    # can be read at one time
-    max_prom_samples = 11000
-    num_iterations = math.ceil(num_samples / max_prom_samples)
-
-    time_steps = [
-        [
-            start_time + i * max_prom_samples * step_s + step_s,
-            start_time + (i + 1) * max_prom_samples * step_s,
-        ]
-        for i in range(num_iterations)
-    ]
-    time_steps[-1][1] = end_time
-
     network_names = APIServiceClient.network_names()
     prom_client = PrometheusClient(timeout=15)
-    network_reps = []
     coros = []
 
+    # PrometheusClient splits ranges that exceed the server's resolution limit
     for network_name in network_names:
         labels = {
             consts.network: network_name,
             consts.data_interval_s: str(step_s),
         }
         query = [prom_client.format_query(metric, labels)]
-        for query_start_time, query_end_time in time_steps:
-            coros.append(
-                fetch_metrics_from_queries(
-                    prom_client,
-                    network_name,
-                    query,
-                    query_start_time,
-                    query_end_time,
-                    step_s,
-                )
+        coros.append(
+            fetch_metrics_from_queries(
+                prom_client,
+                network_name,
+                query,
+                start_time + step_s,
+                end_time,
+                step_s,
             )
-            network_reps.append(network_name)
+        )
 
     # Load link metric data for all networks
-    network_stats = zip(network_reps, await asyncio.gather(*coros))
+    network_stats = zip(network_names, await asyncio.gather(*coros))
 
-    # Reshape data and run AD
+    # Reshape data and run AD in the process pool since fitting the models is slow
     label_val_map = gather_data(network_stats, start_time, end_time, step_s)
-    stats_to_write = analyze_data(label_val_map, metric, end_time, step_s, period_s)
+    stats_to_write = await run_cpu_bound(
+        analyze_data, label_val_map, metric, end_time, step_s, period_s
+    )
 
     # Write AD samples back to Prometheus every step_s with a time delay
     num_write = math.ceil(period_s / step_s)
@@ -154,7 +136,12 @@ def gather_data(
                     val_array[int((int(timestamp) - start_time) / step - 1)] = int(
                         metric_value
                     )
-    return label_val_map
+
+    # Convert to plain dictionaries, the nested defaultdicts cannot be pickled
+    return {
+        network: {link_name: dict(depth2) for link_name, depth2 in depth1.items()}
+        for network, depth1 in label_val_map.items()
+    }
 
 
 def analyze_data(
@@ -171,7 +158,6 @@ def analyze_data(
     for network, depth1 in label_val_map.items():
         for link_name, depth2 in depth1.items():
             for link_dir, val_array in depth2.items():
-
                 labels = {
                     consts.network: network,
                     consts.link_name: link_name,
@@ -181,7 +167,6 @@ def analyze_data(
 
                 outliers = run_ad(val_array)
                 for model, pred in outliers.items():
-
                     labels_model = deepcopy(labels)
                     labels_model["model"] = model
                     for i in range(-num_write, 0):
@@ -199,6 +184,13 @@ def analyze_data(
 
 def run_ad(train: List[float]) -> Dict[str, List]:
     """This function runs two AD algorithms on the input data."""
+    # scikit-learn is only needed by the process pool workers, keep it out of the
+    # service process
+    from sklearn.covariance import EllipticEnvelope
+    from sklearn.impute import KNNImputer
+    from sklearn.neighbors import LocalOutlierFactor
+    from sklearn.preprocessing import MinMaxScaler
+
     contamination = 0.001
     anomaly_algorithms = [
         ("RobustCovariance", EllipticEnvelope(contamination=contamination)),
@@ -6,31 +6,21 @@
 # LICENSE file in the root directory of this source tree.
 
 import asyncio
-import dataclasses
 import json
 import logging
 import sys
-import time
-from typing import Any, Dict, List, NoReturn, Optional
+from typing import Any, Dict, List, Optional
 
 from tglib import init
 from tglib.clients import APIServiceClient, MySQLClient, PrometheusClient
 from tglib.exceptions import ClientRuntimeError
 from tglib.utils.dict import deep_update
+from tglib.utils.scheduler import Scheduler, job_options
 
 from . import jobs
 from .routes import routes
 
 
-@dataclasses.dataclass
-class Job:
-    """Struct for representing pipeline job configurations."""
-
-    name: str
-    start_time_ms: int
-    params: Dict
-
-
 async def prepare(
     network_name: str, topology: Dict[str, Any]
 ) -> Optional[Dict[str, Dict[str, List[List[str]]]]]:
@@ -66,89 +56,60 @@ async def prepare(
     return default_routes
 
 
-async def produce(
-    queue: asyncio.Queue, name: str, pipeline: Dict[str, Any]
-) -> NoReturn:
-    """Add jobs from the pipeline configuration to the shared queue."""
-    # Restrict pipeline frequency to reduce load on E2E
-    if pipeline["period"] < 60:
-        raise ValueError("Pipeline's 'period' cannot be less than 60 seconds")
-
+async def run_pipeline(start_time: float, pipeline_jobs: List[Dict[str, Any]]) -> None:
+    """Fetch the latest topologies and default routes and run the pipeline jobs."""
     client = APIServiceClient(timeout=1)
-    while True:
-        start_time = time.time()
-        network_info = {}
-
-        coros = []
-        topologies = await client.request_all("getTopology", return_exceptions=True)
-        for network_name, topology in topologies.items():
-            if isinstance(topology, ClientRuntimeError):
-                logging.error(f"Failed to fetch topology for {network_name}")
-                continue
-            network_info[network_name] = topology
-            coros.append(prepare(network_name, topology))
-
-        for network_name, default_routes in zip(
-            network_info, await asyncio.gather(*coros)
-        ):
-            if default_routes is not None:
-                network_info[network_name].update(default_routes)
-
-        tasks = [
-            queue.put(
-                Job(
-                    name=job["name"],
-                    start_time_ms=int(round(start_time * 1e3)),
-                    params={**job.get("params", {}), "network_info": network_info},
-                )
-            )
-            for job in pipeline.get("jobs", [])
-            if job.get("enabled", False)
-        ]
-
-        # Add jobs to the queue
-        await asyncio.gather(*tasks)
-
-        # Sleep until next invocation time
-        sleep_time = start_time + pipeline["period"] - time.time()
-
-        logging.info(
-            f"Done enqueuing jobs in '{name}'. "
-            f"Added {len(tasks)} job(s) to the queue. Sleeping for {sleep_time:0.2f}s"
+    network_info = {}
+
+    coros = []
+    topologies = await client.request_all("getTopology", return_exceptions=True)
+    for network_name, topology in topologies.items():
+        if isinstance(topology, ClientRuntimeError):
+            logging.error(f"Failed to fetch topology for {network_name}")
+            continue
+        network_info[network_name] = topology
+        coros.append(prepare(network_name, topology))
+
+    for network_name, default_routes in zip(network_info, await asyncio.gather(*coros)):
+        if default_routes is not None:
+            network_info[network_name].update(default_routes)
+
+    start_time_ms = int(round(start_time * 1e3))
+    coros = [
+        getattr(jobs, job["name"])(
+            start_time_ms, **job.get("params", {}), network_info=network_info
         )
-        await asyncio.sleep(sleep_time)
-
-
-async def consume(queue: asyncio.Queue) -> NoReturn:
-    """Consume and run a job from the shared queue."""
-    while True:
-        # Wait for a job from the producers
-        job = await queue.get()
-        logging.info(f"Starting the {job.name} job")
+        for job in pipeline_jobs
+    ]
 
-        # Execute the job
-        function = getattr(jobs, job.name)
-        await function(job.start_time_ms, **job.params)
-        logging.info(f"Finished running the {job.name} job")
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    for job, result in zip(pipeline_jobs, results):
+        if isinstance(result, Exception):
+            logging.error(f"The {job['name']} job failed", exc_info=result)
 
 
 async def async_main(config: Dict[str, Any]) -> None:
-    """Start producer and consumer coroutines."""
+    """Schedule the pipelines."""
     logging.info("#### Starting the 'default_routes_service' ####")
     logging.debug(f"service config: {config}")
 
-    q: asyncio.Queue = asyncio.Queue()
-
-    # Create producer coroutines
-    producers = [
-        produce(q, name, pipeline) for name, pipeline in config["pipelines"].items()
-    ]
-
-    # Create consumer coroutines
-    consumers = [consume(q) for _ in range(config["num_consumers"])]
+    scheduler = Scheduler(config["max_concurrent_jobs"])
+    for name, pipeline in config["pipelines"].items():
+        # Restrict pipeline frequency to reduce load on E2E
+        if pipeline["period"] < 60:
+            raise ValueError("Pipeline's 'period' cannot be less than 60 seconds")
+
+        pipeline_jobs = [job for job in pipeline.get("jobs", []) if job.get("enabled")]
+        scheduler.add_job(
+            name,
+            run_pipeline,
+            pipeline["period"],
+            params={"pipeline_jobs": pipeline_jobs},
+            **job_options(pipeline),
+        )
 
-    # Start the producer and consumer coroutines
-    await asyncio.gather(*producers, *consumers)
+    # Run every pipeline on its own period
+    await scheduler.run()
 
 
 def main() -> None:
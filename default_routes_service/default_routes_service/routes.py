@@ -12,6 +12,7 @@ from functools import partial
 from typing import Any, DefaultDict, List, Tuple
 
 from aiohttp import web
+from aiomysql.sa.result import RowProxy
 from sqlalchemy import func, select, tuple_
 from tglib.clients import APIServiceClient, MySQLClient
 
@@ -29,6 +30,10 @@ def custom_serializer(obj: Any) -> str:
         return str(obj)
 
 
+def encode_row(row: RowProxy) -> bytes:
+    return json.dumps(dict(row), default=custom_serializer).encode()
+
+
 def parse_input_params(request: web.Request) -> Tuple[str, datetime, datetime]:
     network_name = request.rel_url.query.get("network_name")
     start_dt = request.rel_url.query.get("start_dt")
@@ -193,7 +198,7 @@ async def handle_get_default_routes_history(request: web.Request) -> web.Respons
 
 
 @routes.get("/routes/cn_routes")
-async def handle_get_cn_routes(request: web.Request) -> web.Response:
+async def handle_get_cn_routes(request: web.Request) -> web.StreamResponse:
     """
     ---
     description: Fetch CN default routes history for links.
@@ -253,9 +258,28 @@ async def handle_get_cn_routes(request: web.Request) -> web.Response:
     if link_name is not None:
         query = query.where(CnEgressRoutesHistory.link_name == link_name)
 
-    async with MySQLClient().lease() as conn:
-        cursor = await conn.execute(query)
-        return web.json_response(
-            {"routes": [dict(row) for row in await cursor.fetchall()]},
-            dumps=partial(json.dumps, default=custom_serializer),
-        )
+    # Stream the rows straight into the response to bound memory usage. Run the
+    # query before sending the headers so that its errors get a proper status.
+    rows = MySQLClient().stream(query)
+    try:
+        row = await rows.__anext__()
+    except StopAsyncIteration:
+        return web.json_response({"routes": []})
+
+    response = web.StreamResponse(headers={"Content-Type": "application/json"})
+    try:
+        await response.prepare(request)
+        await response.write(b'{"routes": [' + encode_row(row))
+        async for row in rows:
+            await response.write(b", " + encode_row(row))
+    except Exception:
+        # Drop the connection rather than end a partial document successfully
+        if request.transport is not None:
+            request.transport.abort()
+        raise
+    finally:
+        await rows.aclose()
+
+    await response.write(b"]}")
+    await response.write_eof()
+    return response
@@ -106,6 +106,4 @@ async def generate_network_health_labels(time_s: int, interval_s: int) -> None:
     # Write stats health to db
     if not to_db:
         return None
-    async with MySQLClient().lease() as sa_conn:
-        await sa_conn.execute(insert(NetworkStatsHealth).values(to_db))
-        await sa_conn.connection.commit()
+    await MySQLClient().bulk_insert(NetworkStatsHealth, to_db)
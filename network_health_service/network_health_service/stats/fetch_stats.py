@@ -11,7 +11,7 @@ import logging
 import math
 from datetime import datetime
 from os import environ
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import aiohttp
 from tglib.clients.prometheus_client import PrometheusClient, consts, ops
@@ -205,31 +205,46 @@ def get_node_queries(network_name: str, interval_s: int) -> Dict[str, str]:
     return queries
 
 
+async def query_latest_each(
+    client: PrometheusClient, queries: Dict[str, str], time_s: int
+) -> Dict[str, List[Dict]]:
+    """Fetch the latest datum of each query separately, skipping the failed ones."""
+    responses = {}
+    for key, response in zip(
+        queries,
+        await asyncio.gather(
+            *[client.query_latest(query, time_s) for query in queries.values()],
+            return_exceptions=True,
+        ),
+    ):
+        if isinstance(response, ClientRuntimeError) or response["status"] != "success":
+            logging.error(f"Prometheus - Failed to fetch {key} data: {response}")
+            continue
+
+        responses[key] = response["data"]["result"]
+
+    return responses
+
+
 async def fetch_prometheus_stats(
     network_name: str, time_s: int, interval_s: int, link_stats: Dict, node_stats: Dict
 ) -> None:
     """Fetch metrics for all links of the network from Prometheus."""
     client = PrometheusClient(timeout=60)
-    coros = []
-    metrics = []
     link_queries = get_link_queries(network_name, interval_s)
     node_queries = get_node_queries(network_name, interval_s)
 
-    for metric, query in {**link_queries, **node_queries}.items():
-        metrics.append(metric)
-        coros.append(client.query_latest(query, time_s))
-
-    for metric, response in zip(
-        metrics, await asyncio.gather(*coros, return_exceptions=True)
-    ):
-        if isinstance(response, ClientRuntimeError) or response["status"] != "success":
-            logging.error(
-                f"Prometheus - Failed to fetch {metric} data "
-                f"for {network_name}: {response}"
-            )
-            continue
-
-        results = response["data"]["result"]
+    queries = {**link_queries, **node_queries}
+    try:
+        responses = await client.query_latest_many(queries, time_s)
+    except ClientRuntimeError as err:
+        # Don't lose every metric to one bad query, fetch them one by one instead
+        logging.warning(
+            f"Prometheus - Failed to batch fetch data for {network_name}: {err}"
+        )
+        responses = await query_latest_each(client, queries, time_s)
+
+    for metric, results in responses.items():
         if not results:
             logging.warning(
                 f"Prometheus - Found no {metric} results for {network_name}"
@@ -31,110 +31,96 @@ class FetchStatsTests(asynctest.TestCase):
             )
 
     @asynctest.patch(
-        "tglib.clients.prometheus_client.PrometheusClient.query_latest",
-        return_value={"status": "success", "data": {"result": []}},
+        "tglib.clients.prometheus_client.PrometheusClient.query_latest_many",
+        return_value={},
     )
-    async def test_fetch_prometheus_stats_no_results(self, mock_query_latest) -> None:
+    async def test_fetch_prometheus_stats_no_results(
+        self, mock_query_latest_many
+    ) -> None:
         link_stats = {"network_A": defaultdict()}
         node_stats = {"network_A": defaultdict()}
         await fetch_prometheus_stats("network_A", 0, 3600, link_stats, node_stats)
         self.assertDictEqual(link_stats, {"network_A": defaultdict()})
         self.assertDictEqual(node_stats, {"network_A": defaultdict()})
 
+    @asynctest.patch(
+        "tglib.clients.prometheus_client.PrometheusClient.query_latest_many",
+        side_effect=ClientRuntimeError(),
+    )
     @asynctest.patch(
         "tglib.clients.prometheus_client.PrometheusClient.query_latest",
-        side_effect=[
-            {
-                "metric": "analytics_alignment_status",
-                "status": "success",
-                "data": {"result": [{"metric": {"linkName": "link"}, "value": (0, 0)}]},
-            },
-            {
-                "metric": "topology_link_is_online",
-                "status": "success",
-                "data": {"result": [{"metric": {"linkName": "link"}, "value": (0, 1)}]},
-            },
-            {
-                "metric": "tx_byte",
-                "status": "success",
-                "data": {"result": [{"metric": {"linkName": "link"}, "value": (0, 2)}]},
-            },
-            {
-                "metric": "analytics_foliage_factor",
-                "status": "success",
-                "data": {"result": [{"metric": {"linkName": "link"}, "value": (0, 3)}]},
-            },
-            {
-                "metric": "drs_cn_egress_routes_count",
-                "status": "success",
-                "data": {"result": [{"metric": {"linkName": "link"}, "value": (0, 4)}]},
-            },
-            {
-                "metric": "tx_ok",
-                "status": "success",
-                "data": {"result": [{"metric": {"linkName": "link"}, "value": (0, 5)}]},
-            },
-            {
-                "metric": "link_avail",
-                "status": "success",
-                "data": {"result": [{"metric": {"linkName": "link"}, "value": (0, 6)}]},
-            },
-            {
-                "metric": "mcs",
-                "status": "success",
-                "data": {"result": [{"metric": {"linkName": "link"}, "value": (0, 7)}]},
-            },
-            {
-                "metric": "mcs_diff",
-                "status": "success",
-                "data": {"result": [{"metric": {"linkName": "link"}, "value": (0, 8)}]},
-            },
-            {
-                "metric": "tx_power_diff",
-                "status": "success",
-                "data": {
-                    "result": [
-                        {"metric": {"linkName": "link"}, "value": (0, 9)},
-                        {"metric": {}, "value": (0, 9.5)},
-                    ]
-                },
-            },
-            {
-                "metric": "analytics_cn_power_status",
-                "status": "success",
-                "data": {
-                    "result": [{"metric": {"nodeName": "node"}, "value": (0, 10)}]
-                },
-            },
-            {
-                "metric": "topology_node_is_online",
-                "status": "success",
-                "data": {
-                    "result": [{"metric": {"nodeName": "node"}, "value": (0, 11)}]
-                },
-            },
-            {
-                "metric": "drs_default_routes_changed",
-                "status": "success",
-                "data": {
-                    "result": [
-                        {"metric": {"nodeName": "node"}, "value": (0, 12)},
-                        {"metric": {}, "value": (0, 12.5)},
-                    ]
-                },
-            },
-            {"metric": "udp_pinger_loss_ratio", "status": "failed"},
-            ClientRuntimeError(),
-            {
-                "metric": "drs_min_route_mcs",
-                "status": "success",
-                "data": {
-                    "result": [{"metric": {"nodeName": "node"}, "value": (0, 12)}]
-                },
-            },
-        ],
+        side_effect=ClientRuntimeError(),
+    )
+    async def test_fetch_prometheus_stats_error(
+        self, mock_query_latest, mock_query_latest_many
+    ) -> None:
+        link_stats = {"network_A": defaultdict()}
+        node_stats = {"network_A": defaultdict()}
+        await fetch_prometheus_stats("network_A", 0, 3600, link_stats, node_stats)
+        self.assertDictEqual(link_stats, {"network_A": defaultdict()})
+
+    @asynctest.patch(
+        "tglib.clients.prometheus_client.PrometheusClient.query_latest_many",
+        side_effect=ClientRuntimeError(),
+    )
+    @asynctest.patch("tglib.clients.prometheus_client.PrometheusClient.query_latest")
+    async def test_fetch_prometheus_stats_fallback(
+        self, mock_query_latest, mock_query_latest_many
+    ) -> None:
+        async def query_latest(query: str, time: int) -> dict:
+            if "analytics_alignment_status" not in query:
+                raise ClientRuntimeError()
+            result = [{"metric": {"linkName": "link"}, "value": (0, 0)}]
+            return {"status": "success", "data": {"result": result}}
+
+        # The failed batch is fetched query by query, keeping the successful ones
+        mock_query_latest.side_effect = query_latest
+        link_stats = {"network_A": defaultdict(dict)}
+        node_stats = {"network_A": defaultdict(dict)}
+        await fetch_prometheus_stats("network_A", 0, 3600, link_stats, node_stats)
+        self.assertDictEqual(
+            link_stats["network_A"], {"link": {"analytics_alignment_status": 0.0}}
+        )
+
+    @asynctest.patch(
+        "tglib.clients.prometheus_client.PrometheusClient.query_latest_many",
+        return_value={
+            "analytics_alignment_status": [
+                {"metric": {"linkName": "link"}, "value": (0, 0)}
+            ],
+            "topology_link_is_online": [
+                {"metric": {"linkName": "link"}, "value": (0, 1)}
+            ],
+            "tx_byte": [{"metric": {"linkName": "link"}, "value": (0, 2)}],
+            "analytics_foliage_factor": [
+                {"metric": {"linkName": "link"}, "value": (0, 3)}
+            ],
+            "drs_cn_egress_routes_count": [
+                {"metric": {"linkName": "link"}, "value": (0, 4)}
+            ],
+            "tx_ok": [{"metric": {"linkName": "link"}, "value": (0, 5)}],
+            "link_avail": [{"metric": {"linkName": "link"}, "value": (0, 6)}],
+            "mcs": [{"metric": {"linkName": "link"}, "value": (0, 7)}],
+            "mcs_diff": [{"metric": {"linkName": "link"}, "value": (0, 8)}],
+            "tx_power_diff": [
+                {"metric": {"linkName": "link"}, "value": (0, 9)},
+                {"metric": {}, "value": (0, 9.5)},
+            ],
+            "analytics_cn_power_status": [
+                {"metric": {"nodeName": "node"}, "value": (0, 10)}
+            ],
+            "topology_node_is_online": [
+                {"metric": {"nodeName": "node"}, "value": (0, 11)}
+            ],
+            "drs_default_routes_changed": [
+                {"metric": {"nodeName": "node"}, "value": (0, 12)},
+                {"metric": {}, "value": (0, 12.5)},
+            ],
+            "udp_pinger_loss_ratio": [],
+            "min_route_mcs": [{"metric": {"nodeName": "node"}, "value": (0, 12)}],
+        },
     )
-    async def test_fetch_prometheus_stats_results(self, mock_query_latest) -> None:
+    async def test_fetch_prometheus_stats_results(self, mock_query_latest_many) -> None:
         link_stats = {"network_A": defaultdict(lambda: defaultdict())}
         node_stats = {"network_A": defaultdict(lambda: defaultdict())}
         await fetch_prometheus_stats("network_A", 0, 3600, link_stats, node_stats)
@@ -5,12 +5,12 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-import asyncio
 import json
 import logging
 import sys
 from typing import Any, Dict
 
+from aiokafka import ConsumerRecord
 from tglib import init
 from tglib.clients import APIServiceClient, KafkaConsumer, MySQLClient, PrometheusClient
 
@@ -24,12 +24,13 @@ async def async_main(config: Dict[str, Any]) -> None:
         Scheduler.timeout = config["processing_timeout_s"]
     await Scheduler.restart()
 
-    # Poll test result topics for completed sessions
-    consumer = KafkaConsumer().consumer
-    consumer.subscribe(config["topics"])
+    async def handle(msg: ConsumerRecord) -> None:
+        await Scheduler.process_msg(msg.value.decode("utf-8"))
 
-    async for msg in consumer:
-        asyncio.create_task(Scheduler.process_msg(msg.value.decode("utf-8")))
+    # Poll test result topics for completed sessions with bounded concurrency
+    consumer = KafkaConsumer()
+    consumer.consumer.subscribe(config["topics"])
+    await consumer.consume(handle, config.get("max_in_flight", 10))
 
 
 def main() -> None:
@@ -97,20 +97,15 @@ async def fetch_link_stats(
     """Fetch link stats for a given link during the specified session time."""
     client = PrometheusClient(timeout=1)
     start = int(round(start_dt.timestamp()))
-    coros = []
+    queries: Dict[str, str] = {}
     for metric in INSTANT_METRICS:
-        coros.append(
-            client.query_latest(
-                create_query(
-                    metric,
-                    network_name,
-                    link_name,
-                    src_node_mac,
-                    dst_node_mac,
-                    session_duration,
-                ),
-                time=start + session_duration,
-            )
+        queries[metric.key or metric.name] = create_query(
+            metric,
+            network_name,
+            link_name,
+            src_node_mac,
+            dst_node_mac,
+            session_duration,
         )
 
     labels: Dict[str, Any] = {
@@ -132,42 +127,45 @@ async def fetch_link_stats(
     mcs_with_traffic = (
         f"((({ops.delta(la_tpc_no_traffic, '1s')} <= bool 31) * {mcs}) > 0)"
     )
+    queries["mcs_with_traffic_count"] = ops.count_over_time(
+        mcs_with_traffic, f"{session_duration}s:1s"
+    )
+    queries["mcs_p10"] = ops.quantile_over_time(
+        mcs_with_traffic, f"{session_duration}s:1s", 0.1
+    )
 
-    CUSTOM_METRICS = [LinkMetric("mcs_with_traffic_count"), LinkMetric("mcs_p10")]
-    coros += [
-        # mcs_with_traffic_count
-        client.query_latest(
-            ops.count_over_time(mcs_with_traffic, f"{session_duration}s:1s"),
-            time=start + session_duration,
-        ),
-        # mcs_p10
-        client.query_latest(
-            ops.quantile_over_time(mcs_with_traffic, f"{session_duration}s:1s", 0.1),
-            time=start + session_duration,
-        ),
-    ]
+    # Fetch all of the metrics with a single request, which evaluates every query
+    # and so gets a longer timeout. If it fails, fetch the metrics one by one so
+    # that a single bad query doesn't drop all of the stats.
+    time = start + session_duration
+    try:
+        results = await PrometheusClient(timeout=5).query_latest_many(queries, time)
+    except ClientRuntimeError:
+        logging.warning(f"Failed to batch fetch link stats for {link_name}")
+        results = {}
+        for key, response in zip(
+            queries,
+            await asyncio.gather(
+                *[client.query_latest(query, time) for query in queries.values()],
+                return_exceptions=True,
+            ),
+        ):
+            if (
+                isinstance(response, ClientRuntimeError)
+                or response["status"] != "success"
+            ):
+                logging.error(f"Failed to fetch {key} data for {link_name}")
+                continue
+
+            results[key] = response["data"]["result"]
 
     values: Dict[str, Any] = {}
-    for metric, response in zip(
-        INSTANT_METRICS + CUSTOM_METRICS,
-        await asyncio.gather(*coros, return_exceptions=True),
-    ):
-        if isinstance(response, ClientRuntimeError) or response["status"] != "success":
-            logging.error(f"Failed to fetch {metric.name} data for {link_name}")
-            continue
-
-        result = response["data"]["result"]
+    for key, result in results.items():
         if not result:
-            logging.debug(f"Found no {metric.name} results for {link_name}")
+            logging.debug(f"Found no {key} results for {link_name}")
             continue
 
-        key = metric.key or metric.name
-        if "value" in result[0]:
-            # Instant metric
-            values[key] = float(result[0]["value"][1])
-        elif "values" in result[0]:
-            # Range metric
-            values[key] = [float(value[1]) for value in result[0]["values"]]
+        values[key] = float(result[0]["value"][1])
 
     rx_packet_count: Optional[float] = None
     rx_per: Optional[float] = None
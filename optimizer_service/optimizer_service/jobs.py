@@ -11,9 +11,9 @@ from typing import Dict, List, Optional
 
 from tglib.clients import APIServiceClient
 from tglib.exceptions import ClientRuntimeError
+from tglib.utils.process_pool import run_cpu_bound
 
 from .optimizations.auto_remediation import run_auto_remediation
-from .optimizations.config_operations import process_cut_edges, run_tideal_optimization
 
 
 async def cut_edge_finder(
@@ -29,9 +29,12 @@ async def cut_edge_finder(
     Find all the edges that cut off one or more CNs and change link flap backoff and
     link impairment detection configs on them
     """
+    # networkx and cvxpy are slow to import, so defer them to the first job run
+    from .optimizations.config_operations import process_cut_edges
+
     logging.info("Fetching topologies for all networks from API service")
     client = APIServiceClient(timeout=2)
-    topologies = await client.request_all("getTopology", return_exceptions=True)
+    topologies = await client.get_topologies(return_exceptions=True)
     for network_name, topology in list(topologies.items()):
         if isinstance(topology, ClientRuntimeError):
             logging.error(f"Failed to fetch topology for {network_name}")
@@ -54,16 +57,21 @@ async def configure_tideals(
     wired_capacity_mbps: int,
 ) -> None:
     """Run tideal optimization for each topology and apply optimized tideal configs."""
+    from .optimizations.config_operations import run_tideal_optimization
+
     client = APIServiceClient(timeout=2)
-    topologies = await client.request_all("getTopology", return_exceptions=True)
+    topologies = await client.get_topologies(return_exceptions=True)
     coroutines = []
     for network_name, topology in list(topologies.items()):
         if isinstance(topology, ClientRuntimeError):
             logging.error(f"Failed to fetch topology for {network_name}")
             del topologies[network_name]
             continue
-        overrides_all = run_tideal_optimization(
-            topology, wireless_capacity_mbps, wired_capacity_mbps
+        overrides_all = await run_cpu_bound(
+            run_tideal_optimization,
+            topology,
+            wireless_capacity_mbps,
+            wired_capacity_mbps,
         )
         if overrides_all is None:
             del topologies[network_name]
@@ -99,8 +107,8 @@ async def configure_auto_remediation(
     max_num_of_backup_links -- maximum number of backup links you want to add
     """
     logging.info("Starting analysis and addition of backup links")
-    topologies = await APIServiceClient(timeout=2).request_all(
-        "getTopology", return_exceptions=True
+    topologies = await APIServiceClient(timeout=2).get_topologies(
+        return_exceptions=True
     )
     coros: List = []
     for network_name, topology in list(topologies.items()):
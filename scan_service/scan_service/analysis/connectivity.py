@@ -244,3 +244,23 @@ def analyze_connectivity(
         f"other nodes over scans from last {n_days} days."
     )
     return current_connectivity_data + n_days_connectivity_data
+
+
+def analyze_connectivity_in_worker(
+    hardware_config: Dict,
+    site_names: Dict[str, str],
+    im_data: Optional[Dict],
+    n_days: int,
+    target: int = 15,
+) -> Optional[List[Dict]]:
+    """Analyze connectivity in a process pool worker.
+
+    The hardware config and the topology site names are only set up in the service
+    process, so they are passed along and installed before the analysis.
+    """
+    if HardwareConfig.CONFIG != hardware_config:
+        HardwareConfig.set_config(hardware_config)
+    if im_data is not None:
+        Topology.wlan_mac_to_site_name[im_data["network_name"]] = site_names
+
+    return analyze_connectivity(im_data, n_days, target)
@@ -14,11 +14,13 @@ from pathlib import Path
 from typing import List
 from uuid import uuid4
 
+from aiokafka import ConsumerRecord
 from terragraph_thrift.Event.ttypes import EventId
 from tglib import init
 from tglib.clients import APIServiceClient, KafkaConsumer, MySQLClient, PrometheusClient
+from tglib.utils.process_pool import run_cpu_bound
 
-from .analysis.connectivity import analyze_connectivity
+from .analysis.connectivity import analyze_connectivity_in_worker
 from .analysis.interference import analyze_interference
 from .models import ScanTestStatus
 from .routes import routes
@@ -78,8 +80,13 @@ async def scan_results_handler(
         network_name,
         token,
         scan_results={"results_path": str(filepath), **parse_scan_results(scan_result)},
-        connectivity_results=analyze_connectivity(
-            im_data, n_days, target=min_connectivity_snr
+        connectivity_results=await run_cpu_bound(
+            analyze_connectivity_in_worker,
+            HardwareConfig.CONFIG,
+            Topology.wlan_mac_to_site_name.get(network_name, {}),
+            im_data,
+            n_days,
+            target=min_connectivity_snr,
         ),
         interference_results=await analyze_interference(
             im_data, network_name, n_days, use_real_links
@@ -125,8 +132,10 @@ async def events_handler(value: str) -> None:
         Severity.INFO,
     )
 
-    await asyncio.sleep(Scheduler.CLEAN_UP_DELAY_S)
-    del Scheduler.executions[execution_id]
+    # Clean up later without holding on to a consumer handler slot
+    asyncio.get_event_loop().call_later(
+        Scheduler.CLEAN_UP_DELAY_S, Scheduler.executions.pop, execution_id, None
+    )
 
 
 async def async_main(
@@ -137,6 +146,7 @@ async def async_main(
     min_connectivity_snr: int,
     discard_on_tx_incomplete: bool,
     enable_alerts: bool,
+    max_in_flight: int,
 ) -> None:
     """Consume and store scan data, and perform analysis when scans are complete."""
 
@@ -147,24 +157,24 @@ async def async_main(
         Scheduler.restart(), Topology.update_topologies(), Alerts.init(enable_alerts)
     )
 
-    consumer = KafkaConsumer().consumer
-    consumer.subscribe(topics)
-
-    async for msg in consumer:
+    async def handle(msg: ConsumerRecord) -> None:
         value = msg.value.decode("utf-8")
         if msg.topic == "scan_results":
-            asyncio.create_task(
-                scan_results_handler(
-                    value,
-                    scan_results_dir,
-                    n_days,
-                    use_real_links,
-                    min_connectivity_snr,
-                    discard_on_tx_incomplete,
-                )
+            await scan_results_handler(
+                value,
+                scan_results_dir,
+                n_days,
+                use_real_links,
+                min_connectivity_snr,
+                discard_on_tx_incomplete,
             )
         elif msg.topic == "events":
-            asyncio.create_task(events_handler(value))
+            await events_handler(value)
+
+    # Bound the number of concurrently handled messages during bursts
+    consumer = KafkaConsumer()
+    consumer.consumer.subscribe(topics)
+    await consumer.consume(handle, max_in_flight)
 
 
 def main() -> None:
@@ -184,6 +194,7 @@ def main() -> None:
         min_connectivity_snr = config["min_connectivity_snr"]
         discard_on_tx_incomplete = config["discard_on_tx_incomplete"]
         enable_alerts = config["enable_alerts"]
+        max_in_flight = config.get("max_in_flight", 10)
     except (json.JSONDecodeError, OSError, KeyError):
         logging.exception("Failed to parse configuration file.")
         sys.exit(1)
@@ -197,6 +208,7 @@ def main() -> None:
             min_connectivity_snr,
             discard_on_tx_incomplete,
             enable_alerts,
+            max_in_flight,
         ),
         {APIServiceClient, KafkaConsumer, MySQLClient, PrometheusClient},
         routes,
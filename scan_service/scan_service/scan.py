@@ -11,7 +11,7 @@ from datetime import datetime
 from math import cos, fabs, pi, sqrt
 from typing import Any, Dict, List, Optional, Set
 
-from sqlalchemy import insert, update
+from sqlalchemy import update
 from tglib.clients import APIServiceClient, MySQLClient
 from tglib.exceptions import ClientRuntimeError
 
@@ -144,8 +144,7 @@ class ScanTest:
                         "token": token,
                     }
                 )
-            query = insert(ScanResults).values(values)
-            await sa_conn.execute(query)
+            await MySQLClient().bulk_insert(ScanResults, values, sa_conn=sa_conn)
             await sa_conn.connection.commit()
             self.token_count = len(self.token_range)
 
@@ -8,7 +8,7 @@
 from datetime import datetime, timedelta
 from typing import Any, Dict, Iterable, List, Optional
 
-from sqlalchemy import insert, select, update
+from sqlalchemy import select, update
 from sqlalchemy.ext.declarative import DeclarativeMeta
 from tglib.clients import MySQLClient
 
@@ -50,20 +50,21 @@ async def write_results(
     aggregated_rx_responses: Optional[List[Dict]],
 ) -> None:
     """Write results to the database"""
-    async with MySQLClient().lease() as conn:
+    client = MySQLClient()
+    async with client.lease() as conn:
 
         async def insert_results(table: DeclarativeMeta, results: List[Dict]) -> None:
-            await conn.execute(
-                insert(table).values(
-                    [
-                        {
-                            "execution_id": execution_id,
-                            "network_name": network_name,
-                            **result,
-                        }
-                        for result in results
-                    ]
-                )
+            await client.bulk_insert(
+                table,
+                [
+                    {
+                        "execution_id": execution_id,
+                        "network_name": network_name,
+                        **result,
+                    }
+                    for result in results
+                ],
+                sa_conn=conn,
             )
 
         await conn.execute(
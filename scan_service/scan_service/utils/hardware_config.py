@@ -11,6 +11,8 @@ from bidict import bidict
 
 
 class HardwareConfig:
+    # The raw hardware config, to set up the process pool workers with
+    CONFIG: Dict = {}
     # Beam order
     BEAM_ORDER: Dict[str, Dict[str, List]]
     # txPowerIdx to txPower map
@@ -63,6 +65,7 @@ class HardwareConfig:
                 ]
 
         constants = hardware_config["constants"]
+        cls.CONFIG = hardware_config
         cls.BEAM_ORDER = beam_order
         cls.TXPOWERIDX_TO_TXPOWER = tx_power_idx_to_tx_power
         cls.BORESIDE_BW_IDX = constants["BORESIDE_BW_IDX"]
@@ -14,6 +14,7 @@ import numpy as np
 from bidict import bidict
 from scan_service.analysis.connectivity import (
     analyze_connectivity,
+    analyze_connectivity_in_worker,
     convert_order_to_beams,
     find_routes_all,
     find_routes_compute,
@@ -23,6 +24,8 @@ from scan_service.analysis.connectivity import (
 )
 from scan_service.utils.hardware_config import HardwareConfig
 from scan_service.utils.topology import Topology
+from tglib.utils import process_pool
+from tglib.utils.process_pool import run_cpu_bound
 
 
 class ConnectivityTests(asynctest.TestCase):
@@ -247,6 +250,40 @@ class ConnectivityTests(asynctest.TestCase):
     def test_analyze_connectivity_empty(self) -> None:
         self.assertEqual(analyze_connectivity(None, 30, 10), None)
 
+    async def test_analyze_connectivity_in_worker(self) -> None:
+        Topology.wlan_mac_to_site_name["network_A"] = {
+            "00:00:00:00:00:00": "site_A",
+            "00:00:00:00:00:01": "site_A",
+        }
+        responses = {"00:00:00:00:00:01": {"10_0": {"snr_avg": 11}}}
+        im_data = {
+            "network_name": "network_A",
+            "group_id": 5,
+            "token": 10,
+            "type": 2,
+            "mode": 1,
+            "tx_node": "00:00:00:00:00:00",
+            "current_avg_rx_responses": responses,
+            "n_day_avg_rx_responses": responses,
+        }
+
+        # The worker only knows the hardware config and sites it is passed
+        await process_pool.start({"process_pool": {"max_workers": 1}})
+        try:
+            result = await run_cpu_bound(
+                analyze_connectivity_in_worker,
+                HardwareConfig.CONFIG,
+                Topology.wlan_mac_to_site_name["network_A"],
+                im_data,
+                30,
+                10,
+            )
+        finally:
+            await process_pool.stop()
+
+        # The radios are on the same site
+        self.assertEqual(result, [])
+
     def test_process_connectivity_results_empty(self) -> None:
         connectivity_results = []
         self.assertDictEqual(process_connectivity_results(connectivity_results), {})
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Microbenchmarks for the :mod:`tglib.utils.thrift` conversions.
+
+Run with ``pytest benchmarks/thrift_benchmarks.py`` (requires ``pytest-benchmark``)
+and compare against a saved baseline with ``--benchmark-compare``.
+"""
+
+import json
+from typing import Any, Callable
+
+import pytest
+from terragraph_thrift.Controller.ttypes import (
+    MicroRoute,
+    RouteInfo,
+    ScanData,
+    ScanResp,
+    ScanResult,
+)
+from terragraph_thrift.Topology.ttypes import Link, Node, Site, Topology
+from thrift.protocol import TBinaryProtocol, TJSONProtocol
+from thrift.transport import TTransport
+from tglib.utils.thrift import (
+    binary2thrift,
+    json2thrift,
+    thrift2binary,
+    thrift2dict,
+    thrift2json,
+)
+
+
+def make_scan_result(n_responders: int = 16, n_routes: int = 64) -> ScanResult:
+    """Build an IM scan result with ``n_responders`` responses of ``n_routes`` each."""
+    responses = {}
+    for i in range(n_responders):
+        route_info_list = [
+            RouteInfo(
+                route=MicroRoute(tx=j % 64, rx=j // 64),
+                rssi=-60.5,
+                snrEst=12.25,
+                postSnr=10.0,
+                rxStart=j,
+                packetIdx=0,
+                sweepIdx=0,
+            )
+            for j in range(n_routes)
+        ]
+        responses[f"node-{i}"] = ScanResp(
+            token=1, curSuperframeNum=123456789, routeInfoList=route_info_list
+        )
+
+    data = ScanData(responses=responses, txNode="node-0", startBwgdIdx=1, respId=1)
+    return ScanResult(token=1, data=data)
+
+
+def make_topology(n_sites: int = 256) -> Topology:
+    """Build a topology of ``n_sites`` sites with two nodes and one link each."""
+    topology = Topology(name="topology", nodes=[], links=[], sites=[])
+    for i in range(n_sites):
+        topology.sites.append(Site(name=f"site-{i}"))
+        for j in range(2):
+            topology.nodes.append(
+                Node(
+                    name=f"node-{i}-{j}",
+                    mac_addr=f"00:00:00:00:{i % 256:02x}:{j:02x}",
+                    site_name=f"site-{i}",
+                    wlan_mac_addrs=[],
+                )
+            )
+        topology.links.append(
+            Link(
+                name=f"link-node-{i}-0-node-{i}-1",
+                a_node_name=f"node-{i}-0",
+                z_node_name=f"node-{i}-1",
+                is_alive=True,
+            )
+        )
+
+    return topology
+
+
+def simple_json_loads(thrift_obj: Any) -> Any:
+    """Convert to a dictionary by round tripping through ``TSimpleJSONProtocol``."""
+    transport = TTransport.TMemoryBuffer()
+    thrift_obj.write(TJSONProtocol.TSimpleJSONProtocol(transport))
+    return json.loads(transport.getvalue())
+
+
+def pure_thrift2binary(thrift_obj: Any) -> bytes:
+    """Serialize with the pure-Python binary protocol, for comparison."""
+    transport = TTransport.TMemoryBuffer()
+    thrift_obj.write(TBinaryProtocol.TBinaryProtocol(transport))
+    value: bytes = transport.getvalue()
+    return value
+
+
+@pytest.fixture(params=[make_scan_result, make_topology], ids=["scan", "topology"])
+def payload(request: Any) -> Any:
+    factory: Callable = request.param
+    return factory()
+
+
+def test_thrift2binary(benchmark: Any, payload: Any) -> None:
+    benchmark(thrift2binary, payload)
+
+
+def test_thrift2binary_pure(benchmark: Any, payload: Any) -> None:
+    benchmark(pure_thrift2binary, payload)
+
+
+def test_binary2thrift(benchmark: Any, payload: Any) -> None:
+    serialized = thrift2binary(payload)
+    assert benchmark(binary2thrift, type(payload), serialized) == payload
+
+
+def test_thrift2json(benchmark: Any, payload: Any) -> None:
+    benchmark(thrift2json, payload)
+
+
+def test_json2thrift(benchmark: Any, payload: Any) -> None:
+    serialized = thrift2json(payload)
+    assert benchmark(json2thrift, type(payload), serialized) == payload
+
+
+def test_thrift2dict(benchmark: Any, payload: Any) -> None:
+    benchmark(thrift2dict, payload)
+
+
+def test_thrift2dict_simple_json(benchmark: Any, payload: Any) -> None:
+    benchmark(simple_json_loads, payload)
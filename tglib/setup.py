@@ -96,14 +96,18 @@ setup(
         "aiohttp>=3.5.4,<4.0",
         "aiokafka>=0.5.2,<1.0",
         "aiomysql>=0.0.20,<1.0",
+        "numpy>=1.16.4,<2.0",
         # sqlalchemy>=1.4 introduced a new change for processing IN expressions which is currently incompatible with NMS services
         # https://docs.sqlalchemy.org/en/14/changelog/migration_14.html#all-in-expressions-render-parameters-for-each-value-in-the-list-on-the-fly-e-g-expanding-parameters
         "sqlalchemy==1.3.24",
         "uvloop>=0.14.0,<1.0",
     ],
     extras_require={
+        "benchmark": ["pytest>=6.0,<8.0", "pytest-benchmark>=3.2.0,<5.0"],
         "ci": ["asynctest>=0.13.0,<1.0", "ptr"],
+        "compression": ["lz4>=3.1.0,<5.0", "zstandard>=0.15.0,<1.0"],
         "docs": ["aiohttp-swagger>=1.0.9,<2.0", "pyyaml>=5.3.1,<6.0"],
+        "remote_write": ["python-snappy>=0.5.4,<1.0"],
     },
     cmdclass={"build_thrift": BuildThriftCommand},
     test_suite=ptr_params["test_suite"],
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+from unittest import mock
+
+import aiohttp
+import asynctest
+from tglib.clients import api_service_client
+from tglib.clients.api_service_client import APIServiceClient
+from tglib.exceptions import CircuitOpenError, ClientRuntimeError
+from tglib.utils.limiter import ConcurrencyLimiter
+from tglib.utils.resilience import ResiliencePolicy
+
+
+class APIServiceClientTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        APIServiceClient._networks = {"A": "[::1]:8080", "B": "[::2]:8080"}
+        APIServiceClient._topologies = {}
+        APIServiceClient._topology_refreshes = {}
+        APIServiceClient._topology_listeners = []
+        APIServiceClient._topology_ttl_s = 30
+        APIServiceClient._session = mock.Mock()
+        APIServiceClient._network_limiter = ConcurrencyLimiter("network", "network", 1)
+        APIServiceClient._host_limiter = ConcurrencyLimiter("host", "host", 1)
+        APIServiceClient._resilience = ResiliencePolicy("network", "network")
+        self.client = APIServiceClient(timeout=1)
+        self.client.request = asynctest.CoroutineMock(
+            side_effect=lambda name, endpoint: {"name": name, "nodes": []}
+        )
+
+    async def tearDown(self) -> None:
+        APIServiceClient._networks = None
+        APIServiceClient._topology_listeners = []
+        APIServiceClient._session = None
+        APIServiceClient._network_limiter = None
+        APIServiceClient._host_limiter = None
+        APIServiceClient._resilience = None
+
+    def server_error(self, status: int) -> ClientRuntimeError:
+        error = ClientRuntimeError(f"Request failed ({status})")
+        error.__cause__ = aiohttp.ClientResponseError(mock.Mock(), (), status=status)
+        return error
+
+    async def test_get_topology_single_flight(self) -> None:
+        topologies = await asyncio.gather(
+            self.client.get_topology("A"), self.client.get_topology("A")
+        )
+        self.assertEqual(topologies, [{"name": "A", "nodes": []}] * 2)
+        self.client.request.assert_called_once_with("A", "getTopology")
+        self.assertFalse(self.client._topology_refreshes)
+
+    @asynctest.patch("time.monotonic", return_value=100)
+    async def test_get_topology_ttl(self, patched_time_monotonic) -> None:
+        await self.client.get_topology("A")
+        patched_time_monotonic.return_value = 129
+        await self.client.get_topology("A")
+        self.assertEqual(self.client.request.call_count, 1)
+
+        patched_time_monotonic.return_value = 130
+        await self.client.get_topology("A")
+        self.assertEqual(self.client.request.call_count, 2)
+
+        # A smaller maximum age forces a refresh
+        await self.client.get_topology("A", max_age_s=0)
+        self.assertEqual(self.client.request.call_count, 3)
+
+    async def test_get_topologies(self) -> None:
+        topologies = await self.client.get_topologies()
+        self.assertEqual(set(topologies), {"A", "B"})
+        self.assertEqual(topologies["B"]["name"], "B")
+
+    async def test_on_topology_change(self) -> None:
+        callback = asynctest.CoroutineMock()
+        APIServiceClient.on_topology_change(callback)
+
+        await self.client.get_topology("A")
+        await asyncio.sleep(0)
+        callback.assert_called_once_with("A", {"name": "A", "nodes": []})
+        digest = APIServiceClient.topology_digest("A")
+        self.assertIsNotNone(digest)
+
+        # Unchanged contents do not trigger the callback
+        await self.client.get_topology("A", max_age_s=0)
+        await asyncio.sleep(0)
+        self.assertEqual(callback.call_count, 1)
+        self.assertEqual(APIServiceClient.topology_digest("A"), digest)
+
+        self.client.request.side_effect = lambda name, endpoint: {"name": name}
+        await self.client.get_topology("A", max_age_s=0)
+        await asyncio.sleep(0)
+        self.assertEqual(callback.call_count, 2)
+        self.assertNotEqual(APIServiceClient.topology_digest("A"), digest)
+        self.assertIsNone(APIServiceClient.topology_digest("B"))
+
+    async def test_on_topology_change_slow_listener(self) -> None:
+        started = asyncio.Event()
+        finished = asyncio.Event()
+
+        async def slow(network_name: str, topology: dict) -> None:
+            started.set()
+            await finished.wait()
+            raise ValueError()
+
+        APIServiceClient.on_topology_change(slow)
+
+        # The caller gets the topology without waiting for the listener
+        topology = await asyncio.wait_for(self.client.get_topology("A"), 1)
+        self.assertEqual(topology["name"], "A")
+        await asyncio.wait_for(started.wait(), 1)
+
+        # The listener failure is logged
+        with self.assertLogs(level="ERROR"):
+            finished.set()
+            await asyncio.sleep(0.01)
+
+    async def test_stop_clears_topology_listeners(self) -> None:
+        APIServiceClient._session.close = asynctest.CoroutineMock()
+        APIServiceClient.on_topology_change(asynctest.CoroutineMock())
+        await APIServiceClient.stop()
+        self.assertEqual(APIServiceClient._topology_listeners, [])
+
+    async def test_request_metrics(self) -> None:
+        client = APIServiceClient(timeout=1)
+        client._post = asynctest.CoroutineMock(
+            side_effect=[{"success": True}, ClientRuntimeError()]
+        )
+
+        labels = {"endpoint": "getCtrlConfig", "network": "B"}
+        await client.request("B", "getCtrlConfig")
+        with self.assertRaises(ClientRuntimeError):
+            await client.request("B", "getCtrlConfig")
+
+        durations = api_service_client._request_durations.collect()
+        self.assertIn(
+            ("tglib_api_service_request_duration_seconds_count", labels, 2), durations
+        )
+        errors = api_service_client._request_errors.collect()
+        self.assertIn(("tglib_api_service_request_errors_total", labels, 1), errors)
+
+    async def test_request_retries(self) -> None:
+        APIServiceClient._resilience = ResiliencePolicy(
+            "network", "network", max_retries=2, backoff_s=0
+        )
+        client = APIServiceClient(timeout=1)
+        client._post = asynctest.CoroutineMock(
+            side_effect=[self.server_error(503), {"success": True}]
+        )
+
+        # Reads are retried on server errors
+        self.assertEqual(await client.request("A", "getCtrlConfig"), {"success": True})
+        self.assertEqual(client._post.call_count, 2)
+
+        # Writes and client errors are not
+        client._post.side_effect = [self.server_error(503), self.server_error(400)]
+        with self.assertRaises(ClientRuntimeError):
+            await client.request("A", "setCtrlConfig")
+        with self.assertRaises(ClientRuntimeError):
+            await client.request("A", "getCtrlConfig")
+        self.assertEqual(client._post.call_count, 4)
+
+    async def test_request_circuit_open(self) -> None:
+        APIServiceClient._resilience = ResiliencePolicy.from_config(
+            "network", "network", {"max_retries": 0, "circuit_failure_threshold": 2}
+        )
+        client = APIServiceClient(timeout=1)
+        client._post = asynctest.CoroutineMock(side_effect=[self.server_error(500)] * 2)
+
+        for _ in range(2):
+            with self.assertRaises(ClientRuntimeError):
+                await client.request("A", "getTopology")
+        with self.assertRaises(CircuitOpenError) as cm:
+            await client.request("A", "getTopology")
+        self.assertEqual(cm.exception.key, "A")
+        self.assertEqual(client._post.call_count, 2)
+
+        # Other networks are unaffected
+        client._post.side_effect = None
+        client._post.return_value = {}
+        self.assertEqual(await client.request("B", "getTopology"), {})
+
+
+class APIServiceClientTokenTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        APIServiceClient._jwt = {}
+        APIServiceClient._auth_headers = None
+        APIServiceClient._token_expiry = 0
+        APIServiceClient._token_refresh = None
+        APIServiceClient._token_refresh_ratio = 0.8
+
+    async def tearDown(self) -> None:
+        APIServiceClient._auth_headers = None
+        APIServiceClient._token_expiry = 0
+
+    async def fake_refresh_token(self) -> bool:
+        await asyncio.sleep(0)
+        APIServiceClient._jwt = {"access_token": "abc", "expires_in": 100}
+        APIServiceClient._auth_headers = {"Authorization": "Bearer abc"}
+        APIServiceClient._token_expiry = 1100
+        return True
+
+    @asynctest.patch("time.time", return_value=1000)
+    async def test_get_auth_headers_single_flight(self, patched_time_time) -> None:
+        with asynctest.patch.object(
+            APIServiceClient, "_refresh_token", side_effect=self.fake_refresh_token
+        ) as patched_refresh_token:
+            headers = await asyncio.gather(
+                APIServiceClient._get_auth_headers(),
+                APIServiceClient._get_auth_headers(),
+            )
+            self.assertEqual(headers, [{"Authorization": "Bearer abc"}] * 2)
+            patched_refresh_token.assert_called_once()
+            self.assertIsNone(APIServiceClient._token_refresh)
+
+            # A valid token is returned without refreshing
+            await APIServiceClient._get_auth_headers()
+            patched_refresh_token.assert_called_once()
+
+            # An expired token is refreshed inline
+            patched_time_time.return_value = 1100
+            await APIServiceClient._get_auth_headers()
+            self.assertEqual(patched_refresh_token.call_count, 2)
+
+    @asynctest.patch("time.time", return_value=1000)
+    @asynctest.patch("asyncio.sleep", side_effect=[None, asyncio.CancelledError()])
+    async def test_token_refresh_loop(self, patched_sleep, patched_time_time) -> None:
+        APIServiceClient._jwt = {"access_token": "abc", "expires_in": 100}
+        APIServiceClient._auth_headers = {"Authorization": "Bearer abc"}
+        APIServiceClient._token_expiry = 1100
+        with asynctest.patch.object(
+            APIServiceClient, "_refresh_token", return_value=True
+        ) as patched_refresh_token:
+            with self.assertRaises(asyncio.CancelledError):
+                await APIServiceClient._token_refresh_loop()
+
+            # Renew once 80% of the 100s lifetime has passed
+            patched_sleep.assert_any_call(80)
+            patched_refresh_token.assert_called_once()
+
+    async def test_stop_resets_token(self) -> None:
+        APIServiceClient._session = mock.Mock()
+        APIServiceClient._session.close = asynctest.CoroutineMock()
+        with asynctest.patch.object(
+            APIServiceClient, "_refresh_token", side_effect=self.fake_refresh_token
+        ):
+            renew = asyncio.ensure_future(APIServiceClient._renew_token())
+            await asyncio.sleep(0)
+            refresh = APIServiceClient._token_refresh
+            await APIServiceClient.stop()
+
+        # The in-flight refresh is cancelled and no token outlives the client
+        with self.assertRaises(asyncio.CancelledError):
+            await renew
+        self.assertTrue(refresh.cancelled())
+        self.assertIsNone(APIServiceClient._token_refresh)
+        self.assertEqual(APIServiceClient._jwt, {})
+        self.assertIsNone(APIServiceClient._auth_headers)
@@ -8,9 +8,31 @@
 import logging
 import unittest
 
+from tests.api_service_tests import APIServiceClientTests, APIServiceClientTokenTests
 from tests.dict_utils_tests import DictUtilsTests
 from tests.ip_utils_tests import IPUtilsTests
+from tests.kafka_tests import KafkaConsumerTests, KafkaProducerTests
+from tests.limiter_tests import ConcurrencyLimiterTests
+from tests.loop_monitor_tests import LoopMonitorTests
+from tests.metrics_tests import MetricsMiddlewareTests, MetricsTests
+from tests.mysql_tests import MySQLClientTests
+from tests.process_pool_tests import ProcessPoolTests
+from tests.profiling_tests import ProfilingTests
 from tests.prometheus_tests import PrometheusClientTests
+from tests.registry_tests import SeriesRegistryTests
+from tests.reload_tests import ReloadTests
+from tests.remote_write_tests import RemoteWriteTests
+from tests.resilience_tests import ResiliencePolicyTests
+from tests.scheduler_tests import SchedulerTests
+from tests.testing_tests import (
+    FakeAPIServiceTests,
+    FakeKafkaTests,
+    FakeMySQLTests,
+    FakePrometheusTests,
+    HarnessTests,
+    StartupTests,
+    TopologyTests,
+)
 from tests.thrift_tests import ThriftTests
 
 
@@ -7,7 +7,7 @@
 
 import unittest
 
-from tglib.utils.dict import deep_update
+from tglib.utils.dict import MISSING, deep_diff, deep_update
 
 
 class DictUtilsTests(unittest.TestCase):
@@ -42,3 +42,34 @@ class DictUtilsTests(unittest.TestCase):
         dst = {"foo": {"bar": ["qux"]}}
         deep_update(dst, src, join_lists=True)
         self.assertDictEqual(dst, {"foo": {"bar": ["qux", "baz"]}})
+
+    def test_copy(self) -> None:
+        src = {"foo": {"bar": ["baz"]}, "qux": 1}
+        dst = {}
+        deep_update(dst, src)
+        self.assertIsNot(dst["foo"], src["foo"])
+
+        dst = {"foo": {}}
+        deep_update(dst, src, copy=False)
+        self.assertIs(dst["foo"]["bar"], src["foo"]["bar"])
+        self.assertDictEqual(dst, src)
+
+    def test_deep_diff(self) -> None:
+        old = {"foo": {"bar": 1, "baz": [2]}, "qux": 3, "quux": {"a": 1}}
+        new = {"foo": {"bar": 1, "baz": [2, 3]}, "quux": {"a": 1}, "corge": {}}
+        self.assertDictEqual(
+            deep_diff(old, new),
+            {
+                ("foo", "baz"): ([2], [2, 3]),
+                ("qux",): (3, MISSING),
+                ("corge",): (MISSING, {}),
+            },
+        )
+        self.assertDictEqual(deep_diff(new, new), {})
+        self.assertDictEqual(deep_diff({"foo": {}}, {"foo": 1}), {("foo",): ({}, 1)})
+
+        # Values of different types are changes, even if they compare equal
+        self.assertDictEqual(
+            deep_diff({"a": 1, "b": 0, "c": [1]}, {"a": True, "b": False, "c": [True]}),
+            {("a",): (1, True), ("b",): (0, False), ("c",): ([1], [True])},
+        )
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+from unittest import mock
+
+import asynctest
+from aiokafka import TopicPartition
+from aiokafka.errors import KafkaTimeoutError
+from terragraph_thrift.Event.ttypes import EventCategory, EventId, EventLevel
+from tglib.clients.kafka_consumer import KafkaConsumer
+from tglib.clients.kafka_producer import KafkaProducer
+from tglib.clients.prometheus_client import PrometheusClient
+from tglib.exceptions import ConfigError
+from tglib.utils.registry import SeriesRegistry
+
+
+class KafkaConsumerTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        self.tp = TopicPartition("events", 0)
+        self.records = [mock.Mock(offset=offset) for offset in range(4)]
+        KafkaConsumer._group_id = "group"
+        KafkaConsumer._consumer = mock.Mock()
+        KafkaConsumer._consumer.assignment.return_value = {self.tp}
+        KafkaConsumer._consumer.commit = asynctest.CoroutineMock()
+        KafkaConsumer._consumer.highwater.return_value = len(self.records)
+        PrometheusClient._metrics = SeriesRegistry(PrometheusClient.format_query)
+        batches = [{self.tp: self.records}, {}, {}]
+
+        async def getmany(**kwargs) -> dict:
+            # Give the dispatched handlers a chance to run in between batches
+            await asyncio.sleep(0.05)
+            if not batches:
+                raise asyncio.CancelledError()
+            return batches.pop(0)
+
+        KafkaConsumer._consumer.getmany = getmany
+
+    async def tearDown(self) -> None:
+        KafkaConsumer._consumer = None
+        KafkaConsumer._group_id = None
+        PrometheusClient._metrics = None
+
+    async def test_consume_bounded(self) -> None:
+        active = 0
+        peak = 0
+        handled = []
+
+        async def handler(record: mock.Mock) -> None:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            # Finish the records out of order
+            await asyncio.sleep(0.01 * (4 - record.offset))
+            handled.append(record.offset)
+            active -= 1
+
+        with self.assertRaises(asyncio.CancelledError):
+            await KafkaConsumer().consume(handler, max_in_flight=2)
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(sorted(handled), [0, 1, 2, 3])
+        KafkaConsumer._consumer.pause.assert_called_with(self.tp)
+        KafkaConsumer._consumer.resume.assert_called_with(self.tp)
+
+        # Offsets are only committed past the fully processed prefix
+        committed = [
+            call[0][0][self.tp]
+            for call in KafkaConsumer._consumer.commit.call_args_list
+        ]
+        self.assertEqual(committed, sorted(committed))
+        self.assertEqual(committed[-1], 4)
+
+    async def test_consume_handler_error(self) -> None:
+        handler = asynctest.CoroutineMock(side_effect=ValueError())
+        with self.assertRaises(asyncio.CancelledError):
+            await KafkaConsumer().consume(handler)
+
+        self.assertEqual(handler.call_count, 4)
+        KafkaConsumer._consumer.commit.assert_called_once_with({self.tp: 4})
+        KafkaConsumer._consumer.pause.assert_not_called()
+
+    async def test_consume_invalid_max_in_flight(self) -> None:
+        with self.assertRaises(ValueError):
+            await KafkaConsumer().consume(asynctest.CoroutineMock(), max_in_flight=0)
+
+    async def test_consume_drains_on_cancel(self) -> None:
+        handled = []
+
+        async def handler(record: mock.Mock) -> None:
+            await asyncio.sleep(0.1)
+            handled.append(record.offset)
+
+        consume = asyncio.ensure_future(KafkaConsumer().consume(handler))
+        await asyncio.sleep(0.07)
+        consume.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await consume
+
+        # The running handlers finished and their offsets were committed
+        self.assertEqual(handled, [0, 1, 2, 3])
+        KafkaConsumer._consumer.commit.assert_called_once_with({self.tp: 4})
+        self.assertIn(
+            'tglib_kafka_consumer_lag{topic="events",partition="0"} 0',
+            PrometheusClient.poll_metrics(),
+        )
+
+    @asynctest.patch("tglib.clients.kafka_consumer.AIOKafkaConsumer")
+    async def test_start_disables_auto_commit(self, consumer_cls) -> None:
+        KafkaConsumer._consumer = None
+        consumer_cls.return_value.start = asynctest.CoroutineMock()
+        config = {"kafka": {"bootstrap_servers": "kafka:9092"}}
+
+        await KafkaConsumer.start({**config, "kafka_consumer": {"group_id": "a"}})
+        self.assertFalse(consumer_cls.call_args[1]["enable_auto_commit"])
+
+        KafkaConsumer._consumer = None
+        with self.assertRaises(ConfigError):
+            await KafkaConsumer.start(
+                {
+                    **config,
+                    "kafka_consumer": {"group_id": "a", "enable_auto_commit": True},
+                }
+            )
+
+        # Without a group, there are no offsets to commit
+        await KafkaConsumer.start(config)
+        self.assertNotIn("enable_auto_commit", consumer_cls.call_args[1])
+
+
+class KafkaProducerTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        KafkaProducer._producer = mock.Mock()
+
+    async def tearDown(self) -> None:
+        KafkaProducer._producer = None
+
+    async def test_log_events(self) -> None:
+        loop = asyncio.get_event_loop()
+        futures = [loop.create_future() for _ in range(3)]
+        futures[0].set_result(None)
+        futures[1].set_exception(KafkaTimeoutError())
+        futures[2].set_result(None)
+        sends = []
+
+        async def send(topic: str, value: bytes) -> asyncio.Future:
+            sends.append(topic)
+            return futures[len(sends) - 1]
+
+        KafkaProducer._producer.send = send
+
+        event = {
+            "source": "test",
+            "category": EventCategory.TOPOLOGY,
+            "level": EventLevel.INFO,
+            "event_id": EventId.TOPOLOGY_LINK_MODIFIED,
+        }
+        events = [{"reason": str(i), **event} for i in range(3)]
+        # Invalid events are not sent
+        events.append({**event, "reason": "bad", "level": -1})
+
+        delivered = await KafkaProducer().log_events(events)
+        self.assertEqual(delivered, 2)
+        self.assertEqual(sends, ["events"] * 3)
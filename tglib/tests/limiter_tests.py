@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+
+import asynctest
+from tglib.utils.limiter import ConcurrencyLimiter, collect_all
+
+
+class ConcurrencyLimiterTests(asynctest.TestCase):
+    async def test_invalid_limit(self) -> None:
+        with self.assertRaises(ValueError):
+            ConcurrencyLimiter("foo", "host", 0)
+
+    async def test_limit_per_key(self) -> None:
+        limiter = ConcurrencyLimiter("foo", "host", 2)
+        active = {"a": 0, "b": 0}
+        peak = {"a": 0, "b": 0}
+
+        async def work(key: str) -> None:
+            async with limiter.acquire(key):
+                active[key] += 1
+                peak[key] = max(peak[key], active[key])
+                await asyncio.sleep(0.01)
+                active[key] -= 1
+
+        await asyncio.gather(*[work("a") for _ in range(5)], work("b"))
+        self.assertEqual(peak, {"a": 2, "b": 1})
+
+    async def test_collect(self) -> None:
+        limiter = ConcurrencyLimiter("foo", "host", 1)
+        self.assertEqual(limiter.collect(), [])
+
+        async with limiter.acquire("a"):
+            waiter = asyncio.ensure_future(limiter.acquire("a").__aenter__())
+            await asyncio.sleep(0)
+
+            samples = {name: value for name, _, value in limiter.collect()}
+            self.assertEqual(samples["tglib_foo_in_flight"], 1)
+            self.assertEqual(samples["tglib_foo_queued"], 1)
+            self.assertEqual(samples["tglib_foo_queue_wait_seconds_count"], 1)
+
+        await waiter
+        samples = {name: value for name, _, value in limiter.collect()}
+        self.assertEqual(samples["tglib_foo_queued"], 0)
+        self.assertEqual(samples["tglib_foo_queue_wait_seconds_count"], 2)
+        self.assertIn(("tglib_foo_in_flight", {"host": "a"}, 1), collect_all())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import time
+
+import asynctest
+from tglib.exceptions import ConfigError
+from tglib.utils import loop_monitor
+
+
+def block(duration_s: float) -> None:
+    time.sleep(duration_s)
+
+
+class LoopMonitorTests(asynctest.TestCase):
+    async def tearDown(self) -> None:
+        await loop_monitor.stop()
+
+    async def test_invalid_config(self) -> None:
+        with self.assertRaises(ConfigError):
+            await loop_monitor.start({"loop_monitor": {"interval_s": 0}})
+        with self.assertRaises(ConfigError):
+            await loop_monitor.start({"loop_monitor": {"max_slow_callbacks": 0}})
+        with self.assertRaises(ConfigError):
+            await loop_monitor.start({"loop_monitor": {"foo": 1}})
+
+    async def test_disabled(self) -> None:
+        await loop_monitor.start({"loop_monitor": {"enabled": False}})
+        self.assertIsNone(loop_monitor._monitor)
+
+    async def test_lag(self) -> None:
+        await loop_monitor.start({"loop_monitor": {"interval_s": 0.01}})
+        await asyncio.sleep(0.02)
+        block(0.1)
+        await asyncio.sleep(0.02)
+
+        recent = dict(
+            (labels["quantile"], value)
+            for _, labels, value in loop_monitor._recent_lag.collect()
+        )
+        self.assertGreaterEqual(recent["1.0"], 0.05)
+        self.assertLess(recent["0.5"], 0.05)
+        self.assertGreaterEqual(loop_monitor._tasks.collect()[0][2], 1)
+
+    async def test_slow_callback(self) -> None:
+        await loop_monitor.start(
+            {
+                "loop_monitor": {
+                    "interval_s": 0.01,
+                    "slow_callback_duration_s": 0.05,
+                    "max_slow_callbacks": 1,
+                }
+            }
+        )
+        monitor = loop_monitor._monitor
+        await asyncio.sleep(0.02)
+        block(0.2)
+        await asyncio.sleep(0.02)
+
+        # The captured stack points at the blocking code
+        self.assertEqual(len(monitor.slowest), 1)
+        location, duration_s = next(iter(monitor.slowest.items()))
+        self.assertIn("block", location)
+        self.assertGreaterEqual(duration_s, 0.1)
+
+    async def test_stale_stall(self) -> None:
+        monitor = loop_monitor.LoopMonitor(self.loop, interval_s=0.01)
+        monitor._due = time.monotonic()
+        monitor._stall = ("foo.py:1 foo", [], monitor._due - 0.01)
+        monitor._sample()
+        monitor.stop()
+
+        # A stall captured for an earlier timer is not attributed to this one
+        self.assertIsNone(monitor._stall)
+        self.assertEqual(monitor.slowest, {})
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+from unittest import mock
+
+import asynctest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+from tglib import main
+from tglib.utils.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    collect_all,
+    collect_families,
+)
+
+
+class MetricsTests(unittest.TestCase):
+    def test_counter(self) -> None:
+        counter = Counter("foo_total")
+        self.assertEqual(counter.collect(), [])
+
+        counter.inc({"host": "a"})
+        counter.inc({"host": "a"}, 2)
+        counter.inc({"host": "b"})
+        self.assertEqual(
+            counter.collect(),
+            [("foo_total", {"host": "a"}, 3), ("foo_total", {"host": "b"}, 1)],
+        )
+        self.assertIn(("foo_total", {"host": "b"}, 1), collect_all())
+
+    def test_gauge(self) -> None:
+        gauge = Gauge("foo")
+        gauge.set(1, {"host": "a"})
+        gauge.set(2, {"host": "a"})
+        gauge.set(3, {"host": "b"})
+        gauge.remove({"host": "b"})
+        self.assertEqual(gauge.collect(), [("foo", {"host": "a"}, 2)])
+
+    def test_histogram(self) -> None:
+        histogram = Histogram("foo_seconds", [1, 0.5])
+        for value in [0.1, 0.5, 0.7, 2]:
+            histogram.observe(value, {"host": "a"})
+
+        self.assertEqual(
+            histogram.collect(),
+            [
+                ("foo_seconds_bucket", {"host": "a", "le": "0.5"}, 2),
+                ("foo_seconds_bucket", {"host": "a", "le": "1"}, 3),
+                ("foo_seconds_bucket", {"host": "a", "le": "+Inf"}, 4),
+                ("foo_seconds_sum", {"host": "a"}, 3.3),
+                ("foo_seconds_count", {"host": "a"}, 4),
+            ],
+        )
+
+    def test_label_order(self) -> None:
+        # The same label set in any insertion order is a single series
+        counter = Counter("foo_total")
+        counter.inc({"host": "a", "port": "1"})
+        counter.inc({"port": "1", "host": "a"})
+        self.assertEqual(
+            counter.collect(), [("foo_total", {"host": "a", "port": "1"}, 2)]
+        )
+
+        gauge = Gauge("foo")
+        gauge.set(1, {"host": "a", "port": "1"})
+        gauge.remove({"port": "1", "host": "a"})
+        self.assertEqual(gauge.collect(), [])
+
+        histogram = Histogram("foo_seconds", [1])
+        histogram.observe(0.5, {"host": "a", "port": "1"})
+        histogram.observe(0.5, {"port": "1", "host": "a"})
+        self.assertIn(
+            ("foo_seconds_count", {"host": "a", "port": "1"}, 2), histogram.collect()
+        )
+
+    def test_histogram_time(self) -> None:
+        histogram = Histogram("foo_seconds", [1])
+        with histogram.time():
+            pass
+
+        self.assertIn(("foo_seconds_bucket", {"le": "1"}, 1), histogram.collect())
+
+    def test_collect_families(self) -> None:
+        # Collectors sharing a metric name are exported as a single family
+        counters = [Counter("bar_total"), Counter("bar_total")]
+        counters[0].inc({"host": "a"})
+        counters[1].inc({"host": "b"})
+
+        families = {name: rest for name, *rest in collect_families()}
+        metric_type, samples = families["bar"]
+        self.assertEqual(metric_type, "counter")
+        self.assertCountEqual(
+            samples, [("bar_total", {"host": "a"}, 1), ("bar_total", {"host": "b"}, 1)]
+        )
+
+
+class MetricsMiddlewareTests(asynctest.TestCase):
+    async def test_metrics_middleware(self) -> None:
+        app = web.Application()
+        app.router.add_get("/status/{id}", lambda request: web.Response())
+        request = make_mocked_request("GET", "/status/1", app=app)
+        match_info = await app.router.resolve(request)
+        match_info.add_app(app)
+        request._match_info = match_info
+
+        labels = {"method": "GET", "route": "/status/{id}", "status": "200"}
+        await main.metrics_middleware(request, match_info.handler)
+        with self.assertRaises(web.HTTPNotFound):
+            await main.metrics_middleware(
+                request, mock.Mock(side_effect=web.HTTPNotFound)
+            )
+
+        samples = main._request_durations.collect()
+        self.assertIn(("tglib_http_request_duration_seconds_count", labels, 1), samples)
+        self.assertIn(
+            (
+                "tglib_http_request_duration_seconds_count",
+                {**labels, "status": "404"},
+                1,
+            ),
+            samples,
+        )
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from unittest import mock
+
+import aiomysql
+from aiomysql.sa.engine import _dialect
+import asynctest
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, select
+from sqlalchemy.dialects import mysql
+from tglib.clients import mysql_client
+from tglib.clients.mysql_client import MySQLClient
+
+
+table = Table(
+    "test",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("name", String(255)),
+    Column("created_dt", DateTime, server_default=func.now()),
+)
+
+
+class MySQLClientTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        MySQLClient._engine = mock.Mock()
+        self.sa_conn = mock.Mock()
+        self.sa_conn.execute = asynctest.CoroutineMock()
+        self.sa_conn.connection.commit = asynctest.CoroutineMock()
+
+    async def tearDown(self) -> None:
+        MySQLClient._engine = None
+
+    async def test_bulk_insert_chunks(self) -> None:
+        rows = [{"name": str(i)} for i in range(5)]
+        count = await MySQLClient().bulk_insert(table, rows, 2, self.sa_conn)
+        self.assertEqual(count, 5)
+        self.assertEqual(self.sa_conn.execute.call_count, 3)
+        # The provided connection's transaction is left to the caller
+        self.sa_conn.connection.commit.assert_not_called()
+
+        chunks = [call[0][1] for call in self.sa_conn.execute.call_args_list]
+        self.assertEqual(chunks, [rows[:2], rows[2:4], rows[4:]])
+
+        # Only the provided columns are bound, leaving server defaults intact
+        query = self.sa_conn.execute.call_args[0][0]
+        self.assertEqual(
+            str(query.compile(dialect=mysql.dialect())),
+            "INSERT INTO test (name) VALUES (%s)",
+        )
+
+    async def test_bulk_insert_leased(self) -> None:
+        MySQLClient._engine.acquire.return_value.__aenter__ = asynctest.CoroutineMock(
+            return_value=self.sa_conn
+        )
+        MySQLClient._engine.acquire.return_value.__aexit__ = asynctest.CoroutineMock(
+            return_value=False
+        )
+
+        rows = [{"name": str(i)} for i in range(5)]
+        self.assertEqual(await MySQLClient().bulk_insert(table, rows, 2), 5)
+        # Every chunk is committed on the leased connection
+        self.assertEqual(self.sa_conn.connection.commit.call_count, 3)
+
+    async def test_bulk_insert_empty(self) -> None:
+        count = await MySQLClient().bulk_insert(table, [], sa_conn=self.sa_conn)
+        self.assertEqual(count, 0)
+        self.sa_conn.execute.assert_not_called()
+
+    @asynctest.patch("tglib.clients.mysql_client.create_result_proxy")
+    async def test_stream(self, patched_create_result_proxy) -> None:
+        cursor = mock.Mock()
+        cursor.execute = asynctest.CoroutineMock()
+        self.sa_conn.connection.cursor = asynctest.CoroutineMock(return_value=cursor)
+        MySQLClient._engine.dialect = _dialect
+        MySQLClient._engine.acquire.return_value.__aenter__ = asynctest.CoroutineMock(
+            return_value=self.sa_conn
+        )
+        MySQLClient._engine.acquire.return_value.__aexit__ = asynctest.CoroutineMock(
+            return_value=False
+        )
+        result = patched_create_result_proxy.return_value
+        result.fetchmany = asynctest.CoroutineMock(side_effect=[[1, 2], [3], []])
+        result.close = asynctest.CoroutineMock()
+
+        query = select([table.c.name]).where(table.c.id > 10)
+        rows = [row async for row in MySQLClient().stream(query, fetch_size=2)]
+        self.assertEqual(rows, [1, 2, 3])
+        self.sa_conn.connection.cursor.assert_called_once_with(aiomysql.SSCursor)
+        cursor.execute.assert_called_once_with(
+            "SELECT test.name \nFROM test \nWHERE test.id > %(id_1)s", {"id_1": 10}
+        )
+        result.fetchmany.assert_called_with(2)
+        result.close.assert_called_once()
+
+    async def test_lease_metrics(self) -> None:
+        def total(collector, name: str) -> float:
+            return sum(
+                value for sample, _, value in collector.collect() if sample == name
+            )
+
+        MySQLClient._engine.acquire.return_value.__aenter__ = asynctest.CoroutineMock(
+            return_value=self.sa_conn
+        )
+        MySQLClient._engine.acquire.return_value.__aexit__ = asynctest.CoroutineMock(
+            return_value=False
+        )
+        leases_name = "tglib_mysql_lease_duration_seconds_count"
+        leases = total(mysql_client._lease_durations, leases_name)
+        errors = total(mysql_client._errors, "tglib_mysql_errors_total")
+
+        async with MySQLClient().lease() as sa_conn:
+            self.assertIs(sa_conn, self.sa_conn)
+        with self.assertRaises(aiomysql.OperationalError):
+            async with MySQLClient().lease():
+                raise aiomysql.OperationalError()
+
+        self.assertEqual(total(mysql_client._lease_durations, leases_name), leases + 2)
+        self.assertEqual(
+            total(mysql_client._errors, "tglib_mysql_errors_total"), errors + 1
+        )
+
+    @asynctest.patch(
+        "tglib.clients.mysql_client.create_engine", new_callable=asynctest.CoroutineMock
+    )
+    async def test_start_config_unchanged(self, patched_create_engine) -> None:
+        MySQLClient._engine = None
+        config = {"mysql": {"host": "db", "port": 3306, "stream_fetch_size": 10}}
+        await MySQLClient.start(config)
+
+        self.assertEqual(
+            config, {"mysql": {"host": "db", "port": 3306, "stream_fetch_size": 10}}
+        )
+        self.assertEqual(MySQLClient._stream_fetch_size, 10)
+        self.assertNotIn("stream_fetch_size", patched_create_engine.call_args[1])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import os
+import time
+from typing import Tuple
+
+import asynctest
+import numpy as np
+from tglib.exceptions import ConfigError
+from tglib.utils import process_pool
+from tglib.utils.process_pool import run_cpu_bound
+
+
+def scale(array: np.ndarray, factor: float = 1) -> Tuple[int, np.ndarray]:
+    return os.getpid(), array * factor
+
+
+def fail() -> None:
+    raise ValueError("foo")
+
+
+class ProcessPoolTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        await process_pool.start({"process_pool": {"max_workers": 1}})
+
+    async def tearDown(self) -> None:
+        await process_pool.stop()
+
+    async def test_invalid_config(self) -> None:
+        with self.assertRaises(ConfigError):
+            await process_pool.start({"process_pool": {"max_workers": 0}})
+        with self.assertRaises(ConfigError):
+            await process_pool.start({"process_pool": {"start_method": "foo"}})
+
+    async def test_run_cpu_bound(self) -> None:
+        array = np.arange(10, dtype=np.float64)
+        pid, result = await run_cpu_bound(scale, array, factor=2)
+        self.assertNotEqual(pid, os.getpid())
+        np.testing.assert_array_equal(result, array * 2)
+
+    async def test_shared_memory(self) -> None:
+        # Large enough for the argument and result to use shared memory
+        array = np.ones(process_pool.SHM_THRESHOLD_BYTES, dtype=np.float64)
+        with asynctest.patch.object(
+            process_pool, "SharedMemory", wraps=process_pool.SharedMemory
+        ) as shared_memory:
+            _, result = await run_cpu_bound(scale, array, 3)
+
+        np.testing.assert_array_equal(result, array * 3)
+        self.assertTrue(result.flags.writeable)
+        self.assertTrue(shared_memory.called)
+
+        # All of the segments were unlinked
+        if os.path.isdir("/dev/shm"):
+            segments = [name for name in os.listdir("/dev/shm") if "psm_" in name]
+            self.assertEqual(segments, [])
+
+    async def test_exception(self) -> None:
+        with self.assertRaises(ValueError):
+            await run_cpu_bound(fail)
+
+    async def test_cancel(self) -> None:
+        # Occupy the only worker so that the second task is still pending
+        busy = asyncio.ensure_future(run_cpu_bound(time.sleep, 0.2))
+        pending = asyncio.ensure_future(run_cpu_bound(os.getpid))
+        await asyncio.sleep(0.05)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        await busy
+
+    async def test_stop_cancels_pending(self) -> None:
+        # Occupy the only worker and fill the pool's call queue
+        tasks = [asyncio.ensure_future(run_cpu_bound(time.sleep, 0.2))]
+        tasks += [asyncio.ensure_future(run_cpu_bound(os.getpid)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        await process_pool.stop()
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[-1], asyncio.CancelledError)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import os
+import pstats
+import time
+from typing import List
+from unittest import mock
+
+import asynctest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+from tglib import routes
+from tglib.utils import profiling
+
+
+_allocations: List[bytes] = []
+
+
+def block(duration_s: float) -> None:
+    time.sleep(duration_s)
+
+
+async def allocate() -> None:
+    await asyncio.sleep(0.01)
+    _allocations.append(bytes(1 << 20))
+
+
+class ProfilingTests(asynctest.TestCase):
+    async def tearDown(self) -> None:
+        _allocations.clear()
+
+    async def test_sample_stacks(self) -> None:
+        sampling = asyncio.ensure_future(profiling.sample_stacks(0.2, 0.01))
+        await asyncio.sleep(0.05)
+        block(0.1)
+        stacks = await sampling
+
+        blocked = sum(count for stack, count in stacks.items() if "block (" in stack)
+        self.assertGreater(blocked, 0)
+        output = profiling.format_collapsed(stacks)
+        self.assertEqual(output.count("\n"), len(stacks))
+
+    async def test_profile(self) -> None:
+        asyncio.get_running_loop().call_later(0.01, block, 0)
+        profiler = await profiling.profile(0.05)
+        functions = [func for _, _, func in pstats.Stats(profiler).stats]
+        self.assertIn("block", functions)
+
+    async def test_trace_memory(self) -> None:
+        asyncio.ensure_future(allocate())
+        stats = await profiling.trace_memory(0.05, limit=1)
+        self.assertEqual(len(stats), 1)
+        self.assertIn(__file__, stats[0]["traceback"][0])
+        self.assertGreaterEqual(stats[0]["size_diff"], 1 << 20)
+
+        with self.assertRaises(ValueError):
+            await profiling.trace_memory(0.01, key_type="foo")
+
+    async def test_debug_routes_access(self) -> None:
+        request = make_mocked_request("GET", "/debug/memory?seconds=0.01")
+        with mock.patch.dict(os.environ, clear=True):
+            with self.assertRaises(web.HTTPNotFound):
+                await routes.handle_get_debug_memory(request)
+
+        with mock.patch.dict(os.environ, {"DEBUG_TOKEN": "abc"}):
+            with self.assertRaises(web.HTTPUnauthorized):
+                await routes.handle_get_debug_memory(request)
+
+            request = make_mocked_request(
+                "GET",
+                "/debug/memory?seconds=0.01",
+                headers={"Authorization": "Bearer abc"},
+            )
+            response = await routes.handle_get_debug_memory(request)
+            self.assertEqual(response.status, 200)
+
+            request = make_mocked_request(
+                "GET",
+                "/debug/profile?seconds=1000",
+                headers={"Authorization": "Bearer abc"},
+            )
+            with self.assertRaises(web.HTTPBadRequest):
+                await routes.handle_get_debug_profile(request)
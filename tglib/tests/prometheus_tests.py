@@ -5,11 +5,16 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import asyncio
 import re
 
 import asynctest
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from tglib import routes
 from tglib.clients.prometheus_client import PrometheusClient, PrometheusMetric, ops
-from tglib.exceptions import ClientRestartError
+from tglib.exceptions import ClientRestartError, ClientRuntimeError, ConfigError
 
 
 class PrometheusClientTests(asynctest.TestCase):
@@ -21,7 +26,14 @@ class PrometheusClientTests(asynctest.TestCase):
         self.client = PrometheusClient(self.timeout)
         self.client._session = asynctest.CoroutineMock()
 
+        # Hide the process-wide tglib histograms recorded by the other tests
+        self.collect_patch = asynctest.patch(
+            "tglib.utils.metrics.collect_families", return_value=[]
+        )
+        self.collect_patch.start()
+
     async def tearDown(self) -> None:
+        self.collect_patch.stop()
         await self.client.stop()
 
     async def test_client_restart_error(self) -> None:
@@ -155,6 +167,193 @@ class PrometheusClientTests(asynctest.TestCase):
         with self.assertRaises(ValueError):
             await self.client.query_range_ts(**params)
 
+    async def test_query_range_drops_stale_and_duplicates(self) -> None:
+        data = {
+            "status": "success",
+            "data": {
+                "result": [
+                    {
+                        "metric": {"__name__": "foo", "linkName": "link1"},
+                        "values": [
+                            [100, "8.5"],
+                            [150, "8.5"],
+                            [200, "9.2"],
+                            [250, "9"],
+                        ],
+                    },
+                    {
+                        "metric": {"__name__": "foo", "linkName": "link2"},
+                        "values": [[100, "1"], [150, "2"]],
+                    },
+                ]
+            },
+        }
+        timestamps = {
+            "status": "success",
+            "data": {
+                "result": [
+                    {
+                        "metric": {"linkName": "link1"},
+                        "values": [
+                            [100, "99"],
+                            [150, "99"],
+                            [200, "200"],
+                            [250, "245"],
+                        ],
+                    },
+                    {
+                        "metric": {"linkName": "link2"},
+                        "values": [[100, "40"], [150, "150"]],
+                    },
+                ]
+            },
+        }
+        self.client.query_range_raw = asynctest.CoroutineMock(return_value=data)
+        self.client.query_range_ts = asynctest.CoroutineMock(return_value=timestamps)
+
+        response = await self.client.query_range("foo", "50s", 100, 250)
+        results = response["data"]["result"]
+        self.assertEqual(results[0]["values"], [[100, "8.5"], [200, "9.2"], [250, "9"]])
+        self.assertEqual(results[1]["values"], [[150, "2"]])
+
+    async def test_query_range_frame(self) -> None:
+        data = {
+            "status": "success",
+            "data": {
+                "result": [
+                    {"metric": {"__name__": "foo", "linkName": "link2"}, "values": []},
+                    {
+                        "metric": {"__name__": "foo", "linkName": "link1"},
+                        "values": [
+                            [100, "8.5"],
+                            [150, "8.5"],
+                            [200, "9.2"],
+                            [250, "9"],
+                        ],
+                    },
+                    {
+                        "metric": {"__name__": "foo", "linkName": "link3"},
+                        "values": [[100, "1"], [150, "NaN"]],
+                    },
+                ]
+            },
+        }
+        timestamps = {
+            "status": "success",
+            "data": {
+                "result": [
+                    {"metric": {"linkName": "link2"}, "values": []},
+                    {
+                        "metric": {"linkName": "link1"},
+                        "values": [
+                            [100, "99"],
+                            [150, "99"],
+                            [200, "200"],
+                            [250, "245"],
+                        ],
+                    },
+                    {
+                        "metric": {"linkName": "link3"},
+                        "values": [[100, "99"], [150, "150"]],
+                    },
+                ]
+            },
+        }
+        self.client.query_range_raw = asynctest.CoroutineMock(return_value=data)
+        self.client.query_range_ts = asynctest.CoroutineMock(return_value=timestamps)
+
+        frame = await self.client.query_range_frame("foo", "50s", 100, 250)
+        self.assertEqual(len(frame), 3)
+        self.assertEqual(
+            frame.index("linkName"), {("link2",): 0, ("link1",): 1, ("link3",): 2}
+        )
+        self.assertEqual(len(frame.timestamps[0]), 0)
+        np.testing.assert_array_equal(frame.timestamps[1], [100, 200, 250])
+        np.testing.assert_array_equal(frame.values[1], [8.5, 9.2, 9.0])
+        self.assertEqual(frame.values[1].dtype, np.float64)
+        np.testing.assert_array_equal(frame.timestamps[2], [100, 150])
+        np.testing.assert_array_equal(frame.values[2], [1, np.nan])
+
+    async def test_query_range_frame_error(self) -> None:
+        self.client.query_range_raw = asynctest.CoroutineMock(
+            return_value={"status": "error", "error": "bad query"}
+        )
+        self.client.query_range_ts = asynctest.CoroutineMock(
+            return_value={"status": "error", "error": "bad query"}
+        )
+
+        with self.assertRaises(ClientRuntimeError):
+            await self.client.query_range_frame("foo", "50s", 100, 250)
+
+    async def test_query_range_split(self) -> None:
+        await self.client.stop()
+        await PrometheusClient.start(
+            {"prometheus": {**self.config, "max_points_per_series": 3}}
+        )
+        self.client._session = asynctest.CoroutineMock()
+
+        responses = {
+            0: [[0, "1"], [10, "2"], [20, "3"]],
+            30: [[20, "3"], [30, "4"], [40, "5"], [50, "6"]],
+            60: [[60, "7"]],
+        }
+        link2 = {"metric": {"linkName": "link2"}, "values": [[60, "1"]]}
+
+        async def query_range_chunk(query, step, start, end, bounded=False):
+            self.assertTrue(bounded)
+            result = [{"metric": {"linkName": "link1"}, "values": responses[start]}]
+            if start == 60:
+                result.append(link2)
+            return {"status": "success", "data": {"result": result}}
+
+        self.client._query_range_chunk = query_range_chunk
+
+        response = await self.client.query_range_raw("foo", "10s", 0, 60)
+        results = response["data"]["result"]
+        self.assertEqual(len(results), 2)
+        self.assertEqual([int(v[1]) for v in results[0]["values"]], list(range(1, 8)))
+        self.assertEqual(results[1], link2)
+
+        # The chunk responses are left untouched
+        self.assertEqual(len(responses[0]), 3)
+
+    async def test_query_range_split_bounds(self) -> None:
+        await self.client.stop()
+        await PrometheusClient.start(
+            {"prometheus": {**self.config, "max_points_per_series": 3}}
+        )
+        self.client._session = asynctest.CoroutineMock()
+        self.client._session.get.return_value.__aenter__.return_value.json = (
+            asynctest.CoroutineMock(
+                return_value={"status": "success", "data": {"result": []}}
+            )
+        )
+
+        # Three points fit in a single request
+        await self.client.query_range_raw("foo", "10s", 0, 29)
+        self.assertEqual(self.client._session.get.call_count, 1)
+
+        self.client._session.get.reset_mock()
+        await self.client.query_range_raw("foo", "10s", 0, 70)
+        chunks = sorted(
+            (call[1]["params"]["start"], call[1]["params"]["end"])
+            for call in self.client._session.get.call_args_list
+        )
+        self.assertEqual(chunks, [(0, 29), (30, 59), (60, 70)])
+
+    async def test_query_range_split_error(self) -> None:
+        await self.client.stop()
+        await PrometheusClient.start(
+            {"prometheus": {**self.config, "max_points_per_series": 3}}
+        )
+        self.client._session = asynctest.CoroutineMock()
+        self.client._session.get.return_value.__aenter__.return_value.json = (
+            asynctest.CoroutineMock(return_value={"status": "error"})
+        )
+
+        response = await self.client.query_range_raw("foo", "10s", 0, 70)
+        self.assertEqual(response["status"], "error")
+
     async def test_query_latest(self) -> None:
         self.client._session.get.return_value.__aenter__.return_value.json = (
             asynctest.CoroutineMock()
@@ -183,6 +382,202 @@ class PrometheusClientTests(asynctest.TestCase):
             timeout=self.timeout,
         )
 
+    async def test_coalesce_inflight_queries(self) -> None:
+        response = {"status": "success", "data": {"result": []}}
+        self.client._session.get.return_value.__aenter__.return_value.json = (
+            asynctest.CoroutineMock(return_value=response)
+        )
+
+        results = await asyncio.gather(
+            self.client.query_latest("foo"),
+            self.client.query_latest("foo"),
+            self.client.query_latest("bar"),
+        )
+        self.assertEqual(results, [response] * 3)
+        self.assertEqual(self.client._session.get.call_count, 2)
+        self.assertFalse(self.client._inflight)
+
+        # Sequential queries are not coalesced when the cache is disabled
+        await self.client.query_latest("foo")
+        self.assertEqual(self.client._session.get.call_count, 3)
+        self.assertIn(
+            "tglib_prometheus_query_coalesced_total 1", self.client.poll_metrics()
+        )
+
+    @asynctest.patch("time.monotonic", return_value=100)
+    async def test_query_cache(self, patched_time_monotonic) -> None:
+        await self.client.stop()
+        await PrometheusClient.start(
+            {"prometheus": {**self.config, "cache_ttl_s": 30, "cache_max_size": 2}}
+        )
+        self.client._session = asynctest.CoroutineMock()
+
+        response = {"status": "success", "data": {"result": []}}
+        self.client._session.get.return_value.__aenter__.return_value.json = (
+            asynctest.CoroutineMock(return_value=response)
+        )
+
+        # Range queries in the same aligned window share a cache entry
+        await self.client.query_range_raw("foo", "30s", 0, 100)
+        await self.client.query_range_raw("foo", "30s", 5, 110)
+        self.assertEqual(self.client._session.get.call_count, 1)
+
+        await self.client.query_range_raw("foo", "30s", 0, 130)
+        self.assertEqual(self.client._session.get.call_count, 2)
+
+        # Entries expire after the TTL
+        patched_time_monotonic.return_value = 131
+        await self.client.query_range_raw("foo", "30s", 0, 100)
+        self.assertEqual(self.client._session.get.call_count, 3)
+
+        # The least recently used entry is evicted once the cache is full
+        await self.client.query_latest("bar")
+        self.assertEqual(len(self.client._cache), 2)
+        await self.client.query_range_raw("foo", "30s", 0, 130)
+        self.assertEqual(self.client._session.get.call_count, 5)
+
+        datapoints = self.client.poll_metrics()
+        self.assertIn("tglib_prometheus_query_cache_hits_total 1", datapoints)
+        self.assertIn("tglib_prometheus_query_cache_misses_total 5", datapoints)
+
+    async def test_query_cache_config(self) -> None:
+        await self.client.stop()
+        for params in (
+            {"cache_ttl_s": -1},
+            {"cache_ttl_s": 30, "cache_max_size": 0},
+            {"cache_ttl_s": 30, "cache_max_size": "10"},
+        ):
+            with self.assertRaises(ConfigError):
+                await PrometheusClient.start({"prometheus": {**self.config, **params}})
+
+        await PrometheusClient.start(
+            {"prometheus": {**self.config, "cache_ttl_s": 30, "cache_max_size": 2}}
+        )
+        await self.client.stop()
+
+        # The cache settings do not carry over across a restart
+        await PrometheusClient.start({"prometheus": self.config})
+        self.assertIsNone(self.client._cache)
+        self.assertEqual(self.client._cache_ttl_s, 0)
+        self.assertEqual(self.client._cache_max_size, 1024)
+
+    async def test_query_cache_skips_errors(self) -> None:
+        await self.client.stop()
+        await PrometheusClient.start({"prometheus": {**self.config, "cache_ttl_s": 30}})
+        self.client._session = asynctest.CoroutineMock()
+        self.client._session.get.return_value.__aenter__.return_value.json = (
+            asynctest.CoroutineMock(return_value={"status": "error"})
+        )
+
+        await self.client.query_latest("foo")
+        await self.client.query_latest("foo")
+        self.assertEqual(self.client._session.get.call_count, 2)
+
+    async def test_query_error_types(self) -> None:
+        await self.client.stop()
+        await PrometheusClient.start(
+            {
+                "prometheus": {
+                    **self.config,
+                    "retry_backoff_s": 0,
+                    "circuit_failure_threshold": 2,
+                }
+            }
+        )
+        self.client._session = asynctest.CoroutineMock()
+        get = self.client._session.get
+        get.return_value.__aenter__.return_value.json = asynctest.CoroutineMock(
+            return_value={"status": "error", "errorType": "timeout"}
+        )
+
+        # Expensive queries are neither retried nor counted against the server
+        for _ in range(3):
+            await self.client.query_latest("foo")
+        self.assertEqual(get.call_count, 3)
+        self.assertFalse(self.client._resilience.breaker.is_open(self.client._addr))
+
+        # And neither are the queries that time out on the client side
+        get.return_value.__aenter__.side_effect = asyncio.TimeoutError()
+        for _ in range(3):
+            with self.assertRaises(ClientRuntimeError):
+                await self.client.query_latest("foo")
+        self.assertEqual(get.call_count, 6)
+        self.assertFalse(self.client._resilience.breaker.is_open(self.client._addr))
+
+        # An unavailable server is retried and opens the circuit
+        get.return_value.__aenter__.side_effect = None
+        get.return_value.__aenter__.return_value.json.return_value = {
+            "status": "error",
+            "errorType": "unavailable",
+        }
+        await self.client.query_latest("foo")
+        self.assertEqual(get.call_count, 8)
+        self.assertTrue(self.client._resilience.breaker.is_open(self.client._addr))
+
+    async def test_fetch_many(self) -> None:
+        response = {
+            "status": "success",
+            "data": {
+                "result": [
+                    {
+                        "metric": {"__name__": "foo", "tglib_query": "foo", "a": "b"},
+                        "value": [10, "1"],
+                    },
+                    {"metric": {"tglib_query": "baz", "a": "b"}, "value": [10, "3"]},
+                ]
+            },
+        }
+        self.client.query_latest = asynctest.CoroutineMock(return_value=response)
+
+        results = await self.client.fetch_many(
+            ["foo", "bar", "baz"],
+            {"a": "b"},
+            transformations={"baz": lambda query: ops.delta(query, "1m")},
+            time=10,
+        )
+        self.client.query_latest.assert_called_with(
+            'label_replace({__name__=~"foo|bar",a="b"}, "tglib_query", "$1", '
+            '"__name__", "(.*)") or '
+            'label_replace(delta(baz{a="b"} [1m]), "tglib_query", "baz", "", "")',
+            10,
+        )
+        self.assertEqual(
+            results,
+            {
+                "foo": [{"metric": {"__name__": "foo", "a": "b"}, "value": [10, "1"]}],
+                "bar": [],
+                "baz": [{"metric": {"a": "b"}, "value": [10, "3"]}],
+            },
+        )
+
+        # The raw response is left untouched
+        self.assertIn("tglib_query", response["data"]["result"][0]["metric"])
+
+    async def test_query_latest_many(self) -> None:
+        response = {
+            "status": "success",
+            "data": {"result": [{"metric": {"tglib_query": "x"}, "value": [10, "1"]}]},
+        }
+        self.client.query_latest = asynctest.CoroutineMock(return_value=response)
+
+        results = await self.client.query_latest_many({"x": "foo", "y": "bar"})
+        self.client.query_latest.assert_called_with(
+            'label_replace(foo, "tglib_query", "x", "", "") or '
+            'label_replace(bar, "tglib_query", "y", "", "")',
+            None,
+        )
+        self.assertEqual(results, {"x": [{"metric": {}, "value": [10, "1"]}], "y": []})
+
+        self.client.query_latest.return_value = {"status": "error", "error": "bad"}
+        with self.assertRaises(ClientRuntimeError):
+            await self.client.query_latest_many({"x": "foo"})
+
+    async def test_fetch_many_empty(self) -> None:
+        self.client.query_latest = asynctest.CoroutineMock()
+        self.assertEqual(await self.client.fetch_many([]), {})
+        self.assertEqual(await self.client.query_latest_many({}), {})
+        self.client.query_latest.assert_not_called()
+
     def test_write_and_poll_metrics(self) -> None:
         metrics = []
 
@@ -217,5 +612,37 @@ class PrometheusClientTests(asynctest.TestCase):
         self.assertEqual(len(datapoints), 1)
         self.assertEqual(datapoints[0], 'foo{bar="baz"} 101 2')
 
+    def test_poll_metrics_openmetrics(self) -> None:
+        self.client._query_stats["hits"] = 2
+        self.client.write_metrics([PrometheusMetric("foo", {}, 1)])
+        datapoints = self.client.poll_metrics(openmetrics=True)
+        self.assertEqual(datapoints[:2], ["# TYPE foo unknown", "foo 1"])
+        self.assertIn("# TYPE tglib_prometheus_query_hits counter", datapoints)
+        index = datapoints.index("# TYPE tglib_prometheus_query_hits counter")
+        self.assertEqual(datapoints[index + 1], "tglib_prometheus_query_hits_total 2")
+
     def test_poll_metrics_empty_queue(self) -> None:
         self.assertFalse(self.client.poll_metrics())
+
+    @asynctest.patch("tglib.routes.METRICS_CHUNK_SIZE", 2)
+    async def test_stream_metrics(self) -> None:
+        metrics = [PrometheusMetric("foo", {"i": i}, i) for i in range(5)]
+        app = web.Application()
+        app.add_routes([web.get("/metrics", routes.handle_get_metrics)])
+
+        async with TestClient(TestServer(app)) as client:
+            self.client.write_metrics(metrics)
+            resp = await client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(resp.headers["Transfer-Encoding"], "chunked")
+            self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+            self.assertEqual(
+                await resp.text(), "".join(f'foo{{i="{i}"}} {i}\n' for i in range(5))
+            )
+
+            self.client.write_metrics(metrics[:1])
+            resp = await client.get(
+                "/metrics", headers={"Accept": "application/openmetrics-text"}
+            )
+            self.assertEqual(
+                await resp.text(), '# TYPE foo unknown\nfoo{i="0"} 0\n# EOF\n'
+            )
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asynctest
+from tglib.clients.prometheus_client import PrometheusClient
+from tglib.utils.registry import SeriesRegistry, format_value
+
+
+class SeriesRegistryTests(asynctest.TestCase):
+    def setUp(self) -> None:
+        self.registry = SeriesRegistry(PrometheusClient.format_query, capacity=2)
+
+    def test_format_value(self) -> None:
+        self.assertEqual(format_value(3.0), "3")
+        self.assertEqual(format_value(-2.5), "-2.5")
+        self.assertEqual(format_value(float("nan")), "NaN")
+        self.assertEqual(format_value(float("inf")), "+Inf")
+        self.assertEqual(format_value(float("-inf")), "-Inf")
+
+    def test_latest_value_wins(self) -> None:
+        self.registry.set("foo", {"bar": "baz"}, 1, None)
+        self.registry.set("foo", {"bar": "baz"}, 2, 1000)
+        self.assertEqual(len(self.registry), 1)
+        self.assertEqual(self.registry.drain(), ['foo{bar="baz"} 2 1000'])
+        self.assertEqual(self.registry.drain(), [])
+
+    def test_identical_series_share_slot(self) -> None:
+        # Label values that render identically are the same series
+        self.registry.set("foo", {"bar": 1}, 1, None)
+        self.registry.set("foo", {"bar": "1"}, 2, None)
+        self.registry.set("foo", {"bar": [1, 2]}, 3, None)
+        self.assertEqual(
+            self.registry.drain(), ['foo{bar="1"} 2', 'foo{bar="[1, 2]"} 3']
+        )
+
+    def test_openmetrics(self) -> None:
+        self.registry.set("foo", {"i": 0}, 1, 1500)
+        self.registry.set("bar", {}, 1, None)
+        self.registry.set("foo", {"i": 1}, 2, None)
+
+        # Families are contiguous and typed, and timestamps are in seconds
+        self.assertEqual(
+            self.registry.drain(openmetrics=True),
+            [
+                "# TYPE foo unknown",
+                'foo{i="0"} 1 1.500',
+                'foo{i="1"} 2',
+                "# TYPE bar unknown",
+                "bar 1",
+            ],
+        )
+
+    def test_grow(self) -> None:
+        for i in range(5):
+            self.registry.set("foo", {"i": i}, i, None)
+
+        self.assertEqual(len(self.registry), 5)
+        self.assertEqual(
+            self.registry.drain(), [f'foo{{i="{i}"}} {i}' for i in range(5)]
+        )
+
+    def test_evict_idle_series(self) -> None:
+        registry = SeriesRegistry(PrometheusClient.format_query, max_idle_polls=1)
+        for i in range(3):
+            registry.set("foo", {"i": i}, i, None)
+        registry.drain()
+
+        # Keep writing a single series until the others are evicted
+        for _ in range(3):
+            registry.set("foo", {"i": 2}, 2, None)
+            registry.drain()
+
+        self.assertEqual(len(registry._series), 1)
+        registry.set("foo", {"i": 0}, 0, None)
+        registry.set("foo", {"i": 2}, 2, None)
+        self.assertEqual(registry.drain(), ['foo{i="2"} 2', 'foo{i="0"} 0'])
+
+    def test_drain_lazily_snapshot(self) -> None:
+        registry = SeriesRegistry(PrometheusClient.format_query, max_idle_polls=0)
+        for i in range(3):
+            registry.set("foo", {"i": i}, i, None)
+        registry.drain()
+
+        # Writes made while the lines are consumed belong to the next scrape, and
+        # evicting the idle series does not change the rendered snapshot
+        registry.set("foo", {"i": 1}, 10, None)
+        lines = registry.drain_lazily(chunk_size=1)
+        registry.set("foo", {"i": 1}, 11, None)
+        registry.set("foo", {"i": 3}, 3, None)
+        self.assertEqual(list(lines), ['foo{i="1"} 10'])
+        self.assertEqual(registry.drain(), ['foo{i="1"} 11', 'foo{i="3"} 3'])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import json
+import os
+import tempfile
+from typing import Dict
+
+import asynctest
+from aiohttp.test_utils import make_mocked_request
+from tglib import routes
+from tglib.exceptions import RestartRequiredError
+from tglib.utils import reload
+
+
+class ReloadTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        reload._listeners = []
+        self.config = {"pipelines": {"a": {"period_s": 60}}, "num_consumers": 2}
+        self.callback = asynctest.CoroutineMock()
+        reload.on_config_change(self.callback, "pipelines.a", "thresholds")
+
+    async def tearDown(self) -> None:
+        reload._listeners = []
+
+    async def test_apply_config_change(self) -> None:
+        self.assertTrue(await reload.apply_config_change(self.config, self.config))
+        self.callback.assert_not_called()
+
+        new_config = {**self.config, "pipelines": {"a": {"period_s": 30}}}
+        self.assertTrue(await reload.apply_config_change(self.config, new_config))
+        self.callback.assert_called_once_with(
+            new_config, {("pipelines", "a", "period_s"): (60, 30)}
+        )
+
+        # A change that no callback covers needs a restart
+        new_config["num_consumers"] = 3
+        self.assertFalse(await reload.apply_config_change(self.config, new_config))
+        self.assertEqual(self.callback.call_count, 1)
+
+    async def test_apply_config_change_error(self) -> None:
+        self.callback.side_effect = ValueError()
+        new_config = {**self.config, "thresholds": {"snr": 10}}
+        self.assertFalse(await reload.apply_config_change(self.config, new_config))
+
+        with self.assertRaises(ValueError):
+            reload.on_config_change(self.callback)
+
+    async def test_apply_config_change_restart_required(self) -> None:
+        self.callback.side_effect = RestartRequiredError()
+        new_config = {**self.config, "thresholds": {"snr": 10}}
+        with self.assertLogs(level="INFO") as logs:
+            self.assertFalse(await reload.apply_config_change(self.config, new_config))
+        self.assertIn("requires a restart", logs.output[0])
+
+    async def test_update_config_route(self) -> None:
+        app: Dict = {"shutdown_event": asyncio.Event()}
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.chdir(tmpdir)
+            try:
+                with open("service_config.json", "w") as f:
+                    json.dump(self.config, f)
+
+                request = make_mocked_request("PATCH", "/config", app=app)
+                request.json = asynctest.CoroutineMock(
+                    return_value={"config": {"pipelines": {"a": {"period_s": 30}}}}
+                )
+                await routes.handle_update_config(request)
+                self.callback.assert_called_once()
+                self.assertFalse(app["shutdown_event"].is_set())
+
+                request.json.return_value = {"config": {"num_consumers": 3}}
+                await routes.handle_update_config(request)
+                self.assertTrue(app["shutdown_event"].is_set())
+
+                with open("service_config.json") as f:
+                    config = json.load(f)
+                self.assertEqual(config["pipelines"]["a"]["period_s"], 30)
+                self.assertEqual(config["num_consumers"], 3)
+            finally:
+                os.chdir(cwd)
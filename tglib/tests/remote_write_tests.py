@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import struct
+import unittest
+from typing import Any
+from unittest import mock
+
+import asynctest
+from tglib.utils.remote_write import _SNAPPY_ENABLED, RemoteWriter, encode_write_request
+
+
+class RemoteWriteTests(asynctest.TestCase):
+    def test_encode_write_request(self) -> None:
+        labels = (("__name__", "foo"), ("a", "b"))
+        encoded = encode_write_request([(labels, 2000, 2.0), (labels, 1000, 1.0)])
+
+        def label(name: bytes, value: bytes) -> bytes:
+            payload = b"\x0a" + bytes([len(name)]) + name
+            payload += b"\x12" + bytes([len(value)]) + value
+            return b"\x0a" + bytes([len(payload)]) + payload
+
+        def sample(value: float, timestamp: bytes) -> bytes:
+            payload = b"\x09" + struct.pack("<d", value) + b"\x10" + timestamp
+            return b"\x12" + bytes([len(payload)]) + payload
+
+        # Samples are grouped by series and sorted by timestamp (varint encoded)
+        timeseries = label(b"__name__", b"foo") + label(b"a", b"b")
+        timeseries += sample(1.0, b"\xe8\x07") + sample(2.0, b"\xd0\x0f")
+        self.assertEqual(encoded, b"\x0a" + bytes([len(timeseries)]) + timeseries)
+
+    @unittest.skipUnless(_SNAPPY_ENABLED, "requires python-snappy")
+    async def test_flush_retry(self) -> None:
+        session = mock.Mock()
+        resp = mock.Mock()
+        session.post.return_value.__aenter__ = asynctest.CoroutineMock(
+            return_value=resp
+        )
+        session.post.return_value.__aexit__ = asynctest.CoroutineMock(
+            return_value=False
+        )
+        writer = RemoteWriter("http://localhost/write", session, batch_size=2)
+        for i in range(3):
+            writer.enqueue("foo", {"a": i, "b": True}, i, 1000)
+
+        # Server errors are retried and keep the batch in the queue
+        resp.status = 503
+        self.assertFalse(await writer.flush())
+        self.assertEqual(len(writer._queue), 3)
+        self.assertEqual(writer.stats["sent"], 0)
+
+        resp.status = 204
+        self.assertTrue(await writer.flush())
+        self.assertEqual(session.post.call_count, 3)
+        self.assertEqual(writer.stats, {"sent": 3, "failed": 0, "dropped": 0})
+
+        # Rejected requests are not retried
+        writer.enqueue("foo", {}, 1, 1000)
+        resp.status = 400
+        self.assertTrue(await writer.flush())
+        self.assertEqual(writer.stats["failed"], 1)
+
+    @unittest.skipUnless(_SNAPPY_ENABLED, "requires python-snappy")
+    async def test_stop_in_flight(self) -> None:
+        session = mock.Mock()
+        resp = mock.Mock(status=204)
+
+        async def post(*args: Any) -> mock.Mock:
+            # The first request hangs until the sender is cancelled
+            if session.post.call_count == 1:
+                await asyncio.sleep(10)
+            return resp
+
+        session.post.return_value.__aenter__ = post
+        session.post.return_value.__aexit__ = asynctest.CoroutineMock(
+            return_value=False
+        )
+        writer = RemoteWriter("http://localhost/write", session, batch_size=2)
+        writer.start()
+        for i in range(2):
+            writer.enqueue("foo", {}, i, 1000)
+        await asyncio.sleep(0.05)
+
+        # The in-flight batch is sent again by the final flush
+        await writer.stop()
+        self.assertEqual(session.post.call_count, 2)
+        self.assertEqual(writer.stats["sent"], 2)
+        self.assertEqual(len(writer._queue), 0)
+
+    @unittest.skipUnless(_SNAPPY_ENABLED, "requires python-snappy")
+    async def test_max_queue_size(self) -> None:
+        writer = RemoteWriter("http://localhost/write", mock.Mock(), max_queue_size=2)
+        for i in range(3):
+            writer.enqueue("foo", {}, i, i)
+
+        self.assertEqual([sample[1] for sample in writer._queue], [1, 2])
+        self.assertEqual(writer.stats["dropped"], 1)
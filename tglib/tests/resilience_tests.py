@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+
+import aiohttp
+import asynctest
+from tglib.exceptions import CircuitOpenError, ClientRuntimeError, ConfigError
+from tglib.utils.resilience import CircuitBreaker, ResiliencePolicy, RetryBudget
+
+
+def transport_error() -> ClientRuntimeError:
+    error = ClientRuntimeError()
+    error.__cause__ = aiohttp.ClientConnectionError()
+    return error
+
+
+class ResiliencePolicyTests(asynctest.TestCase):
+    def test_from_config(self) -> None:
+        policy = ResiliencePolicy.from_config(
+            "foo", "host", {"max_retries": 3, "hedge_after_s": 0.5}
+        )
+        self.assertEqual(policy.max_retries, 3)
+        self.assertEqual(policy.hedge_after_s, 0.5)
+        self.assertEqual(policy.breaker.failure_threshold, 5)
+
+        for params in [
+            {"max_retries": 1.5},
+            {"retry_backoff_s": -1},
+            {"hedge_after_s": "1s"},
+            {"circuit_failure_threshold": 0},
+        ]:
+            with self.assertRaises(ConfigError):
+                ResiliencePolicy.from_config("foo", "host", params)
+
+    @asynctest.patch("time.monotonic", return_value=100)
+    def test_retry_budget(self, patched_time_monotonic) -> None:
+        budget = RetryBudget(ratio=0.5, min_per_s=1, max_balance=2)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+        # Two requests pay for a retry
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+        # The balance refills over time, up to the maximum
+        patched_time_monotonic.return_value = 110
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+    @asynctest.patch("time.monotonic", return_value=100)
+    def test_circuit_breaker(self, patched_time_monotonic) -> None:
+        breaker = CircuitBreaker("foo", "host", failure_threshold=2, reset_timeout_s=30)
+        breaker.record_failure("a")
+        breaker.check("a")
+        breaker.record_failure("a")
+        with self.assertRaises(CircuitOpenError):
+            breaker.check("a")
+        breaker.check("b")
+
+        # A single probe is let through once the timeout passes
+        patched_time_monotonic.return_value = 130
+        breaker.check("a")
+        with self.assertRaises(CircuitOpenError):
+            breaker.check("a")
+
+        # A failed probe opens the circuit again, a successful one closes it
+        breaker.record_failure("a")
+        with self.assertRaises(CircuitOpenError):
+            breaker.check("a")
+        patched_time_monotonic.return_value = 160
+        breaker.check("a")
+        breaker.record_success("a")
+        self.assertFalse(breaker.is_open("a"))
+        breaker.check("a")
+
+    async def test_retry(self) -> None:
+        policy = ResiliencePolicy("foo", "host", max_retries=2, backoff_s=0)
+        func = asynctest.CoroutineMock(side_effect=[transport_error(), "ok"])
+        self.assertEqual(await policy.run("a", func), "ok")
+        self.assertEqual(func.call_count, 2)
+
+        # Non-idempotent requests and non-transient errors are not retried
+        func = asynctest.CoroutineMock(side_effect=[transport_error(), "ok"])
+        with self.assertRaises(ClientRuntimeError):
+            await policy.run("a", func, idempotent=False)
+        func = asynctest.CoroutineMock(side_effect=[ClientRuntimeError(), "ok"])
+        with self.assertRaises(ClientRuntimeError):
+            await policy.run("a", func)
+
+        # Neither are the errors excluded by the caller
+        func = asynctest.CoroutineMock(side_effect=[transport_error(), "ok"])
+        with self.assertRaises(ClientRuntimeError):
+            await policy.run("a", func, transient=lambda error: False)
+        func.assert_called_once()
+        self.assertFalse(policy.breaker.is_open("a"))
+
+    async def test_retry_failed_response(self) -> None:
+        policy = ResiliencePolicy("foo", "host", max_retries=1, backoff_s=0)
+        func = asynctest.CoroutineMock(return_value={"errorType": "timeout"})
+        response = await policy.run(
+            "a", func, is_failure=lambda response: "errorType" in response
+        )
+        self.assertEqual(response, {"errorType": "timeout"})
+        self.assertEqual(func.call_count, 2)
+
+    async def test_retry_budget_exhausted(self) -> None:
+        budget = RetryBudget(ratio=0, min_per_s=0)
+        policy = ResiliencePolicy("foo", "host", 5, 0, budget=budget)
+        func = asynctest.CoroutineMock(side_effect=[transport_error(), "ok"])
+        with self.assertRaises(ClientRuntimeError):
+            await policy.run("a", func)
+        func.assert_called_once()
+
+    async def test_hedge(self) -> None:
+        calls = []
+
+        async def func() -> int:
+            calls.append(len(calls))
+            # The first try hangs, the hedged one returns immediately
+            if len(calls) == 1:
+                await asyncio.sleep(10)
+            return len(calls)
+
+        policy = ResiliencePolicy("foo", "host", hedge_after_s=0.01)
+        self.assertEqual(await asyncio.wait_for(policy.run("a", func), 1), 2)
+        self.assertEqual(calls, [0, 1])
+
+        # Errors that are not transient fail the request without waiting for the
+        # hedged try
+        async def timeout() -> int:
+            calls.append(len(calls))
+            if len(calls) == 1:
+                await asyncio.sleep(0.02)
+                raise transport_error()
+            await asyncio.sleep(10)
+            return len(calls)
+
+        calls.clear()
+        policy = ResiliencePolicy("foo", "host", hedge_after_s=0.01)
+        with self.assertRaises(ClientRuntimeError):
+            await asyncio.wait_for(
+                policy.run("a", timeout, transient=lambda error: False), 1
+            )
+        self.assertEqual(calls, [0, 1])
+
+        # Non-idempotent requests are never hedged
+        calls.clear()
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(policy.run("a", func, idempotent=False), 0.05)
+        self.assertEqual(calls, [0])
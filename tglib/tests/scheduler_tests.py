@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import List
+
+import asynctest
+from tglib.utils.metrics import collect_all
+from tglib.utils.scheduler import Scheduler, Timing, job_options
+
+
+def runs(job: str, status: str) -> float:
+    for name, labels, value in collect_all():
+        if name == "tglib_scheduler_job_runs_total" and labels == {
+            "job": job,
+            "status": status,
+        }:
+            return value
+    return 0
+
+
+class SchedulerTests(asynctest.TestCase):
+    async def run_for(self, scheduler: Scheduler, duration_s: float) -> None:
+        task = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(duration_s)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    def test_invalid_options(self) -> None:
+        scheduler = Scheduler()
+        with self.assertRaises(ValueError):
+            scheduler.add_job("foo", print, 0)
+        with self.assertRaises(ValueError):
+            scheduler.add_job("foo", print, 1, deadline_s=0)
+        with self.assertRaises(ValueError):
+            scheduler.add_job("foo", print, 1, jitter_s=-1)
+        with self.assertRaises(ValueError):
+            job_options({"timing": "sometimes"})
+
+        self.assertEqual(job_options({})["timing"], Timing.FIXED_RATE)
+
+    async def test_fixed_rate(self) -> None:
+        start_times: List[float] = []
+
+        async def job(start_time: float, value: int) -> None:
+            self.assertEqual(value, 1)
+            start_times.append(start_time)
+
+        scheduler = Scheduler()
+        scheduler.add_job("fixed_rate", job, 0.05, params={"value": 1})
+        await self.run_for(scheduler, 0.175)
+
+        self.assertEqual(len(start_times), 4)
+        for prev, curr in zip(start_times, start_times[1:]):
+            self.assertAlmostEqual(curr - prev, 0.05)
+        self.assertEqual(runs("fixed_rate", "success"), 4)
+
+    async def test_skip_if_running(self) -> None:
+        started = 0
+
+        async def job(start_time: float) -> None:
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0.12)
+
+        scheduler = Scheduler()
+        scheduler.add_job("skip", job, 0.05)
+        await self.run_for(scheduler, 0.175)
+
+        # The runs at 0.05s and 0.1s are skipped while the first run is going
+        self.assertEqual(started, 2)
+        self.assertEqual(runs("skip", "skipped"), 2)
+
+    async def test_overlap(self) -> None:
+        started = 0
+
+        async def job(start_time: float) -> None:
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0.12)
+
+        scheduler = Scheduler()
+        scheduler.add_job("overlap", job, 0.05, skip_if_running=False)
+        await self.run_for(scheduler, 0.175)
+        self.assertEqual(started, 4)
+
+    async def test_fixed_delay(self) -> None:
+        started = 0
+
+        async def job(start_time: float) -> None:
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0.05)
+
+        scheduler = Scheduler()
+        scheduler.add_job("fixed_delay", job, 0.05, Timing.FIXED_DELAY)
+        await self.run_for(scheduler, 0.175)
+        self.assertEqual(started, 2)
+
+    async def test_deadline(self) -> None:
+        cancelled = asyncio.Event()
+
+        async def job(start_time: float) -> None:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        scheduler = Scheduler()
+        scheduler.add_job("deadline", job, 1, deadline_s=0.01)
+        await self.run_for(scheduler, 0.05)
+
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(runs("deadline", "timeout"), 1)
+
+    async def test_error(self) -> None:
+        def job(start_time: float) -> None:
+            raise RuntimeError("foo")
+
+        scheduler = Scheduler()
+        scheduler.add_job("error", job, 0.05)
+        await self.run_for(scheduler, 0.075)
+        self.assertEqual(runs("error", "error"), 2)
+
+    async def test_executor(self) -> None:
+        threads = set()
+
+        def job(start_time: float) -> None:
+            threads.add(threading.get_ident())
+
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            scheduler = Scheduler()
+            scheduler.add_job("executor", job, 1, executor=executor)
+            await self.run_for(scheduler, 0.05)
+
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    async def test_max_concurrency(self) -> None:
+        active = 0
+        peak = 0
+
+        async def job(start_time: float) -> None:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+
+        scheduler = Scheduler(max_concurrency=1)
+        for i in range(3):
+            scheduler.add_job(f"concurrency{i}", job, 1)
+        await self.run_for(scheduler, 0.1)
+        self.assertEqual(peak, 1)
+        self.assertEqual(sum(runs(f"concurrency{i}", "success") for i in range(3)), 3)
+
+    async def test_update_job(self) -> None:
+        calls = []
+
+        async def job(start_time: float, value: int) -> None:
+            calls.append(value)
+
+        scheduler = Scheduler()
+        scheduler.add_job("update", job, 10, params={"value": 1})
+        task = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.01)
+
+        # The new period and params apply from the next run
+        scheduler.update_job("update", 0.05, params={"value": 2})
+        await asyncio.sleep(0.01)
+        self.assertEqual(calls, [1])
+        with self.assertRaises(KeyError):
+            scheduler.update_job("foo", 1)
+        with self.assertRaises(ValueError):
+            scheduler.update_job("update", 0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
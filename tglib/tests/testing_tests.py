@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import collections
+
+import asynctest
+import numpy as np
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, select
+from tglib import clients
+from tglib.clients import (
+    APIServiceClient,
+    KafkaConsumer,
+    KafkaProducer,
+    MySQLClient,
+    PrometheusClient,
+)
+from tglib.testing import (
+    FakeAPIService,
+    FakeBackends,
+    FakeKafka,
+    FakeMySQL,
+    FakePrometheus,
+    benchmark,
+    generate_topology,
+)
+from tglib.testing.startup import measure_startup
+from tglib.testing.topology import NODE_TYPE_CN
+
+
+class TopologyTests(asynctest.TestCase):
+    def test_generate_topology(self) -> None:
+        topology = generate_topology(num_sites=50, num_links=80, cn_fraction=0.2)
+        self.assertEqual(len(topology["sites"]), 50)
+        self.assertEqual(len(topology["links"]), 80)
+        self.assertEqual(topology, generate_topology(num_sites=50, num_links=80))
+
+        # 10 CN sites with a single node, and 40 DN sites with 4 nodes
+        nodes = {node["name"]: node for node in topology["nodes"]}
+        cns = [node for node in nodes.values() if node["node_type"] == NODE_TYPE_CN]
+        self.assertEqual(len(nodes), 10 + 40 * 4)
+        self.assertEqual(len(cns), 10)
+
+        # Every link is unique and every site is connected
+        self.assertEqual(len({link["name"] for link in topology["links"]}), 80)
+        linked_sites = set()
+        degrees: collections.Counter = collections.Counter()
+        for link in topology["links"]:
+            for end in ("a", "z"):
+                node = nodes[link[f"{end}_node_name"]]
+                self.assertEqual(link[f"{end}_node_mac"], node["mac_addr"])
+                linked_sites.add(node["site_name"])
+                degrees[node["name"]] += 1
+        self.assertEqual(len(linked_sites), 50)
+        self.assertTrue(all(degrees[node["name"]] == 1 for node in cns))
+        self.assertGreater(max(degrees.values()), 1)
+
+    def test_generate_topology_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            generate_topology(num_sites=10, num_links=5)
+        with self.assertRaises(ValueError):
+            generate_topology(num_sites=10, num_links=100)
+
+
+class FakePrometheusTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        topology = generate_topology(num_sites=10, num_links=12)
+        self.prometheus = FakePrometheus(
+            {"A": topology},
+            {"rssi": lambda labels, ts: np.full(len(ts), -60.5)},
+        )
+        await self.prometheus.start()
+        await PrometheusClient.start(self.prometheus.config)
+        self.client = PrometheusClient(timeout=1)
+
+    async def tearDown(self) -> None:
+        await PrometheusClient.stop()
+        await self.prometheus.stop()
+
+    async def test_query_range(self) -> None:
+        query = self.client.format_query("rssi", {"linkDirection": "A"})
+        response = await self.client.query_range(query, "30s", 1000, 1090)
+        results = response["data"]["result"]
+        self.assertEqual(len(results), 12)
+        self.assertEqual(results[0]["metric"]["__name__"], "rssi")
+        self.assertEqual(results[0]["metric"]["linkDirection"], "A")
+        self.assertEqual(
+            results[0]["values"], [[t, "-60.5"] for t in (1000, 1030, 1060, 1090)]
+        )
+        # The data and timestamp queries
+        self.assertEqual(self.prometheus.requests["/api/v1/query_range"], 2)
+
+    async def test_query_latest(self) -> None:
+        link_name = self.prometheus.label_sets[0]["linkName"]
+        query = (
+            f'label_replace(timestamp(snr{{linkName="{link_name}"}}[1m]), '
+            '"name", "$1", "linkName", "link-(.*)") or '
+            f'max by (linkName) (snr{{linkName="{link_name}"}})'
+        )
+        response = await self.client.query_latest(query, 1045)
+        results = response["data"]["result"]
+        self.assertEqual(len(results), 4)
+        stamped = [result for result in results if "name" in result["metric"]]
+        self.assertEqual(len(stamped), 2)
+        for result in stamped:
+            self.assertNotIn("__name__", result["metric"])
+            self.assertEqual(result["metric"]["name"], link_name.replace("link-", ""))
+            self.assertEqual(result["value"], [1045, "1020"])
+
+        # Repeated queries return the same values between scrapes
+        query = f'snr{{linkName="{link_name}", linkDirection="Z"}}'
+        first = await self.client.query_latest(query, 1021)
+        second = await self.client.query_latest(query, 1049)
+        self.assertEqual(
+            first["data"]["result"][0]["value"][1],
+            second["data"]["result"][0]["value"][1],
+        )
+
+    async def test_query_unsupported(self) -> None:
+        response = await self.client.query_latest("rssi + snr")
+        self.assertEqual(response["status"], "error")
+
+
+class FakeAPIServiceTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        self.topologies = {
+            "A": generate_topology("A", num_sites=5, num_links=5),
+            "B": generate_topology("B", num_sites=5, num_links=5, seed=1),
+        }
+        self.api_service = FakeAPIService(
+            self.topologies,
+            {"getCtrlConfig": lambda network_name, params: {"name": network_name}},
+        )
+        await self.api_service.start()
+        await APIServiceClient.start(self.api_service.config)
+        self.client = APIServiceClient(timeout=1)
+
+    async def tearDown(self) -> None:
+        await APIServiceClient.stop()
+        await self.api_service.stop()
+
+    async def test_request(self) -> None:
+        self.assertEqual(list(APIServiceClient.network_names()), ["A", "B"])
+        self.assertEqual(await self.client.request_all("getTopology"), self.topologies)
+        self.assertEqual(await self.client.request("B", "getCtrlConfig"), {"name": "B"})
+        self.assertTrue(await APIServiceClient.healthcheck())
+        self.assertEqual(self.api_service.requests[("A", "getTopology")], 1)
+
+    async def test_workers(self) -> None:
+        async with FakeAPIService(self.topologies, workers=2) as api_service:
+            await APIServiceClient.stop()
+            await APIServiceClient.start(api_service.config)
+            self.assertEqual(
+                await self.client.request("A", "getTopology"), self.topologies["A"]
+            )
+
+        # The requests are counted in the worker processes
+        self.assertEqual(api_service.requests, {})
+
+
+class FakeKafkaTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        self.kafka = FakeKafka()
+        self.kafka.install()
+
+    async def tearDown(self) -> None:
+        self.kafka.uninstall()
+
+    async def test_produce_consume(self) -> None:
+        consumer = KafkaConsumer().consumer
+        consumer.subscribe(["events"])
+        self.assertEqual(await consumer.getmany(timeout_ms=10), {})
+
+        fetch = asyncio.ensure_future(consumer.getmany(timeout_ms=1000))
+        await asyncio.sleep(0)
+        self.assertTrue(await KafkaProducer().send_data("events", b"a"))
+        self.assertTrue(await KafkaProducer().send_data("events", b"b"))
+        batches = await fetch
+        records = [record for batch in batches.values() for record in batch]
+        self.assertEqual([record.value for record in records], [b"a", b"b"])
+        self.assertEqual(records[-1].offset, 1)
+
+    async def test_consume(self) -> None:
+        handled = []
+
+        async def handler(record):
+            handled.append(record.value)
+            if len(handled) == 3:
+                consume.cancel()
+
+        KafkaConsumer._group_id = "test"
+        KafkaConsumer().consumer.subscribe(["events"])
+        for value in (b"a", b"b", b"c"):
+            await KafkaProducer().send_data("events", value)
+
+        consume = asyncio.ensure_future(KafkaConsumer().consume(handler))
+        with self.assertRaises(asyncio.CancelledError):
+            await consume
+        self.assertEqual(handled, [b"a", b"b", b"c"])
+        KafkaConsumer._group_id = None
+
+
+class FakeMySQLTests(asynctest.TestCase):
+    async def setUp(self) -> None:
+        metadata = MetaData()
+        self.table = Table(
+            "test",
+            metadata,
+            Column("id", Integer, primary_key=True),
+            Column("name", String(255)),
+        )
+        self.mysql = FakeMySQL(metadata)
+        self.mysql.install()
+
+    async def tearDown(self) -> None:
+        self.mysql.uninstall()
+
+    async def test_lease(self) -> None:
+        client = MySQLClient()
+        self.assertEqual(await client.bulk_insert(self.table, [{"name": "a"}] * 5), 5)
+        async with client.lease() as sa_conn:
+            cursor = await sa_conn.execute(insert(self.table).values(name="b"))
+            await sa_conn.connection.commit()
+            self.assertEqual(cursor.lastrowid, 6)
+
+            cursor = await sa_conn.execute(select([self.table.c.name]))
+            rows = await cursor.fetchall()
+            self.assertEqual([row.name for row in rows], ["a"] * 5 + ["b"])
+
+
+class HarnessTests(asynctest.TestCase):
+    async def test_benchmark(self) -> None:
+        async def job(size: int) -> None:
+            await APIServiceClient(timeout=1).request_all("getTopology")
+            await asyncio.sleep(0)
+            bytes(size)
+
+        async with FakeBackends.from_size(2, num_sites=10, num_links=10) as backends:
+            result = await benchmark(job, rounds=3, warmup=1, size=1 << 20)
+            self.assertEqual(
+                backends.api_service.requests[("network-1", "getTopology")], 5
+            )
+
+        self.assertEqual(len(result.latencies_s), 3)
+        self.assertGreaterEqual(result.peak_memory_bytes, 1 << 20)
+        self.assertIn("job", result.format())
+        self.assertIsNone(PrometheusClient._session)
+        self.assertIsNone(PrometheusClient._metrics)
+        self.assertIsNone(MySQLClient._engine)
+
+
+class StartupTests(asynctest.TestCase):
+    def test_lazy_clients(self) -> None:
+        self.assertIs(clients.KafkaConsumer, KafkaConsumer)
+        self.assertIn("MySQLClient", dir(clients))
+        with self.assertRaises(AttributeError):
+            clients.RedisClient
+
+    def test_measure_startup(self) -> None:
+        result = measure_startup("tglib", rounds=1, warmup=0)
+        self.assertEqual(len(result.latencies_s), 1)
+        self.assertGreater(result.peak_memory_bytes, 0)
+        self.assertIn("tglib.main", result.modules)
+
+        # The drivers of unused clients are never imported
+        self.assertNotIn("aiokafka", result.modules)
+        self.assertNotIn("aiomysql", result.modules)
+        self.assertIn("median_import", result.format())
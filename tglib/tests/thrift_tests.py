@@ -5,10 +5,27 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import json
 import unittest
 
-from terragraph_thrift.Topology.ttypes import Node, NodeStatusType, NodeType
-from tglib.utils.thrift import binary2thrift, json2thrift, thrift2binary, thrift2json
+from terragraph_thrift.Topology.ttypes import (
+    Link,
+    Node,
+    NodeStatusType,
+    NodeType,
+    Topology,
+    Zone,
+)
+from thrift.protocol import TBinaryProtocol, TJSONProtocol
+from thrift.transport import TTransport
+from tglib.utils.thrift import (
+    binary2thrift,
+    dict2thrift,
+    json2thrift,
+    thrift2binary,
+    thrift2dict,
+    thrift2json,
+)
 
 
 class ThriftTests(unittest.TestCase):
@@ -44,3 +61,34 @@ class ThriftTests(unittest.TestCase):
         output = thrift2json(self.node)
         self.assertIsInstance(output, bytes)
         self.assertEqual(json2thrift(Node, output), self.node)
+
+    def test_binary_matches_pure_python_protocol(self) -> None:
+        transport = TTransport.TMemoryBuffer()
+        self.node.write(TBinaryProtocol.TBinaryProtocol(transport))
+        self.assertEqual(thrift2binary(self.node), transport.getvalue())
+
+    def test_dict(self) -> None:
+        self.assertEqual(thrift2dict(self.empty), {})
+        self.assertEqual(dict2thrift(Node, {}), self.empty)
+
+        link = Link()
+        link.name = "link"
+        link.is_alive = True
+        topology = Topology()
+        topology.name = "topology"
+        topology.nodes = [self.node]
+        topology.links = [link]
+
+        # The output matches the TSimpleJSONProtocol encoding without the JSON step
+        transport = TTransport.TMemoryBuffer()
+        topology.write(TJSONProtocol.TSimpleJSONProtocol(transport))
+        output = thrift2dict(topology)
+        self.assertEqual(output, json.loads(transport.getvalue()))
+        self.assertEqual(dict2thrift(Topology, output), topology)
+
+    def test_dict_set(self) -> None:
+        zone = Zone()
+        zone.node_names = {"a", "b"}
+        output = thrift2dict(zone)
+        self.assertCountEqual(output["node_names"], ["a", "b"])
+        self.assertEqual(dict2thrift(Zone, output), zone)
@@ -5,6 +5,17 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+"""The tglib clients.
+
+The client modules are imported on first access, so that a service only pays the
+import time and memory of the drivers (e.g. ``aiokafka``, ``aiomysql``) of the
+clients that it actually uses.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+
 __all__ = [
     "APIServiceClient",
     "BaseClient",
@@ -14,9 +25,34 @@ __all__ = [
     "PrometheusClient",
 ]
 
-from .api_service_client import APIServiceClient
-from .base_client import BaseClient
-from .kafka_consumer import KafkaConsumer
-from .kafka_producer import KafkaProducer
-from .mysql_client import MySQLClient
-from .prometheus_client import PrometheusClient
+_MODULES = {
+    "APIServiceClient": "api_service_client",
+    "BaseClient": "base_client",
+    "KafkaConsumer": "kafka_consumer",
+    "KafkaProducer": "kafka_producer",
+    "MySQLClient": "mysql_client",
+    "PrometheusClient": "prometheus_client",
+}
+
+if TYPE_CHECKING:
+    from .api_service_client import APIServiceClient
+    from .base_client import BaseClient
+    from .kafka_consumer import KafkaConsumer
+    from .kafka_producer import KafkaProducer
+    from .mysql_client import MySQLClient
+    from .prometheus_client import PrometheusClient
+
+
+def __getattr__(name: str) -> Any:
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # Cache the client so that later lookups skip this function
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + __all__)
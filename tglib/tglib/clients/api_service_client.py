@@ -6,10 +6,15 @@
 # LICENSE file in the root directory of this source tree.
 
 import asyncio
+import dataclasses
+import hashlib
+import json
 import logging
 import os
+import re
 import time
-from typing import Any, Collection, Dict, Optional, cast
+from functools import partial
+from typing import Any, Awaitable, Callable, Collection, Dict, List, Optional, cast
 
 import aiohttp
 
@@ -20,14 +25,55 @@ from ..exceptions import (
     ConfigError,
 )
 from ..utils.ip import format_address
+from ..utils.limiter import ConcurrencyLimiter
+from ..utils.metrics import Counter, Histogram
+from ..utils.resilience import ResiliencePolicy
 from .base_client import BaseClient
 
 
+_request_durations = Histogram("tglib_api_service_request_duration_seconds")
+_request_errors = Counter("tglib_api_service_request_errors_total")
+
+
+@dataclasses.dataclass
+class TopologySnapshot:
+    """A cached topology of a network.
+
+    Args:
+        topology: The ``getTopology`` response as a Python dictionary.
+        digest: The SHA-256 digest of the topology contents.
+        fetched_at: The monotonic clock time of the fetch, in seconds.
+    """
+
+    topology: Dict
+    digest: str
+    fetched_at: float
+
+
 class APIServiceClient(BaseClient):
     """A client for communicating with the Terragraph API service.
 
     The client automatically handles refreshing the JSON web token if Keycloak
-    is enabled in the network.
+    is enabled in the network. The token is renewed in the background once
+    ``token_refresh_ratio`` (0.8 by default) of its lifetime has passed, so requests
+    never wait on a refresh unless the token has already expired.
+
+    Concurrent requests are bounded per network by ``max_concurrent_requests_per_network``
+    (32 by default) and per API service host by ``max_concurrent_requests_per_host``
+    (64 by default), the rest wait in a queue. The connection pool is sized with
+    ``connection_limit`` (100 by default) and idle connections are kept alive for
+    ``keepalive_timeout_s`` seconds (30 by default).
+
+    Topologies fetched with :meth:`get_topology` and :meth:`get_topologies` are
+    shared by the whole service for ``topology_cache_ttl_s`` seconds (30 by
+    default).
+
+    Requests to endpoints matching ``idempotent_endpoints`` (``get.*|isCtrlAlive``
+    by default) are retried on transport errors, timeouts and ``5xx`` responses,
+    and hedged after ``hedge_after_s`` seconds if set. A network whose requests
+    keep failing is rejected with :exc:`~tglib.exceptions.CircuitOpenError` until
+    it recovers. See :class:`~tglib.utils.resilience.ResiliencePolicy` for the
+    tuning params.
 
     Args:
         timeout: The request timeout, in seconds.
@@ -35,10 +81,21 @@ class APIServiceClient(BaseClient):
 
     _networks: Optional[Dict[str, str]] = None
     _session: Optional[aiohttp.ClientSession] = None
+    _network_limiter: Optional[ConcurrencyLimiter] = None
+    _host_limiter: Optional[ConcurrencyLimiter] = None
+    _resilience: Optional[ResiliencePolicy] = None
+    _idempotent_endpoints: re.Pattern = re.compile("get.*|isCtrlAlive")
+    _topologies: Dict[str, TopologySnapshot] = {}
+    _topology_refreshes: Dict[str, asyncio.Future] = {}
+    _topology_listeners: List[Callable[[str, Dict], Awaitable[None]]] = []
+    _topology_ttl_s: float = 30
     # Needed for Keycloak
-    _lock: Optional[asyncio.Lock] = None
     _jwt: Dict = {}
-    _refresh_time: Optional[float] = None
+    _auth_headers: Optional[Dict[str, str]] = None
+    _token_expiry: float = 0
+    _token_refresh_ratio: float = 0.8
+    _token_refresh: Optional[asyncio.Future] = None
+    _token_task: Optional[asyncio.Task] = None
     _keycloak_enabled: bool = False
     _keycloak_host: str = os.getenv("KEYCLOAK_HOST") or "http://keycloak_keycloak:8080"
     _keycloak_realm: str = os.getenv("KEYCLOAK_REALM") or "tgnms"
@@ -73,13 +130,27 @@ class APIServiceClient(BaseClient):
         if not all(param in api_params for param in required_params):
             raise ConfigError(f"Missing one or more required params: {required_params}")
 
+        cls._start_request_policies(api_params)
+
+        token_refresh_ratio = api_params.get("token_refresh_ratio", 0.8)
+        if not 0 < token_refresh_ratio < 1:
+            raise ConfigError("Value for 'token_refresh_ratio' must be in (0, 1)")
+
         cls._keycloak_enabled = api_params["keycloak_enabled"]
-        cls._session = aiohttp.ClientSession()
-        cls._lock = asyncio.Lock()
+        cls._token_refresh_ratio = token_refresh_ratio
+        cls._topology_ttl_s = api_params.get("topology_cache_ttl_s", 30)
+        cls._topologies = {}
+        cls._topology_refreshes = {}
+        cls._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=api_params.get("connection_limit", 100),
+                keepalive_timeout=api_params.get("keepalive_timeout_s", 30),
+            )
+        )
 
         headers: Optional[Dict] = None
-        if cls._keycloak_enabled and await cls._refresh_token():
-            headers = {"Authorization": f"Bearer {cls._jwt['access_token']}"}
+        if cls._keycloak_enabled:
+            headers = await cls._start_token_refresh()
 
         try:
             url = f"http://{format_address(**api_params['nms'])}/api/v1/networks"
@@ -100,6 +171,35 @@ class APIServiceClient(BaseClient):
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             raise ClientRuntimeError(msg=f"NMS request to {url} failed") from e
 
+    @classmethod
+    def _start_request_policies(cls, api_params: Dict[str, Any]) -> None:
+        """Create the concurrency limiters and the resilience policy of requests."""
+        try:
+            cls._network_limiter = ConcurrencyLimiter(
+                "api_service",
+                "network",
+                api_params.get("max_concurrent_requests_per_network", 32),
+            )
+            cls._host_limiter = ConcurrencyLimiter(
+                "api_service",
+                "host",
+                api_params.get("max_concurrent_requests_per_host", 64),
+            )
+        except ValueError as e:
+            raise ConfigError(str(e)) from e
+
+        try:
+            idempotent_endpoints = re.compile(
+                api_params.get("idempotent_endpoints", "get.*|isCtrlAlive")
+            )
+        except (re.error, TypeError) as e:
+            raise ConfigError("Value for 'idempotent_endpoints' is invalid") from e
+
+        cls._resilience = ResiliencePolicy.from_config(
+            "api_service", "network", api_params
+        )
+        cls._idempotent_endpoints = idempotent_endpoints
+
     @classmethod
     async def stop(cls) -> None:
         """Cleanly shut down the HTTP client session pool.
@@ -110,8 +210,23 @@ class APIServiceClient(BaseClient):
         if cls._session is None:
             raise ClientStoppedError()
 
+        if cls._token_task is not None:
+            cls._token_task.cancel()
+            cls._token_task = None
+        if cls._token_refresh is not None:
+            cls._token_refresh.cancel()
+            cls._token_refresh = None
+
         await cls._session.close()
         cls._session = None
+        cls._jwt = {}
+        cls._auth_headers = None
+        cls._token_expiry = 0
+        cls._network_limiter = None
+        cls._host_limiter = None
+        cls._resilience = None
+        cls._topologies = {}
+        cls._topology_listeners = []
 
     @classmethod
     async def healthcheck(cls) -> bool:
@@ -161,8 +276,15 @@ class APIServiceClient(BaseClient):
         Raises:
             ClientStoppedError: The HTTP client session pool is not running.
             ClientRuntimeError: The request failed, timed out, or did not return ``200``.
+            CircuitOpenError: The requests to the network keep failing.
         """
-        if self._networks is None or self._session is None or self._lock is None:
+        if (
+            self._networks is None
+            or self._session is None
+            or self._network_limiter is None
+            or self._host_limiter is None
+            or self._resilience is None
+        ):
             raise ClientStoppedError()
 
         addr = self._networks.get(network_name)
@@ -171,14 +293,46 @@ class APIServiceClient(BaseClient):
 
         headers: Optional[Dict] = None
         if self._keycloak_enabled:
-            async with self._lock:
-                if time.time() > (self._refresh_time + self._jwt["expires_in"]):
-                    await self._refresh_token()
+            headers = await self._get_auth_headers()
+
+        # Controllers on the same host (e.g. distinct ports) share the host limit
+        host = addr.rsplit(":", 1)[0]
+        url = f"http://{addr}/api/{endpoint}"
+
+        labels = {"endpoint": endpoint, "network": network_name}
+        try:
+            with _request_durations.time(labels):
+                return await self._resilience.run(
+                    network_name,
+                    partial(self._send, network_name, host, url, params, headers),
+                    self._idempotent_endpoints.fullmatch(endpoint) is not None,
+                )
+        except ClientRuntimeError:
+            _request_errors.inc(labels)
+            raise
 
-                headers = {"Authorization": f"Bearer {self._jwt['access_token']}"}
+    async def _send(
+        self,
+        network_name: str,
+        host: str,
+        url: str,
+        params: Dict,
+        headers: Optional[Dict],
+    ) -> Dict:
+        """Send a single try of a request within the concurrency limits."""
+        if self._network_limiter is None or self._host_limiter is None:
+            raise ClientStoppedError()
+
+        async with self._network_limiter.acquire(network_name):
+            async with self._host_limiter.acquire(host):
+                return await self._post(url, params, headers)
+
+    async def _post(self, url: str, params: Dict, headers: Optional[Dict]) -> Dict:
+        """Send a POST request to the API service and return the JSON response."""
+        if self._session is None:
+            raise ClientStoppedError()
 
         try:
-            url = f"http://{addr}/api/{endpoint}"
             logging.debug(f"Requesting from {url} with params {params}")
 
             async with self._session.post(
@@ -187,8 +341,11 @@ class APIServiceClient(BaseClient):
                 if resp.status == 200:
                     return cast(Dict, await resp.json())
 
+                # Chain the status so that the resilience policy can classify it
                 raise ClientRuntimeError(
                     msg=f"API Service request to {url} failed: {resp.reason} ({resp.status})"
+                ) from aiohttp.ClientResponseError(
+                    resp.request_info, (), status=resp.status, message=str(resp.reason)
                 )
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             raise ClientRuntimeError(msg=f"API Service request to {url} failed") from e
@@ -274,6 +431,206 @@ class APIServiceClient(BaseClient):
             )
         )
 
+    @classmethod
+    def on_topology_change(
+        cls, callback: Callable[[str, Dict], Awaitable[None]]
+    ) -> None:
+        """Register a coroutine function to call when a network's topology changes.
+
+        The callback is invoked with the network name and the new topology whenever
+        a refresh of the topology cache yields different contents, including the
+        first fetch of each network. The callbacks run in the background once the
+        new snapshot is cached and their failures are logged. They are removed when
+        the client is stopped.
+
+        Args:
+            callback: The coroutine function to call.
+
+        Example:
+            >>> async def rebuild_link_maps(network_name: str, topology: Dict) -> None:
+            ...     ...
+            >>> APIServiceClient.on_topology_change(rebuild_link_maps)
+        """
+        cls._topology_listeners.append(callback)
+
+    @classmethod
+    def topology_digest(cls, network_name: str) -> Optional[str]:
+        """Return the content digest of the cached topology of a network.
+
+        Args:
+            network_name: The name of the network.
+
+        Returns:
+            The SHA-256 hex digest of the cached topology, or ``None`` if uncached.
+        """
+        snapshot = cls._topologies.get(network_name)
+        return snapshot.digest if snapshot is not None else None
+
+    async def get_topology(
+        self, network_name: str, max_age_s: Optional[float] = None
+    ) -> Dict:
+        """Return the topology of a network from the shared topology cache.
+
+        The topology is fetched with ``getTopology`` if the cached snapshot is older
+        than ``max_age_s``. Concurrent refreshes of the same network are coalesced
+        into a single request.
+
+        Args:
+            network_name: The name of the network.
+            max_age_s: The maximum age of the cached snapshot, in seconds.
+
+        Returns:
+            The topology as a Python dictionary.
+
+        Raises:
+            ClientStoppedError: The HTTP client session pool is not running.
+            ClientRuntimeError: The request failed, timed out, or did not return ``200``.
+
+        Attention:
+            The returned topology is shared by all of the callers and **MUST NOT** be
+            modified in place.
+
+        Note:
+            If not provided, ``max_age_s`` defaults to the ``topology_cache_ttl_s``
+            config value.
+        """
+        if max_age_s is None:
+            max_age_s = self._topology_ttl_s
+
+        snapshot = self._topologies.get(network_name)
+        if snapshot is not None and time.monotonic() - snapshot.fetched_at < max_age_s:
+            return snapshot.topology
+
+        future = self._topology_refreshes.get(network_name)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh_topology(network_name))
+            future.add_done_callback(self._topology_refresh_done(network_name))
+            self._topology_refreshes[network_name] = future
+
+        return cast(Dict, await asyncio.shield(future))
+
+    async def get_topologies(
+        self, max_age_s: Optional[float] = None, return_exceptions: bool = False
+    ) -> Dict[str, Dict]:
+        """Return the topologies of all networks from the shared topology cache.
+
+        Args:
+            max_age_s: The maximum age of the cached snapshots, in seconds.
+            return_exceptions: Flag to return exceptions as objects instead of raising.
+
+        Returns:
+            A dictionary of network names to topologies (as Python dictionaries).
+
+        Raises:
+            ClientStoppedError: The HTTP client session pool is not running.
+            ClientRuntimeError: One of the requests failed and ``return_exceptions`` is ``False``.
+
+        Attention:
+            The returned topologies are shared by all of the callers and **MUST NOT**
+            be modified in place.
+        """
+        network_names = list(self.network_names())
+        tasks = [self.get_topology(name, max_age_s) for name in network_names]
+        return dict(
+            zip(
+                network_names,
+                await asyncio.gather(*tasks, return_exceptions=return_exceptions),
+            )
+        )
+
+    async def _refresh_topology(self, network_name: str) -> Dict:
+        """Fetch a topology, update the cache, and notify listeners if it changed."""
+        topology = await self.request(network_name, "getTopology")
+        digest = hashlib.sha256(
+            json.dumps(topology, sort_keys=True).encode()
+        ).hexdigest()
+
+        prev_snapshot = self._topologies.get(network_name)
+        self._topologies[network_name] = TopologySnapshot(
+            topology, digest, time.monotonic()
+        )
+
+        # Don't hold up the callers of get_topology on the listeners
+        if prev_snapshot is None or prev_snapshot.digest != digest:
+            for callback in self._topology_listeners:
+                task = asyncio.create_task(callback(network_name, topology))
+                task.add_done_callback(self._topology_listener_done(network_name))
+
+        return topology
+
+    @classmethod
+    def _topology_refresh_done(
+        cls, network_name: str
+    ) -> Callable[[asyncio.Future], None]:
+        """Return a callback that clears a finished topology refresh."""
+
+        def callback(future: asyncio.Future) -> None:
+            cls._topology_refreshes.pop(network_name, None)
+
+            # Mark the exception as retrieved in case every caller was cancelled
+            if not future.cancelled():
+                future.exception()
+
+        return callback
+
+    @staticmethod
+    def _topology_listener_done(network_name: str) -> Callable[[asyncio.Task], None]:
+        """Return a callback that logs the failure of a topology change listener."""
+
+        def callback(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception() is not None:
+                logging.error(
+                    f"Topology change callback failed for {network_name}",
+                    exc_info=task.exception(),
+                )
+
+        return callback
+
+    @classmethod
+    async def _start_token_refresh(cls) -> Optional[Dict[str, str]]:
+        """Fetch the first JWT and start renewing it in the background."""
+        headers = await cls._get_auth_headers()
+        if headers is not None:
+            cls._token_task = asyncio.create_task(cls._token_refresh_loop())
+
+        return headers
+
+    @classmethod
+    async def _get_auth_headers(cls) -> Optional[Dict[str, str]]:
+        """Return the authorization headers, renewing the JWT only if it expired."""
+        if cls._auth_headers is not None and time.time() < cls._token_expiry:
+            return cls._auth_headers
+
+        await cls._renew_token()
+        return cls._auth_headers
+
+    @classmethod
+    async def _renew_token(cls) -> None:
+        """Refresh the JWT, sharing one in-flight refresh among all callers."""
+        if cls._token_refresh is None:
+            cls._token_refresh = asyncio.ensure_future(cls._refresh_token())
+            cls._token_refresh.add_done_callback(cls._token_refresh_done)
+
+        await asyncio.shield(cls._token_refresh)
+
+    @classmethod
+    def _token_refresh_done(cls, future: asyncio.Future) -> None:
+        cls._token_refresh = None
+
+    @classmethod
+    async def _token_refresh_loop(cls) -> None:
+        """Renew the JWT in the background before it expires."""
+        while True:
+            lifetime = cls._jwt.get("expires_in", 0) if cls._auth_headers else 0
+            renew_time = cls._token_expiry - (1 - cls._token_refresh_ratio) * lifetime
+            # Retry failed refreshes after a short delay
+            await asyncio.sleep(max(renew_time - time.time(), 5))
+
+            try:
+                await cls._renew_token()
+            except ClientRuntimeError:
+                logging.exception("Background JWT refresh failed")
+
     @classmethod
     async def _refresh_token(cls) -> bool:
         """Update the JWT value from Keycloak."""
@@ -303,8 +660,13 @@ class APIServiceClient(BaseClient):
                         f"Failed to refresh JWT: {resp.reason} ({resp.status})"
                     )
 
-                cls._refresh_time = time.time()
+                refresh_time = time.time()
                 cls._jwt = cast(Dict, await resp.json())
+                # Swap in the new token in one step so readers never need a lock
+                cls._auth_headers = {
+                    "Authorization": f"Bearer {cls._jwt['access_token']}"
+                }
+                cls._token_expiry = refresh_time + cls._jwt["expires_in"]
                 return True
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             raise ClientRuntimeError(msg="Failed to refresh JWT") from e
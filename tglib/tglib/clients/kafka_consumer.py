@@ -6,9 +6,22 @@
 # LICENSE file in the root directory of this source tree.
 
 import asyncio
-from typing import Any, Dict, Optional, cast
+import logging
+from collections import defaultdict, deque
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    DefaultDict,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    cast,
+)
 
-from aiokafka import AIOKafkaConsumer
+from aiokafka import AIOKafkaConsumer, ConsumerRecord, TopicPartition
 from aiokafka.errors import KafkaError
 
 from ..exceptions import (
@@ -17,13 +30,25 @@ from ..exceptions import (
     ClientStoppedError,
     ConfigError,
 )
+from ..utils.metrics import Counter, Histogram
 from .base_client import BaseClient
+from .prometheus_client import PrometheusClient, PrometheusMetric
+
+
+_handler_durations = Histogram("tglib_kafka_handler_duration_seconds")
+_handler_errors = Counter("tglib_kafka_handler_errors_total")
 
 
 class KafkaConsumer(BaseClient):
-    """A client for consuming records from Kafka."""
+    """A client for consuming records from Kafka.
+
+    The ``kafka`` config params are shared with the
+    :class:`~tglib.clients.kafka_producer.KafkaProducer`. Consumer-only params (e.g.
+    ``group_id``) go in the optional ``kafka_consumer`` object, which overrides them.
+    """
 
     _consumer: Optional[AIOKafkaConsumer] = None
+    _group_id: Optional[str] = None
 
     @classmethod
     async def start(cls, config: Dict[str, Any]) -> None:
@@ -50,6 +75,18 @@ class KafkaConsumer(BaseClient):
         if not all(param in kafka_params for param in required_params):
             raise ConfigError(f"Missing one or more required params: {required_params}")
 
+        consumer_params = config.get("kafka_consumer", {})
+        if not isinstance(consumer_params, dict):
+            raise ConfigError("Config value for 'kafka_consumer' is not object")
+
+        kafka_params = {**kafka_params, **consumer_params}
+        cls._group_id = kafka_params.get("group_id")
+        if cls._group_id is not None:
+            # consume() commits the offsets once the records are processed
+            if kafka_params.get("enable_auto_commit"):
+                raise ConfigError("'enable_auto_commit' cannot be used with 'group_id'")
+            kafka_params["enable_auto_commit"] = False
+
         try:
             cls._consumer = AIOKafkaConsumer(
                 loop=asyncio.get_event_loop(), **kafka_params
@@ -97,3 +134,141 @@ class KafkaConsumer(BaseClient):
             raise ClientStoppedError()
 
         return self._consumer
+
+    async def consume(
+        self,
+        handler: Callable[[ConsumerRecord], Awaitable[Any]],
+        max_in_flight: int = 100,
+        max_records: Optional[int] = None,
+        timeout_ms: int = 1000,
+    ) -> None:
+        """Consume records in batches and run ``handler`` on each with bounded concurrency.
+
+        Records are fetched with ``getmany`` and dispatched in offset order within each
+        partition. At most ``max_in_flight`` handlers run at a time; once the cap is
+        reached, all assigned partitions are paused so that no more records are
+        prefetched until a handler finishes. If the consumer belongs to a group, the
+        offset of a record is only committed once it and all of the records before
+        it in the partition are processed, so auto-commit is disabled for groups.
+
+        The consumer lag per partition is written to the
+        :class:`~tglib.clients.prometheus_client.PrometheusClient` metrics cache, if
+        it is running. The handler latency and failures per topic are exported on the
+        ``/metrics`` route.
+
+        Args:
+            handler: The coroutine function to call with each record.
+            max_in_flight: The maximum number of concurrently running handlers.
+            max_records: The maximum number of records to fetch per batch.
+            timeout_ms: The maximum time to wait for records per batch, in milliseconds.
+
+        Raises:
+            ClientStoppedError: The Kafka consumer resource is not running.
+            ValueError: The value for ``max_in_flight`` is not a positive integer.
+
+        Note:
+            Exceptions raised by ``handler`` are logged and the record is treated as
+            processed. The method runs until it is cancelled, and then waits for the
+            running handlers and commits their offsets before exiting.
+
+        Example:
+            >>> async def handle(record: ConsumerRecord) -> None:
+            ...     print(record.value.decode("utf-8"))
+            >>> consumer = KafkaConsumer()
+            >>> consumer.consumer.subscribe(["events"])
+            >>> await consumer.consume(handle, max_in_flight=10)
+        """
+        if max_in_flight < 1:
+            raise ValueError(
+                f"max_in_flight must be a positive integer: {max_in_flight}"
+            )
+
+        consumer = self.consumer
+        slots = asyncio.Semaphore(max_in_flight)
+        # Dispatched offsets in order and the processed ones, per partition
+        pending: DefaultDict[TopicPartition, Deque[int]] = defaultdict(deque)
+        done: DefaultDict[TopicPartition, Set[int]] = defaultdict(set)
+        committable: Dict[TopicPartition, int] = {}
+        tasks: Set[asyncio.Task] = set()
+
+        async def run(tp: TopicPartition, record: ConsumerRecord) -> None:
+            labels = {"topic": tp.topic}
+            try:
+                with _handler_durations.time(labels):
+                    await handler(record)
+            except Exception:
+                logging.exception(f"Failed to handle record {tp}@{record.offset}")
+                _handler_errors.inc(labels)
+            finally:
+                slots.release()
+
+                # Advance the committable offset past the processed prefix
+                done[tp].add(record.offset)
+                while pending[tp] and pending[tp][0] in done[tp]:
+                    offset = pending[tp].popleft()
+                    done[tp].remove(offset)
+                    committable[tp] = offset + 1
+
+        try:
+            while True:
+                batches = await consumer.getmany(
+                    timeout_ms=timeout_ms, max_records=max_records
+                )
+                for tp, records in batches.items():
+                    for record in records:
+                        if slots.locked():
+                            # Stop prefetching until a handler finishes
+                            paused = consumer.assignment()
+                            consumer.pause(*paused)
+                            await slots.acquire()
+                            consumer.resume(*(paused & consumer.assignment()))
+                        else:
+                            await slots.acquire()
+
+                        pending[tp].append(record.offset)
+                        task = asyncio.create_task(run(tp, record))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+
+                to_commit, committable = committable, {}
+                await self._commit(consumer, to_commit)
+                self._write_metrics(consumer, batches)
+        except asyncio.CancelledError:
+            # Drain the running handlers so that their records are not reprocessed
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await self._commit(consumer, committable)
+            raise
+
+    async def _commit(
+        self, consumer: AIOKafkaConsumer, offsets: Dict[TopicPartition, int]
+    ) -> None:
+        """Commit the processed offsets if the consumer belongs to a group."""
+        if not offsets or self._group_id is None:
+            return
+
+        try:
+            await consumer.commit(offsets)
+        except KafkaError:
+            logging.exception(f"Failed to commit offsets: {offsets}")
+
+    def _write_metrics(
+        self,
+        consumer: AIOKafkaConsumer,
+        batches: Dict[TopicPartition, List[ConsumerRecord]],
+    ) -> None:
+        """Write the consumer lag metrics to the metrics cache."""
+        if PrometheusClient._metrics is None:
+            return
+
+        metrics: List[PrometheusMetric] = []
+        for tp, records in batches.items():
+            highwater = consumer.highwater(tp)
+            if records and highwater is not None:
+                labels = {"topic": tp.topic, "partition": tp.partition}
+                lag = highwater - records[-1].offset - 1
+                metrics.append(
+                    PrometheusMetric("tglib_kafka_consumer_lag", labels, lag)
+                )
+
+        PrometheusClient.write_metrics(metrics)
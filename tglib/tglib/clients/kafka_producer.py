@@ -9,7 +9,7 @@ import asyncio
 import json
 import logging
 import time
-from typing import Any, Dict, Optional, cast
+from typing import Any, Dict, Iterable, List, Optional, cast
 
 from aiokafka import AIOKafkaProducer
 from aiokafka.errors import KafkaError
@@ -21,12 +21,26 @@ from ..exceptions import (
     ClientStoppedError,
     ConfigError,
 )
+from ..utils.metrics import Counter, Histogram
 from ..utils.thrift import Thrift, thrift2json
 from .base_client import BaseClient
 
 
+_send_durations = Histogram("tglib_kafka_producer_send_duration_seconds")
+_send_errors = Counter("tglib_kafka_producer_send_errors_total")
+
+
 class KafkaProducer(BaseClient):
-    """A client for producing records to Kafka."""
+    """A client for producing records to Kafka.
+
+    The ``kafka`` config params are shared with the
+    :class:`~tglib.clients.kafka_consumer.KafkaConsumer`. Producer-only params go in
+    the optional ``kafka_producer`` object, which overrides them. Records are
+    batched for ``linger_ms`` milliseconds (5 by default) up to ``max_batch_size``
+    bytes, and compressed with ``compression_type`` (e.g. ``lz4`` or ``zstd``,
+    which require the ``compression`` extra) if set. The time to queue each record
+    and the failed sends are exported per topic on the ``/metrics`` route.
+    """
 
     _producer: Optional[AIOKafkaProducer] = None
 
@@ -55,10 +69,19 @@ class KafkaProducer(BaseClient):
         if not all(param in kafka_params for param in required_params):
             raise ConfigError(f"Missing one or more required params: {required_params}")
 
+        producer_params = config.get("kafka_producer", {})
+        if not isinstance(producer_params, dict):
+            raise ConfigError("Config value for 'kafka_producer' is not object")
+
         try:
             cls._producer = AIOKafkaProducer(
-                loop=asyncio.get_event_loop(), **kafka_params
+                loop=asyncio.get_event_loop(),
+                **{"linger_ms": 5, **kafka_params, **producer_params},
             )
+        except (RuntimeError, ValueError) as e:
+            raise ConfigError(f"Invalid Kafka producer params: {e}") from e
+
+        try:
             await cls._producer.start()
         except KafkaError as e:
             raise ClientRuntimeError() from e
@@ -107,11 +130,14 @@ class KafkaProducer(BaseClient):
         if self._producer is None:
             raise ClientStoppedError()
 
+        labels = {"topic": topic}
         try:
-            await self._producer.send(topic, data)
+            with _send_durations.time(labels):
+                await self._producer.send(topic, data)
             return True
         except KafkaError:
             logging.exception("Failed to schedule record")
+            _send_errors.inc(labels)
             return False
 
     async def log_event(
@@ -147,15 +173,103 @@ class KafkaProducer(BaseClient):
         Raises:
             ClientStoppedError: The Kafka producer resource is not running.
         """
+        event = self._create_event(
+            source,
+            reason,
+            category,
+            level,
+            event_id,
+            details,
+            entity,
+            node_id,
+            topology_name,
+            node_name,
+        )
+        if event is None:
+            return False
+
+        return await self.send_data("events", thrift2json(event))
+
+    async def log_events(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Log many events to the Kafka events topic without waiting on each one.
+
+        Every event is a dictionary of the :meth:`log_event` params. All of the records
+        are queued first, letting the producer batch and compress them, and then the
+        delivery results are gathered at the end.
+
+        Args:
+            events: The events to log.
+
+        Returns:
+            The number of successfully delivered events.
+
+        Raises:
+            ClientStoppedError: The Kafka producer resource is not running.
+
+        Example:
+            >>> await KafkaProducer().log_events(
+            ...     {
+            ...         "source": "optimizer",
+            ...         "reason": f"{link_name} is down",
+            ...         "category": EventCategory.TOPOLOGY,
+            ...         "level": EventLevel.WARNING,
+            ...         "event_id": EventId.LINK_STATUS,
+            ...         "entity": link_name,
+            ...     }
+            ...     for link_name in link_names
+            ... )
+        """
+        if self._producer is None:
+            raise ClientStoppedError()
+
+        labels = {"topic": "events"}
+        futures: List[asyncio.Future] = []
+        for params in events:
+            event = self._create_event(**params)
+            if event is None:
+                continue
+
+            try:
+                with _send_durations.time(labels):
+                    record = thrift2json(event)
+                    futures.append(await self._producer.send("events", record))
+            except KafkaError:
+                logging.exception("Failed to schedule record")
+                _send_errors.inc(labels)
+
+        delivered = 0
+        for result in await asyncio.gather(*futures, return_exceptions=True):
+            if isinstance(result, Exception):
+                logging.error(f"Failed to deliver event: {result}")
+                _send_errors.inc(labels)
+            else:
+                delivered += 1
+
+        return delivered
+
+    @staticmethod
+    def _create_event(
+        source: str,
+        reason: str,
+        category: int,
+        level: int,
+        event_id: int,
+        details: Optional[str] = None,
+        entity: Optional[str] = None,
+        node_id: Optional[str] = None,
+        topology_name: Optional[str] = None,
+        node_name: Optional[str] = None,
+    ) -> Optional[Event]:
+        """Validate the event params and create the Thrift ``Event`` object."""
         if category not in EventCategory._VALUES_TO_NAMES:
             logging.error(f"Invalid EventCategory: {category}")
-            return False
+            return None
         if event_id not in EventId._VALUES_TO_NAMES:
             logging.error(f"Invalid EventId: {event_id}")
-            return False
+            return None
         if level not in EventLevel._VALUES_TO_NAMES:
             logging.error(f"Invalid EventLevel: {level}")
-            return False
+            return None
 
         logging.info(
             f"Event {EventCategory._VALUES_TO_NAMES[category]}:{EventId._VALUES_TO_NAMES[event_id]} "
@@ -174,7 +288,7 @@ class KafkaProducer(BaseClient):
         event.nodeId = node_id
         event.topologyName = topology_name
         event.nodeName = node_name
-        return await self.send_data("events", thrift2json(event))
+        return event
 
     async def log_event_dict(
         self,
@@ -5,12 +5,16 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import contextlib
+import logging
 import os
-from typing import Any, Dict, Optional
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
 
 import aiomysql
-from aiomysql.sa import Engine, create_engine
-from sqlalchemy import exc, select
+from aiomysql.sa import Engine, SAConnection, create_engine
+from aiomysql.sa.result import RowProxy, create_result_proxy
+from sqlalchemy import bindparam, exc, insert, select
 
 from ..exceptions import (
     ClientRestartError,
@@ -18,13 +22,33 @@ from ..exceptions import (
     ClientStoppedError,
     ConfigError,
 )
+from ..utils.metrics import Counter, Histogram
 from .base_client import BaseClient
+from .prometheus_client import PrometheusClient, PrometheusMetric
+
+
+_lease_wait_durations = Histogram("tglib_mysql_lease_wait_seconds")
+_lease_durations = Histogram("tglib_mysql_lease_duration_seconds")
+_query_durations = Histogram("tglib_mysql_query_duration_seconds")
+_errors = Counter("tglib_mysql_errors_total")
 
 
 class MySQLClient(BaseClient):
-    """A client for interacting with MySQL using :mod:`sqlalchemy`."""
+    """A client for interacting with MySQL using :mod:`sqlalchemy`.
+
+    Rows written with :meth:`bulk_insert` are committed in batches of
+    ``bulk_insert_chunk_size`` rows (1000 by default). Rows read with
+    :meth:`stream` are fetched from the server in batches of ``stream_fetch_size``
+    rows (1000 by default).
+
+    The time spent waiting for and holding pooled connections, the duration of the
+    :meth:`stream` and :meth:`bulk_insert` queries, and the database errors are
+    exported on the ``/metrics`` route.
+    """
 
     _engine: Optional[Engine] = None
+    _bulk_insert_chunk_size: int = 1000
+    _stream_fetch_size: int = 1000
 
     @classmethod
     async def start(cls, config: Dict[str, Any]) -> None:
@@ -51,7 +75,23 @@ class MySQLClient(BaseClient):
         if not all(param in mysql_params for param in required_params):
             raise ConfigError(f"Missing one or more required params: {required_params}")
 
-        mysql_params.update(
+        client_params = ["bulk_insert_chunk_size", "stream_fetch_size"]
+        chunk_size = mysql_params.get("bulk_insert_chunk_size", 1000)
+        fetch_size = mysql_params.get("stream_fetch_size", 1000)
+        for key, value in zip(client_params, [chunk_size, fetch_size]):
+            if not isinstance(value, int) or value < 1:
+                raise ConfigError(f"Value for '{key}' is not a positive integer")
+
+        cls._bulk_insert_chunk_size = chunk_size
+        cls._stream_fetch_size = fetch_size
+
+        # Leave the caller's config untouched, only pass the driver params along
+        engine_params = {
+            key: value
+            for key, value in mysql_params.items()
+            if key not in client_params
+        }
+        engine_params.update(
             {
                 "db": os.getenv("DB_NAME"),
                 "user": os.getenv("DB_USER"),
@@ -60,7 +100,7 @@ class MySQLClient(BaseClient):
         )
 
         try:
-            cls._engine = await create_engine(**mysql_params, pool_recycle=10)
+            cls._engine = await create_engine(**engine_params, pool_recycle=10)
         except aiomysql.OperationalError as e:
             raise ClientRuntimeError() from e
 
@@ -92,7 +132,8 @@ class MySQLClient(BaseClient):
         except exc.DBAPIError:
             return False
 
-    def lease(self):
+    @contextlib.asynccontextmanager
+    async def lease(self) -> AsyncIterator[SAConnection]:
         """Get a connection from the connection pool.
 
         Attention:
@@ -108,4 +149,168 @@ class MySQLClient(BaseClient):
         if self._engine is None:
             raise ClientStoppedError()
 
-        return self._engine.acquire()
+        start = time.monotonic()
+        try:
+            async with self._engine.acquire() as sa_conn:
+                acquired = time.monotonic()
+                _lease_wait_durations.observe(acquired - start)
+                try:
+                    yield sa_conn
+                finally:
+                    _lease_durations.observe(time.monotonic() - acquired)
+        except (aiomysql.Error, exc.SQLAlchemyError):
+            _errors.inc()
+            raise
+
+    async def stream(
+        self, query: Any, fetch_size: Optional[int] = None
+    ) -> AsyncIterator[RowProxy]:
+        """Stream the rows of a query using an unbuffered server-side cursor.
+
+        Unlike ``fetchall``, the rows are pulled from the server in batches of
+        ``fetch_size`` as they are consumed, so memory usage does not grow with the
+        size of the result set. A connection is leased from the pool until the
+        generator is exhausted or closed.
+
+        Args:
+            query: The :mod:`sqlalchemy` selectable to execute.
+            fetch_size: The number of rows to fetch from the server at a time.
+
+        Returns:
+            An asynchronous generator of the result rows.
+
+        Raises:
+            ClientStoppedError: The MySQL connection pool is not running.
+
+        Attention:
+            The leased connection cannot run other queries while rows are pending, so
+            the rows **SHOULD** be consumed promptly.
+
+        Note:
+            If not provided, ``fetch_size`` defaults to the ``stream_fetch_size``
+            config value.
+
+        Example:
+            >>> query = select([Table.name]).where(Table.id > 10)
+            >>> async for row in MySQLClient().stream(query):
+            ...     print(row.name)
+        """
+        if self._engine is None:
+            raise ClientStoppedError()
+
+        fetch_size = fetch_size or self._stream_fetch_size
+        dialect = self._engine.dialect
+        compiled = query.compile(dialect=dialect)
+        processors = compiled._bind_processors
+        params = {
+            key: processors[key](value) if key in processors else value
+            for key, value in compiled.construct_params().items()
+        }
+
+        # Only the time spent waiting on the server counts as query time
+        query_time = 0.0
+        async with self.lease() as sa_conn:
+            start = time.monotonic()
+            cursor = await sa_conn.connection.cursor(aiomysql.SSCursor)
+            await cursor.execute(str(compiled), params)
+            result = await create_result_proxy(
+                sa_conn, cursor, dialect, compiled._result_columns
+            )
+            query_time += time.monotonic() - start
+            try:
+                while True:
+                    start = time.monotonic()
+                    rows = await result.fetchmany(fetch_size)
+                    query_time += time.monotonic() - start
+                    if not rows:
+                        break
+
+                    for row in rows:
+                        yield row
+            finally:
+                await result.close()
+                _query_durations.observe(query_time, {"operation": "stream"})
+
+    async def bulk_insert(
+        self,
+        table: Any,
+        rows: Sequence[Dict[str, Any]],
+        chunk_size: Optional[int] = None,
+        sa_conn: Optional[SAConnection] = None,
+    ) -> int:
+        """Insert many rows into a table in bounded batches.
+
+        Every batch is sent with ``executemany`` on a single prepared ``INSERT``
+        statement, so the statement size does not grow with the number of rows. If
+        the connection is leased by this method, every batch is also committed on its
+        own to bound the lock time. A provided connection is left for the caller to
+        commit, so that the rows are part of its transaction.
+
+        Args:
+            table: The :mod:`sqlalchemy` table or declarative model to insert into.
+            rows: The rows to insert, as column names to values.
+            chunk_size: The number of rows per batch.
+            sa_conn: The connection to use, a new one is leased if not provided.
+
+        Returns:
+            The number of inserted rows.
+
+        Raises:
+            ClientStoppedError: The MySQL connection pool is not running.
+
+        Note:
+            All of the rows must have the same keys as the first row. If not provided,
+            ``chunk_size`` defaults to the ``bulk_insert_chunk_size`` config value.
+
+        Example:
+            >>> rows = [{"name": "a"}, {"name": "b"}]
+            >>> await MySQLClient().bulk_insert(Table, rows, chunk_size=500)
+        """
+        if self._engine is None:
+            raise ClientStoppedError()
+        if not rows:
+            return 0
+        if sa_conn is None:
+            async with self.lease() as sa_conn:
+                return await self._bulk_insert(table, rows, chunk_size, sa_conn, True)
+
+        return await self._bulk_insert(table, rows, chunk_size, sa_conn, False)
+
+    async def _bulk_insert(
+        self,
+        table: Any,
+        rows: Sequence[Dict[str, Any]],
+        chunk_size: Optional[int],
+        sa_conn: SAConnection,
+        commit: bool,
+    ) -> int:
+        """Insert the rows in batches, committing every batch if ``commit`` is set."""
+        chunk_size = chunk_size or self._bulk_insert_chunk_size
+        query = insert(table).values({key: bindparam(key) for key in rows[0]})
+        start = time.monotonic()
+        for i in range(0, len(rows), chunk_size):
+            end = i + chunk_size
+            await sa_conn.execute(query, list(rows[i:end]))
+            if commit:
+                await sa_conn.connection.commit()
+
+        duration_s = time.monotonic() - start
+        _query_durations.observe(duration_s, {"operation": "bulk_insert"})
+        rows_per_s = len(rows) / duration_s if duration_s > 0 else float(len(rows))
+        logging.debug(
+            f"Inserted {len(rows)} rows into {query.table.name} in {duration_s:.3f}s"
+        )
+
+        # Instrument the write throughput if the service exports metrics
+        if PrometheusClient._metrics is not None:
+            PrometheusClient.write_metrics(
+                [
+                    PrometheusMetric(
+                        "tglib_mysql_bulk_insert_rows_per_second",
+                        {"table": query.table.name},
+                        rows_per_s,
+                    )
+                ]
+            )
+
+        return len(rows)
@@ -6,14 +6,30 @@
 # LICENSE file in the root directory of this source tree.
 
 import asyncio
+import collections
 import dataclasses
+import itertools
 import logging
 import re
 import time
+from functools import partial
 from types import SimpleNamespace
-from typing import Any, Dict, List, Optional, Pattern, Tuple, Union, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+    cast,
+)
 
 import aiohttp
+import numpy as np
 
 from ..exceptions import (
     ClientRestartError,
@@ -22,11 +38,22 @@ from ..exceptions import (
     ConfigError,
 )
 from ..utils.ip import format_address
+from ..utils import limiter, metrics
+from ..utils.limiter import ConcurrencyLimiter
+from ..utils.metrics import Counter, Histogram
+from ..utils.registry import Family, SeriesRegistry, merge_families
+from ..utils.remote_write import RemoteWriter
+from ..utils.resilience import ResiliencePolicy, is_transient
 from .base_client import BaseClient
 
 
 _DURATION_RE = re.compile("^[0-9]+[smhdw]$")
 _SECONDS_PER_UNIT = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+# Label used to tell apart the results of queries that are batched together
+_QUERY_TAG = "tglib_query"
+
+_request_durations = Histogram("tglib_prometheus_request_duration_seconds")
+_request_errors = Counter("tglib_prometheus_request_errors_total")
 
 
 # Common labels
@@ -61,6 +88,16 @@ ops.sum_by = lambda query, consts: f"sum by ({consts}) ({query})"
 ops.sum_over_time = lambda query, interval: f"sum_over_time({query} [{interval}])"
 
 
+def _is_transient(error: ClientRuntimeError) -> bool:
+    """Return whether a query error is worth retrying, leaving out query timeouts."""
+    cause = error.__cause__
+    if isinstance(cause, asyncio.TimeoutError) and not isinstance(
+        cause, aiohttp.ClientError
+    ):
+        return False
+    return is_transient(error)
+
+
 @dataclasses.dataclass
 class PrometheusMetric:
     """Representation of a single Prometheus metric.
@@ -82,16 +119,98 @@ class PrometheusMetric:
     time: Optional[int] = None
 
 
+@dataclasses.dataclass
+class PrometheusFrame:
+    """Columnar representation of a Prometheus range query result.
+
+    The ``i``-th entries of ``labels``, ``timestamps``, and ``values`` all describe
+    the same series. The ``timestamps`` and ``values`` arrays of a series are
+    aligned sample by sample.
+
+    Args:
+        labels: The label set of each series.
+        timestamps: The sample timestamps of each series, in seconds.
+        values: The sample values of each series.
+    """
+
+    labels: List[Dict[str, str]] = dataclasses.field(default_factory=list)
+    timestamps: List[np.ndarray] = dataclasses.field(default_factory=list)
+    values: List[np.ndarray] = dataclasses.field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __iter__(self) -> Iterator[Tuple[Dict[str, str], np.ndarray, np.ndarray]]:
+        return zip(self.labels, self.timestamps, self.values)
+
+    def index(self, *label_names: str) -> Dict[Tuple[Optional[str], ...], int]:
+        """Build a hash index from label values to series positions.
+
+        Args:
+            label_names: The names of the labels to index on.
+
+        Returns:
+            A dictionary of label value tuples to the position of the series in the frame.
+
+        Example:
+            >>> frame.index("linkName", "linkDirection")
+            {("link-A-B", "A"): 0, ("link-A-B", "Z"): 1}
+        """
+        return {
+            tuple(labels.get(name) for name in label_names): i
+            for i, labels in enumerate(self.labels)
+        }
+
+
 class PrometheusClient(BaseClient):
     """A client for reading and writing timeseries metrics to Prometheus.
 
+    Identical queries that are in flight at the same time are coalesced into a
+    single HTTP request. Optionally, successful query responses are also cached for
+    ``cache_ttl_s`` seconds if the value is set in the ``prometheus`` config.
+
+    Range queries that exceed the ``max_points_per_series`` resolution limit of the
+    server (11000 by default) are automatically split into chunks that are fetched
+    in parallel, with at most ``max_concurrent_chunks`` (4 by default) in flight.
+
+    At most ``max_concurrent_queries`` (20 by default, matching the server's own
+    query concurrency) HTTP requests are sent to Prometheus at once, the rest wait
+    in a queue. The connection pool is sized with ``connection_limit`` (100 by
+    default) and idle connections are kept alive for ``keepalive_timeout_s``
+    seconds (30 by default).
+
+    Queries are retried on transport errors and on ``unavailable`` or ``internal``
+    error responses, and hedged after ``hedge_after_s`` seconds if set. Query
+    timeouts, be it a ``timeout`` error response or the client ``timeout`` expiring,
+    are neither retried nor counted as failures. While Prometheus keeps failing,
+    queries are rejected with :exc:`~tglib.exceptions.CircuitOpenError` instead of
+    piling up. See
+    :class:`~tglib.utils.resilience.ResiliencePolicy` for the tuning params.
+
+    If a ``remote_write`` object with a ``url`` is set in the ``prometheus`` config,
+    metrics written with :meth:`write_metrics` are also pushed to that remote write
+    endpoint with their own timestamps, in addition to being served on the scrape
+    endpoint. The remaining params of the object (e.g. ``batch_size``,
+    ``flush_interval_s``, ``max_queue_size``) are passed to
+    :class:`~tglib.utils.remote_write.RemoteWriter`.
+
     Args:
         timeout: The request timeout, in seconds.
     """
 
     _addr: Optional[str] = None
-    _metrics: Optional[Dict[str, Tuple[Union[int, float], Optional[int]]]] = None
+    _metrics: Optional[SeriesRegistry] = None
     _session: Optional[aiohttp.ClientSession] = None
+    _inflight: Dict[Tuple, asyncio.Future] = {}
+    _cache: Optional[collections.OrderedDict] = None
+    _cache_ttl_s: int = 0
+    _cache_max_size: int = 1024
+    _query_stats: Dict[str, int] = {"cache_hits": 0, "cache_misses": 0, "coalesced": 0}
+    _max_points_per_series: int = 11000
+    _chunk_semaphore: Optional[asyncio.Semaphore] = None
+    _limiter: Optional[ConcurrencyLimiter] = None
+    _resilience: Optional[ResiliencePolicy] = None
+    _remote_writer: Optional[RemoteWriter] = None
 
     def __init__(self, timeout: int) -> None:
         self.timeout = timeout
@@ -120,9 +239,64 @@ class PrometheusClient(BaseClient):
         if not all(param in prom_params for param in required_params):
             raise ConfigError(f"Missing one or more required params: {required_params}")
 
+        cache_ttl_s = prom_params.get("cache_ttl_s", 0)
+        if not isinstance(cache_ttl_s, int) or cache_ttl_s < 0:
+            raise ConfigError(
+                "Config value for 'cache_ttl_s' is not a non-negative integer"
+            )
+        cache_max_size = prom_params.get("cache_max_size", 1024)
+        if not isinstance(cache_max_size, int) or cache_max_size < 1:
+            raise ConfigError(
+                "Config value for 'cache_max_size' is not a positive integer"
+            )
+
+        try:
+            cls._limiter = ConcurrencyLimiter(
+                "prometheus", "host", prom_params.get("max_concurrent_queries", 20)
+            )
+        except ValueError as e:
+            raise ConfigError(str(e)) from e
+
+        cls._resilience = ResiliencePolicy.from_config(
+            "prometheus", "host", prom_params
+        )
         cls._addr = format_address(prom_params["host"], prom_params["port"])
-        cls._metrics = {}
-        cls._session = aiohttp.ClientSession()
+        cls._metrics = SeriesRegistry(cls.format_query)
+        cls._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=prom_params.get("connection_limit", 100),
+                keepalive_timeout=prom_params.get("keepalive_timeout_s", 30),
+            )
+        )
+        cls._inflight = {}
+        cls._query_stats = dict.fromkeys(cls._query_stats, 0)
+        cls._max_points_per_series = prom_params.get("max_points_per_series", 11000)
+        cls._chunk_semaphore = asyncio.Semaphore(
+            prom_params.get("max_concurrent_chunks", 4)
+        )
+
+        if cache_ttl_s > 0:
+            cls._cache = collections.OrderedDict()
+            cls._cache_ttl_s = cache_ttl_s
+            cls._cache_max_size = cache_max_size
+
+        if "remote_write" in prom_params:
+            cls._start_remote_write(prom_params["remote_write"])
+
+    @classmethod
+    def _start_remote_write(cls, params: Any) -> None:
+        """Start pushing the written metrics to a remote write endpoint."""
+        if not isinstance(params, dict) or "url" not in params:
+            raise ConfigError("Config value for 'remote_write' has no 'url'")
+        if cls._session is None:
+            raise ClientStoppedError()
+
+        try:
+            cls._remote_writer = RemoteWriter(session=cls._session, **params)
+        except (RuntimeError, TypeError) as e:
+            raise ConfigError(f"Invalid 'remote_write' params: {e}") from e
+
+        cls._remote_writer.start()
 
     @classmethod
     async def stop(cls) -> None:
@@ -134,8 +308,17 @@ class PrometheusClient(BaseClient):
         if cls._session is None:
             raise ClientStoppedError()
 
+        if cls._remote_writer is not None:
+            await cls._remote_writer.stop()
+            cls._remote_writer = None
+
         await cls._session.close()
         cls._session = None
+        cls._cache = None
+        cls._cache_ttl_s = 0
+        cls._cache_max_size = 1024
+        cls._limiter = None
+        cls._resilience = None
 
     @classmethod
     async def healthcheck(cls) -> bool:
@@ -241,33 +424,82 @@ class PrometheusClient(BaseClient):
         if cls._metrics is None:
             raise ClientStoppedError()
 
-        # Format the incoming metrics
-        curr_metrics = {}
+        # Series are only formatted the first time they are written
         for metric in metrics:
-            query_str = cls.format_query(metric.name, metric.labels)
-            curr_metrics[query_str] = (metric.value, metric.time)
+            cls._metrics.set(metric.name, metric.labels, metric.value, metric.time)
 
-        cls._metrics.update(curr_metrics)
+        # Queue every sample for remote write, so none is overwritten before a scrape
+        if cls._remote_writer is not None:
+            now_ms = int(round(time.time() * 1e3))
+            for metric in metrics:
+                cls._remote_writer.enqueue(
+                    metric.name, metric.labels, metric.value, metric.time or now_ms
+                )
 
     @classmethod
-    def poll_metrics(cls) -> List[str]:
+    def poll_metrics(cls, openmetrics: bool = False) -> List[str]:
         """Scrape the metrics cache.
 
+        Args:
+            openmetrics: Flag to render in OpenMetrics form, grouped by family with
+                ``# TYPE`` lines and with timestamps in seconds.
+
         Returns:
             A list of metrics, in PromQL form.
 
+        Raises:
+            ClientStoppedError: The HTTP client session pool is not running.
+        """
+        return list(cls.iter_metrics(openmetrics))
+
+    @classmethod
+    def iter_metrics(cls, openmetrics: bool = False) -> Iterator[str]:
+        """Scrape the metrics cache, rendering the metrics as they are consumed.
+
+        The cache is drained when called, but the metrics are only rendered in
+        PromQL form as the iterator is consumed, so the whole exposition never has to
+        be held in memory.
+
+        Args:
+            openmetrics: Flag to render in OpenMetrics form, grouped by family with
+                ``# TYPE`` lines and with timestamps in seconds.
+
+        Returns:
+            An iterator of metrics, in PromQL form.
+
         Raises:
             ClientStoppedError: The HTTP client session pool is not running.
         """
         if cls._metrics is None:
             raise ClientStoppedError()
 
-        datapoints = []
-        for query_str, (value, ts) in cls._metrics.items():
-            datapoints.append(f"{query_str} {value} {ts or ''}".rstrip())
+        datapoints = cls._metrics.drain_lazily(openmetrics)
+        families: List[Family] = []
+
+        # Export the query coalescing and caching counters once any query was issued
+        if any(cls._query_stats.values()):
+            for name, value in cls._query_stats.items():
+                family = f"tglib_prometheus_query_{name}"
+                families.append((family, "counter", [(f"{family}_total", {}, value)]))
+
+        if cls._remote_writer is not None:
+            for name, count in cls._remote_writer.stats.items():
+                family = f"tglib_prometheus_remote_write_{name}_samples"
+                families.append((family, "counter", [(f"{family}_total", {}, count)]))
+
+        # Export the concurrency limiter gauges, counters, and histograms of tglib
+        families += merge_families(
+            limiter.collect_families() + metrics.collect_families()
+        )
+
+        internal: List[str] = []
+        for family, metric_type, samples in families:
+            if openmetrics and samples:
+                internal.append(f"# TYPE {family} {metric_type}")
+            for name, labels, sample in samples:
+                internal.append(f"{cls.format_query(name, labels)} {sample}")
 
-        cls._metrics.clear()
-        return datapoints
+        return itertools.chain(datapoints, internal)
 
     async def query_range(
         self, query: str, step: str, start: int, end: Optional[int]
@@ -315,29 +547,148 @@ class PrometheusClient(BaseClient):
         if data["status"] == "error" or timestamps["status"] == "error":
             return data
 
-        step_s = self.duration2seconds(step)
-        for t_res, d_res in zip(timestamps["data"]["result"], data["data"]["result"]):
+        results = data["data"]["result"]
+        masks = self._nonstale_masks(
+            timestamps["data"]["result"], results, start, self.duration2seconds(step)
+        )
+
+        # Build new result objects because the raw response may be shared
+        filtered = [
+            {**d_res, "values": [v for v, keep in zip(d_res["values"], mask) if keep]}
+            for d_res, mask in zip(results, masks)
+        ]
+        return {**data, "data": {**data["data"], "result": filtered}}
+
+    async def query_range_frame(
+        self, query: str, step: str, start: int, end: Optional[int] = None
+    ) -> PrometheusFrame:
+        """Return the non-stale timeseries data for the given query in columnar form.
+
+        This is the columnar equivalent of :meth:`query_range`. The samples of each
+        series are parsed into ``float64`` arrays and the stale and duplicate samples
+        are dropped with a single vectorized pass over all of the series.
+
+        Args:
+            query: The PromQL string query.
+            step: The query step resolution width in duration format.
+            start: The start unix timestamp in seconds.
+            end: The end unix timestamp in seconds.
+
+        Returns:
+            A :class:`PrometheusFrame` with one entry per series.
+
+        Raises:
+            ClientStoppedError: The HTTP client session pool is not running.
+            ClientRuntimeError: The request failed, timed out, or returned an error.
+            RuntimeError: The ordering of the metric and timestamp data is not aligned.
+            ValueError: The value for ``step`` is an invalid duration string.
+            ValueError: The value for ``start`` is greater than the value for ``end``.
+
+        Example:
+            >>> client = PrometheusClient(timeout=2)
+            >>> frame = await client.query_range_frame(query="metric", step="50s", start=100, end=250)
+            >>> for labels, timestamps, values in frame:
+            ...     print(labels["linkName"], timestamps, values)
+            link-A-B [100. 200. 250.] [8.5 9.2 9. ]
+
+        Note:
+            If not provided, ``end`` will default to the current unix time.
+        """
+        data, timestamps = await asyncio.gather(
+            self.query_range_raw(query, step, start, end),
+            self.query_range_ts(query, step, start, end),
+        )
+        if data["status"] == "error":
+            raise ClientRuntimeError(
+                msg=f"Query range request for {query} failed: {data.get('error')}"
+            )
+
+        results = data["data"]["result"]
+        frame = PrometheusFrame()
+        if not results:
+            return frame
+
+        lengths = [len(res["values"]) for res in results]
+        samples = np.array(
+            [val for res in results for val in res["values"]], dtype=np.float64
+        ).reshape(-1, 2)
+
+        if timestamps["status"] == "error":
+            mask = np.ones(len(samples), dtype=bool)
+        else:
+            mask = np.concatenate(
+                self._nonstale_masks(
+                    timestamps["data"]["result"],
+                    results,
+                    start,
+                    self.duration2seconds(step),
+                )
+            )
+
+        # Translate the series boundaries into boundaries over the surviving samples
+        kept = np.cumsum(np.insert(mask, 0, False))[np.cumsum(lengths)[:-1]]
+        for res, series in zip(results, np.split(samples[mask], kept)):
+            frame.labels.append(res["metric"])
+            frame.timestamps.append(series[:, 0])
+            frame.values.append(series[:, 1])
+
+        return frame
+
+    @staticmethod
+    def _nonstale_masks(
+        ts_results: List[Dict], data_results: List[Dict], start: int, step_s: int
+    ) -> List[np.ndarray]:
+        """Compute the per-series masks of non-stale and non-duplicate samples.
+
+        A sample is stale if its emission timestamp is older than one step before
+        ``start``. A sample is a duplicate if its emission timestamp matches the one
+        of the previous sample in the same series. All of the series are evaluated
+        at once over a single flattened array of emission timestamps.
+        """
+        lengths = []
+        for t_res, d_res in zip(ts_results, data_results):
             if not (t_res["metric"].items() <= d_res["metric"].items()):
                 raise RuntimeError("Metric and timestamp data are not aligned!")
 
-            prev = None
-            count = 0
-            d_res_values = d_res["values"].copy()
-            for i, (t_val, d_val) in enumerate(zip(t_res["values"], d_res_values)):
-                # Skip stale and duplicate samples
-                if float(t_val[1]) <= start - step_s or prev == t_val[1]:
-                    del d_res["values"][i - count]
-                    count += 1
+            lengths.append(min(len(t_res["values"]), len(d_res["values"])))
+
+        emissions = np.array(
+            [
+                t_val[1]
+                for t_res, n in zip(ts_results, lengths)
+                for t_val in t_res["values"][:n]
+            ],
+            dtype=np.float64,
+        )
+
+        # The first sample of every series has no predecessor to duplicate
+        bounds = np.cumsum([0] + lengths)
+        first = np.zeros(len(emissions), dtype=bool)
+        first[bounds[:-1][np.array(lengths, dtype=np.intp) > 0]] = True
+
+        mask = emissions > start - step_s
+        mask[1:] &= first[1:] | (emissions[1:] != emissions[:-1])
 
-                prev = t_val[1]
+        masks = np.split(mask, bounds[1:-1]) if lengths else []
+        for i, d_res in enumerate(data_results):
+            if i >= len(lengths):
+                masks.append(np.zeros(0, dtype=bool))
 
-        return data
+            # Samples without an emission timestamp are kept as is
+            n = len(d_res["values"]) - len(masks[i])
+            masks[i] = np.concatenate((masks[i], np.ones(n, dtype=bool)))
+
+        return masks
 
     async def query_range_raw(
         self, query: str, step: str, start: int, end: Optional[int] = None
     ) -> Dict:
         """Return the timeseries data for the given PromQL query and time range.
 
+        Ranges with more points per series than the server allows are split into
+        multiple chunked requests. The chunks are fetched in parallel and stitched
+        back together into a single response.
+
         Args:
             query: The PromQL string query.
             step: The query step resolution width in duration format.
@@ -366,17 +717,69 @@ class PrometheusClient(BaseClient):
         if start > end:
             raise ValueError(f"Start time cannot be after end time: {start} > {end}")
 
+        span = self._max_points_per_series * self.duration2seconds(step)
+        if end - start < span:
+            return await self._query_range_chunk(query, step, start, end)
+
+        # Each chunk holds at most '_max_points_per_series' evaluation steps
+        chunks = [
+            self._query_range_chunk(
+                query, step, chunk_start, min(chunk_start + span - 1, end), True
+            )
+            for chunk_start in range(start, end + 1, span)
+        ]
+        return self._stitch(await asyncio.gather(*chunks))
+
+    async def _query_range_chunk(
+        self, query: str, step: str, start: int, end: int, bounded: bool = False
+    ) -> Dict:
+        """Request a range of data that fits within the server's resolution limit.
+
+        If ``bounded`` is set, the request waits for a free chunk concurrency slot.
+        """
+        if self._chunk_semaphore is None:
+            raise ClientStoppedError()
+
         url = f"http://{self._addr}/api/v1/query_range"
         params = {"query": query, "start": start, "end": end, "step": step}
-        logging.debug(f"Requesting from {url} with params {params}")
+        cache_key = (url, query, step, self._align(start), self._align(end))
+        if not bounded:
+            return await self._request(url, params, cache_key)
 
-        try:
-            async with self._session.get(
-                url, params=params, timeout=self.timeout
-            ) as resp:
-                return cast(Dict, await resp.json())
-        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-            raise ClientRuntimeError(msg=f"Query range request to {url} failed") from e
+        async with self._chunk_semaphore:
+            return await self._request(url, params, cache_key)
+
+    @staticmethod
+    def _stitch(responses: List[Dict]) -> Dict:
+        """Merge chunked range query responses into a single response.
+
+        Series are matched by their label sets. Samples at or before the last
+        timestamp of the previous chunk of a series are dropped as duplicates.
+        """
+        for response in responses:
+            if response["status"] == "error":
+                return response
+
+        series: Dict[Tuple, Dict] = {}
+        for response in responses:
+            for res in response["data"]["result"]:
+                key = tuple(sorted(res["metric"].items()))
+                if key not in series:
+                    # Copy the values since the chunk response may be shared
+                    series[key] = {"metric": res["metric"], "values": [*res["values"]]}
+                    continue
+
+                values = series[key]["values"]
+                last_ts = values[-1][0] if values else float("-inf")
+                values.extend(val for val in res["values"] if val[0] > last_ts)
+
+        return {
+            "status": "success",
+            "data": {
+                "resultType": responses[0]["data"].get("resultType", "matrix"),
+                "result": list(series.values()),
+            },
+        }
 
     async def query_latest(self, query: str, time: Optional[int] = None) -> Dict:
         """Return the latest datum for the given query.
@@ -403,15 +806,125 @@ class PrometheusClient(BaseClient):
         if time is not None:
             params["time"] = time
 
-        logging.debug(f"Requesting from {url} with params {params}")
+        cache_key = (url, query, None, None, self._align(time))
+        return await self._request(url, params, cache_key)
 
-        try:
-            async with self._session.get(
-                url, params=params, timeout=self.timeout
-            ) as resp:
-                return cast(Dict, await resp.json())
-        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-            raise ClientRuntimeError(msg=f"Query request to {url} failed") from e
+    async def query_latest_many(
+        self, queries: Dict[str, str], time: Optional[int] = None
+    ) -> Dict[str, List[Dict]]:
+        """Return the latest datum for several queries with a single request.
+
+        Each query is tagged with its key using ``label_replace`` and all of them are
+        joined with the ``or`` operator. The response is then demultiplexed by the tag.
+
+        Args:
+            queries: Dictionary of arbitrary keys to PromQL string queries.
+            time: The evaluation unix timestamp in seconds.
+
+        Returns:
+            A dictionary of the keys in ``queries`` to their list of results.
+
+        Raises:
+            ClientStoppedError: The HTTP client session pool is not running.
+            ClientRuntimeError: The request failed, timed out, or returned an error.
+
+        Example:
+            >>> client = PrometheusClient(timeout=2)
+            >>> await client.query_latest_many({"snr_avg": "avg_over_time(snr [1m])"})
+            {"snr_avg": [{"metric": {"linkName": "link-A-B"}, "value": [100, "18"]}]}
+
+        Note:
+            If not provided, ``time`` will default to the Prometheus server time.
+        """
+        parts = [
+            f'label_replace({query}, "{_QUERY_TAG}", "{key}", "", "")'
+            for key, query in queries.items()
+        ]
+        return await self._query_latest_tagged(" or ".join(parts), queries, time)
+
+    async def fetch_many(
+        self,
+        metrics: Iterable[str],
+        labels: Dict[str, Any] = {},
+        negate_labels: Dict[str, Any] = {},
+        transformations: Dict[str, Callable[[str], str]] = {},
+        time: Optional[int] = None,
+    ) -> Dict[str, List[Dict]]:
+        """Return the latest datum for several metrics sharing a label set.
+
+        Metrics without a transformation are fetched together with a single
+        ``{__name__=~"a|b|c", ...}`` selector. Since PromQL functions drop the metric
+        name, every transformed metric is tagged separately and batched into the same
+        request as in :meth:`query_latest_many`.
+
+        Args:
+            metrics: The Prometheus metric names.
+            labels: The dictionary of labels to *positive* matching values.
+            negate_labels: The dictionary of labels to *negative* matching values.
+            transformations: Dictionary of metric names to functions that wrap the
+                metric selector (e.g. ``lambda q: ops.avg_over_time(q, "5m")``).
+            time: The evaluation unix timestamp in seconds.
+
+        Returns:
+            A dictionary of the metric names to their list of results.
+
+        Raises:
+            ClientStoppedError: The HTTP client session pool is not running.
+            ClientRuntimeError: The request failed, timed out, or returned an error.
+
+        Example:
+            >>> client = PrometheusClient(timeout=2)
+            >>> await client.fetch_many(["snr", "mcs"], {"linkName": "link-A-B"})
+            {"snr": [{"metric": {"__name__": "snr", ...}, "value": [100, "18"]}], "mcs": [...]}
+
+        Note:
+            If not provided, ``time`` will default to the Prometheus server time.
+        """
+        metrics = list(metrics)
+        parts = []
+
+        plain = [metric for metric in metrics if metric not in transformations]
+        if plain:
+            name_re = re.compile("|".join(plain))
+            selector = self.format_query(
+                "", {"__name__": name_re, **labels}, negate_labels
+            )
+            parts.append(
+                f'label_replace({selector}, "{_QUERY_TAG}", "$1", "__name__", "(.*)")'
+            )
+
+        for metric in metrics:
+            if metric in transformations:
+                query = self.format_query(metric, labels, negate_labels)
+                query = transformations[metric](query)
+                parts.append(
+                    f'label_replace({query}, "{_QUERY_TAG}", "{metric}", "", "")'
+                )
+
+        return await self._query_latest_tagged(" or ".join(parts), metrics, time)
+
+    async def _query_latest_tagged(
+        self, query: str, keys: Iterable[str], time: Optional[int]
+    ) -> Dict[str, List[Dict]]:
+        """Run a batched instant query and split the results by their query tag."""
+        if not query:
+            # Nothing to fetch, an empty query is a Prometheus parse error
+            return {}
+
+        response = await self.query_latest(query, time)
+        if response["status"] != "success":
+            raise ClientRuntimeError(
+                msg=f"Batched query request failed: {response.get('error')}"
+            )
+
+        results: Dict[str, List[Dict]] = {key: [] for key in keys}
+        for res in response["data"]["result"]:
+            metric = {k: v for k, v in res["metric"].items() if k != _QUERY_TAG}
+            key = res["metric"].get(_QUERY_TAG)
+            if key in results:
+                results[key].append({**res, "metric": metric})
+
+        return results
 
     async def query_range_ts(
         self, query: str, step: str, start: int, end: Optional[int] = None
@@ -456,3 +969,99 @@ class PrometheusClient(BaseClient):
             If not provided, ``time`` will default to the Prometheus server time.
         """
         return await self.query_latest(f"timestamp({query})", time)
+
+    @classmethod
+    def _align(cls, timestamp: Optional[int]) -> Optional[int]:
+        """Align a unix timestamp to the start of its cache TTL window."""
+        if timestamp is None or cls._cache_ttl_s == 0:
+            return timestamp
+        return timestamp - timestamp % cls._cache_ttl_s
+
+    async def _request(
+        self, url: str, params: Dict[str, Any], cache_key: Tuple
+    ) -> Dict:
+        """Serve the request from the cache or coalesce it with identical requests.
+
+        Note:
+            Coalesced and cached responses are shared among all of the callers and
+            must not be modified in place.
+        """
+        if self._cache is not None:
+            entry = self._cache.get(cache_key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(cache_key)
+                self._query_stats["cache_hits"] += 1
+                return cast(Dict, entry[1])
+
+            self._query_stats["cache_misses"] += 1
+
+        flight_key = (url, self.timeout, *sorted(params.items()))
+        future = self._inflight.get(flight_key)
+        if future is None:
+            future = asyncio.ensure_future(self._get(url, params))
+            future.add_done_callback(self._inflight_done(flight_key))
+            self._inflight[flight_key] = future
+        else:
+            self._query_stats["coalesced"] += 1
+
+        # Shield the shared request from the cancellation of any single caller
+        response = cast(Dict, await asyncio.shield(future))
+        if self._cache is not None and response.get("status") == "success":
+            self._cache[cache_key] = (time.monotonic() + self._cache_ttl_s, response)
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self._cache_max_size:
+                self._cache.popitem(last=False)
+
+        return response
+
+    @classmethod
+    def _inflight_done(cls, flight_key: Tuple) -> Callable[[asyncio.Future], None]:
+        """Return a callback that clears a finished request from the in-flight map."""
+
+        def callback(future: asyncio.Future) -> None:
+            cls._inflight.pop(flight_key, None)
+
+            # Mark the exception as retrieved in case every caller was cancelled
+            if not future.cancelled():
+                future.exception()
+
+        return callback
+
+    async def _get(self, url: str, params: Dict[str, Any]) -> Dict:
+        """Send a GET request to Prometheus and return the decoded JSON response."""
+        if self._addr is None or self._resilience is None:
+            raise ClientStoppedError()
+
+        # Queries are read-only, so they are always safe to retry and hedge. Query
+        # timeouts, on the server or on our side, are left out, since they usually
+        # mean that the query is too expensive rather than that the server is down.
+        return await self._resilience.run(
+            self._addr,
+            partial(self._send, url, params),
+            is_failure=lambda response: response.get("errorType")
+            in ("unavailable", "internal"),
+            transient=_is_transient,
+        )
+
+    async def _send(self, url: str, params: Dict[str, Any]) -> Dict:
+        """Send a single try of a GET request within the concurrency limit."""
+        if self._addr is None or self._session is None or self._limiter is None:
+            raise ClientStoppedError()
+
+        logging.debug(f"Requesting from {url} with params {params}")
+
+        labels = {"endpoint": url.rsplit("/", 1)[-1]}
+        try:
+            with _request_durations.time(labels):
+                async with self._limiter.acquire(self._addr), self._session.get(
+                    url, params=params, timeout=self.timeout
+                ) as resp:
+                    response = cast(Dict, await resp.json())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            _request_errors.inc(labels)
+            raise ClientRuntimeError(msg=f"Query request to {url} failed") from e
+
+        if response.get("status") != "success":
+            _request_errors.inc(labels)
+
+        return response
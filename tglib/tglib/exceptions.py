@@ -20,6 +20,19 @@ class ConfigError(TGLibError):
     pass
 
 
+class RestartRequiredError(TGLibError):
+    """Raised by a config change callback if the change cannot be applied live.
+
+    Args:
+        msg: The exception message.
+    """
+
+    def __init__(self, msg: Optional[str] = None):
+        if msg is None:
+            msg = "The config change requires a restart"
+        super().__init__(msg)
+
+
 class DuplicateRouteError(TGLibError):
     """Raised if more than one route has the same method and path.
 
@@ -80,3 +93,20 @@ class ClientRuntimeError(ClientError):
         if msg is None:
             msg = "An unknown issue with the client occurred at runtime"
         super().__init__(msg)
+
+
+class CircuitOpenError(ClientRuntimeError):
+    """Raised if a request is rejected because its backend failed repeatedly.
+
+    Args:
+        backend: The name of the backend (e.g. ``api_service``).
+        key: The failing instance of the backend (e.g. a network name or host).
+        msg: The exception message.
+    """
+
+    def __init__(self, backend: str, key: str, msg: Optional[str] = None):
+        if msg is None:
+            msg = f"The circuit of {backend} for {key} is open"
+        super().__init__(msg)
+        self.backend = backend
+        self.key = key
@@ -10,15 +10,44 @@ import json
 import logging
 import os
 import signal
+import time
 from typing import Callable, Optional, Set, Type, cast
 
 import uvloop
 from aiohttp import web
 
-from .clients import BaseClient
+from .clients.base_client import BaseClient
 from .exceptions import ConfigError, DuplicateRouteError, TGLibError
 from .routes import routes
+from .utils import loop_monitor, process_pool
 from .utils.dict import deep_update
+from .utils.metrics import Histogram
+
+
+_request_durations = Histogram("tglib_http_request_duration_seconds")
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler: Callable) -> web.Response:
+    resource = request.match_info.route.resource
+    # Label by the route template (e.g. /status/{id}) to bound the cardinality
+    labels = {
+        "method": request.method,
+        "route": resource.canonical if resource is not None else "unmatched",
+    }
+
+    start = time.monotonic()
+    status = 500
+    try:
+        response = cast(web.Response, await handler(request))
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        labels["status"] = str(status)
+        _request_durations.observe(time.monotonic() - start, labels)
 
 
 @web.middleware
@@ -64,7 +93,7 @@ def init(
             service_config = json.load(f2)
 
             if "overrides" in service_config:
-                deep_update(config, service_config["overrides"])
+                deep_update(config, service_config["overrides"], copy=False)
     except json.JSONDecodeError as e:
         raise ConfigError("Configuration file is not valid JSON") from e
     except OSError as e:
@@ -74,7 +103,7 @@ def init(
     asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
     # Create web application object
-    app = web.Application(middlewares=[error_middleware])
+    app = web.Application(middlewares=[metrics_middleware, error_middleware])
     app["main"] = main
     app["config"] = config
     app["clients"] = clients
@@ -121,6 +150,11 @@ def _add_all_routes(
 
 async def _start_background_tasks(app: web.Application) -> None:
     """Start the clients and create the main_wrapper and shutdown_listener tasks."""
+    await loop_monitor.start(app["config"])
+
+    # Start the process pool workers before the clients allocate any resources
+    await process_pool.start(app["config"])
+
     start_tasks = [client.start(app["config"]) for client in app["clients"]]
 
     good, bad = [], []
@@ -135,7 +169,7 @@ async def _start_background_tasks(app: web.Application) -> None:
     if bad:
         # Shutdown the successful clients if any have failed to start
         stop_tasks = [client.stop() for client in good]
-        await asyncio.gather(*stop_tasks)
+        await asyncio.gather(*stop_tasks, process_pool.stop(), loop_monitor.stop())
         raise bad[0]
 
     app["main_wrapper_task"] = asyncio.create_task(_main_wrapper(app))
@@ -158,7 +192,7 @@ async def _stop_background_tasks(app: web.Application) -> None:
             pass
 
     tasks = [client.stop() for client in app["clients"]]
-    await asyncio.gather(*tasks)
+    await asyncio.gather(*tasks, process_pool.stop(), loop_monitor.stop())
 
     # Raise the exception caught in the main_wrapper if the task wasn't cancelled
     if not app["main_wrapper_task"].cancelled():
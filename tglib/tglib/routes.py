@@ -6,13 +6,22 @@
 # LICENSE file in the root directory of this source tree.
 
 import asyncio
+import contextlib
+import hmac
+import io
 import json
 import logging
+import marshal
+import os
+import pstats
+from copy import deepcopy
+from typing import Dict, Iterator, List, Optional
 
-from aiohttp import web
+from aiohttp import hdrs, web
 
 from .clients.prometheus_client import PrometheusClient
 from .exceptions import ClientStoppedError
+from .utils import profiling, reload
 from .utils.dict import deep_update
 
 
@@ -27,6 +36,11 @@ except ImportError:
 
 routes = web.RouteTableDef()
 
+# The number of metrics written to the /metrics response at a time
+METRICS_CHUNK_SIZE = 1000
+
+_debug_in_progress = False
+
 
 @routes.get("/health")
 async def handle_get_health(request: web.Request) -> web.Response:
@@ -197,9 +211,20 @@ async def handle_get_swagger_docs_yml(request: web.Request) -> web.Response:
 
 
 @routes.get("/metrics")
-async def handle_get_metrics(request: web.Request) -> web.Response:
+async def handle_get_metrics(request: web.Request) -> web.StreamResponse:
     """Scrape the Prometheus metrics cache.
 
+    The OpenMetrics format is used if the scraper accepts it, and the response is
+    gzip-compressed if the scraper accepts gzip encoding. The response is streamed
+    with chunked transfer encoding, rendering :data:`METRICS_CHUNK_SIZE` metrics at
+    a time, so memory usage does not grow with the number of series.
+
+    Besides the cached metrics, tglib exports its own latency histograms and error
+    counters for the HTTP routes (``tglib_http_*``), Prometheus queries
+    (``tglib_prometheus_*``), API service requests (``tglib_api_service_*``), MySQL
+    leases and queries (``tglib_mysql_*``), and Kafka handlers and sends
+    (``tglib_kafka_*``).
+
     Args:
         request: Request context injected by :mod:`aiohttp`.
 
@@ -215,7 +240,7 @@ async def handle_get_metrics(request: web.Request) -> web.Response:
             # curl -i http://localhost:8080/metrics
             HTTP/1.1 200 OK
             Content-Type: text/plain; charset=utf-8
-            Content-Length: 14161
+            Transfer-Encoding: chunked
             Date: Tue, 12 May 2020 18:58:37 GMT
             Server: Python/3.8 aiohttp/3.6.2
 
@@ -230,20 +255,44 @@ async def handle_get_metrics(request: web.Request) -> web.Response:
     - Prometheus
     produces:
     - text/plain
+    - application/openmetrics-text
     responses:
       "200":
         description: Successful operation.
       "500":
         description: Prometheus client is not running.
     """
+    openmetrics = "application/openmetrics-text" in request.headers.get(hdrs.ACCEPT, "")
     try:
-        metrics = PrometheusClient.poll_metrics()
+        metrics = PrometheusClient.iter_metrics(openmetrics)
     except ClientStoppedError:
         raise web.HTTPInternalServerError(text="The Prometheus client is not running")
 
-    # Return a string because Prometheus only accepts a text-based exposition format
-    metrics_str = "\n".join(metrics)
-    return web.Response(text=metrics_str)
+    if openmetrics:
+        content_type = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+    else:
+        content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    # Stream the metrics in chunks so the exposition is never held in memory whole
+    response = web.StreamResponse(headers={hdrs.CONTENT_TYPE: content_type})
+    if "gzip" in request.headers.get(hdrs.ACCEPT_ENCODING, ""):
+        response.enable_compression(web.ContentCoding.gzip)
+
+    await response.prepare(request)
+    chunk: List[str] = []
+    for metric in metrics:
+        chunk.append(metric)
+        if len(chunk) == METRICS_CHUNK_SIZE:
+            await response.write(("\n".join(chunk) + "\n").encode())
+            chunk = []
+
+    if openmetrics:
+        chunk.append("# EOF")
+    if chunk:
+        await response.write(("\n".join(chunk) + "\n").encode())
+
+    await response.write_eof()
+    return response
 
 
 @routes.get("/config")
@@ -299,6 +348,10 @@ async def handle_get_config(request: web.Request) -> web.Response:
 async def handle_set_config(request: web.Request) -> web.Response:
     """Completely overwrite the service's configuration settings.
 
+    The changes are applied live if callbacks registered with
+    :func:`~tglib.utils.reload.on_config_change` cover all of them, otherwise the
+    service restarts to apply them.
+
     Args:
         request: Request context injected by :mod:`aiohttp`.
 
@@ -356,21 +409,25 @@ async def handle_set_config(request: web.Request) -> web.Response:
     if not isinstance(config, dict):
         raise web.HTTPBadRequest(text="Invalid value for 'config': Not object")
 
+    old_config = _load_service_config()
     try:
         with open("./service_config.json", "w") as f:
             json.dump(config, f)
-
-        # Trigger the shutdown event
-        request.app["shutdown_event"].set()
-        return web.json_response(config)
     except OSError:
         raise web.HTTPInternalServerError(text="Failed to overwrite config")
 
+    await _apply_config(request.app, old_config, config)
+    return web.json_response(config)
+
 
 @routes.patch("/config")
 async def handle_update_config(request: web.Request) -> web.Response:
     """Partially update the service's configuration settings.
 
+    The changes are applied live if callbacks registered with
+    :func:`~tglib.utils.reload.on_config_change` cover all of them, otherwise the
+    service restarts to apply them.
+
     Args:
         request: Request context injected by :mod:`aiohttp`.
 
@@ -430,17 +487,15 @@ async def handle_update_config(request: web.Request) -> web.Response:
 
     try:
         with open("./service_config.json", "r+") as f:
-            config = json.load(f)
-            deep_update(config, updates)
+            old_config = json.load(f)
+            config = deepcopy(old_config)
+            # The request body is discarded, so its values can be shared
+            deep_update(config, updates, copy=False)
 
             # Write new config at the beginning of the file and truncate what's left
             f.seek(0)
             json.dump(config, f)
             f.truncate()
-
-        # Trigger the shutdown event
-        request.app["shutdown_event"].set()
-        return web.json_response(config)
     except json.JSONDecodeError:
         raise web.HTTPInternalServerError(
             text="Existing configuration is not valid JSON"
@@ -448,6 +503,32 @@ async def handle_update_config(request: web.Request) -> web.Response:
     except OSError:
         raise web.HTTPInternalServerError(text="Failed to update configuration")
 
+    await _apply_config(request.app, old_config, config)
+    return web.json_response(config)
+
+
+def _load_service_config() -> Optional[Dict]:
+    """Return the current service configuration, or None if it is unreadable."""
+    try:
+        with open("./service_config.json") as f:
+            config = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+
+    return config if isinstance(config, dict) else None
+
+
+async def _apply_config(
+    app: web.Application, old_config: Optional[Dict], config: Dict
+) -> None:
+    """Apply a new service configuration live, or restart the service."""
+    if old_config is not None and await reload.apply_config_change(old_config, config):
+        logging.info("Applied the service configuration changes live")
+        return
+
+    # Trigger the shutdown event
+    app["shutdown_event"].set()
+
 
 @routes.put("/log/{level:[A-Z]+}")
 async def handle_set_log_level(request: web.Request) -> web.Response:
@@ -505,3 +586,224 @@ async def handle_set_log_level(request: web.Request) -> web.Response:
         raise web.HTTPBadRequest(text=str(e))
 
     return web.Response(text=f"Log level set to {level} from {prev_level}")
+
+
+@routes.get("/debug/profile")
+async def handle_get_debug_profile(request: web.Request) -> web.Response:
+    """Profile the live service for a number of seconds.
+
+    The ``collapsed`` format (default) samples the event loop thread's stack every
+    5ms and returns the collapsed stacks for flame graph tools. The ``pstats`` and
+    ``text`` formats run :mod:`cProfile` instead, which records every call but slows
+    the service down, and return the binary stats file or a summary of the ``limit``
+    functions with the most cumulative time.
+
+    Args:
+        request: Request context injected by :mod:`aiohttp`.
+
+    Returns:
+        The profile in the requested format.
+
+    Raises:
+        web.HTTPBadRequest: Invalid ``seconds``, ``format`` or ``limit`` parameter.
+        web.HTTPConflict: Another debug request is in progress.
+        web.HTTPNotFound: The ``DEBUG_TOKEN`` environment variable is not set.
+        web.HTTPUnauthorized: Missing or incorrect bearer token.
+
+    Example:
+        ::
+
+            # curl -H "Authorization: Bearer $DEBUG_TOKEN" http://localhost:8080/debug/profile?seconds=30 > stacks.txt
+            # flamegraph.pl stacks.txt > stacks.svg
+
+    Note:
+        The debug routes are disabled unless the ``DEBUG_TOKEN`` environment variable
+        is set, and every request must carry it as a bearer token.
+
+    ---
+    description: Profile the live service for a number of seconds.
+    tags:
+    - Debug
+    produces:
+    - text/plain
+    - application/octet-stream
+    parameters:
+    - in: query
+      name: seconds
+      description: The profiling duration, at most 300 seconds.
+      type: number
+      default: 10
+    - in: query
+      name: format
+      description: The output format.
+      type: string
+      enum: [collapsed, pstats, text]
+      default: collapsed
+    - in: query
+      name: limit
+      description: The number of functions in the text format.
+      type: integer
+      default: 50
+    responses:
+      "200":
+        description: Successful operation.
+      "400":
+        description: Invalid 'seconds', 'format' or 'limit' parameter.
+      "401":
+        description: Missing or incorrect bearer token.
+      "404":
+        description: The debug routes are disabled.
+      "409":
+        description: Another debug request is in progress.
+    """
+    _check_debug_token(request)
+    seconds = _get_number(request, "seconds", 10, 300)
+    limit = int(_get_number(request, "limit", 50, 10000))
+    output_format = request.query.get("format", "collapsed")
+    if output_format not in ("collapsed", "pstats", "text"):
+        raise web.HTTPBadRequest(text=f"Invalid value for 'format': {output_format}")
+
+    with _debug_session():
+        if output_format == "collapsed":
+            stacks = await profiling.sample_stacks(seconds)
+            return web.Response(text=profiling.format_collapsed(stacks))
+
+        profiler = await profiling.profile(seconds)
+
+    if output_format == "pstats":
+        profiler.create_stats()
+        return web.Response(
+            body=marshal.dumps(profiler.stats),
+            content_type="application/octet-stream",
+            headers={hdrs.CONTENT_DISPOSITION: "attachment; filename=profile.pstats"},
+        )
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return web.Response(text=stream.getvalue())
+
+
+@routes.get("/debug/memory")
+async def handle_get_debug_memory(request: web.Request) -> web.Response:
+    """Return the allocation sites whose memory grew the most over a number of seconds.
+
+    Two :mod:`tracemalloc` snapshots are taken ``seconds`` apart and the ``limit``
+    allocation sites with the largest growth are returned, grouped by ``group_by``.
+    Allocations are only traced during the interval.
+
+    Args:
+        request: Request context injected by :mod:`aiohttp`.
+
+    Returns:
+        JSON response with the top allocation sites, by growth in size.
+
+    Raises:
+        web.HTTPBadRequest: Invalid ``seconds``, ``limit`` or ``group_by`` parameter.
+        web.HTTPConflict: Another debug request is in progress.
+        web.HTTPNotFound: The ``DEBUG_TOKEN`` environment variable is not set.
+        web.HTTPUnauthorized: Missing or incorrect bearer token.
+
+    Example:
+        ::
+
+            # curl -H "Authorization: Bearer $DEBUG_TOKEN" http://localhost:8080/debug/memory?seconds=60
+            HTTP/1.1 200 OK
+            Content-Type: application/json; charset=utf-8
+
+            [{"traceback": ["  File \\"/usr/local/lib/python3.8/site-packages/tglib/utils/registry.py\\", line 165", ...], "size": 1048704, "size_diff": 524352, "count": 4, "count_diff": 2}, ...]
+
+    Note:
+        The debug routes are disabled unless the ``DEBUG_TOKEN`` environment variable
+        is set, and every request must carry it as a bearer token.
+
+    ---
+    description: Return the allocation sites whose memory grew the most.
+    tags:
+    - Debug
+    produces:
+    - application/json
+    parameters:
+    - in: query
+      name: seconds
+      description: The time between the snapshots, at most 300 seconds.
+      type: number
+      default: 10
+    - in: query
+      name: limit
+      description: The number of allocation sites to return.
+      type: integer
+      default: 25
+    - in: query
+      name: group_by
+      description: How to group the allocations.
+      type: string
+      enum: [filename, lineno, traceback]
+      default: lineno
+    responses:
+      "200":
+        description: Successful operation.
+      "400":
+        description: Invalid 'seconds', 'limit' or 'group_by' parameter.
+      "401":
+        description: Missing or incorrect bearer token.
+      "404":
+        description: The debug routes are disabled.
+      "409":
+        description: Another debug request is in progress.
+    """
+    _check_debug_token(request)
+    seconds = _get_number(request, "seconds", 10, 300)
+    limit = int(_get_number(request, "limit", 25, 10000))
+    key_type = request.query.get("group_by", "lineno")
+    frames = 10 if key_type == "traceback" else 1
+
+    with _debug_session():
+        try:
+            stats = await profiling.trace_memory(seconds, limit, key_type, frames)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+
+    return web.json_response(stats)
+
+
+def _check_debug_token(request: web.Request) -> None:
+    """Only allow debug requests with the ``DEBUG_TOKEN`` bearer token."""
+    token = os.getenv("DEBUG_TOKEN")
+    if not token:
+        raise web.HTTPNotFound()
+
+    authorization = request.headers.get(hdrs.AUTHORIZATION, "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        raise web.HTTPUnauthorized(text="Missing or incorrect bearer token")
+
+
+def _get_number(
+    request: web.Request, name: str, default: float, maximum: float
+) -> float:
+    """Parse a positive number from the query string."""
+    try:
+        value = float(request.query.get(name, default))
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"Invalid value for '{name}': Not a number")
+
+    if not 0 < value <= maximum:
+        raise web.HTTPBadRequest(
+            text=f"Invalid value for '{name}': Not in range (0, {maximum}]"
+        )
+
+    return value
+
+
+@contextlib.contextmanager
+def _debug_session() -> Iterator[None]:
+    """Allow one debug request at a time, as profilers cannot be nested."""
+    global _debug_in_progress
+
+    if _debug_in_progress:
+        raise web.HTTPConflict(text="Another debug request is in progress")
+
+    _debug_in_progress = True
+    try:
+        yield
+    finally:
+        _debug_in_progress = False
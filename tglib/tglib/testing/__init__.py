@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+__all__ = [
+    "BenchmarkResult",
+    "FakeAPIService",
+    "FakeBackends",
+    "FakeKafka",
+    "FakeMySQL",
+    "FakePrometheus",
+    "benchmark",
+    "generate_topology",
+]
+
+from .api_service import FakeAPIService
+from .harness import BenchmarkResult, FakeBackends, benchmark
+from .kafka import FakeKafka
+from .mysql import FakeMySQL
+from .prometheus import FakePrometheus
+from .topology import generate_topology
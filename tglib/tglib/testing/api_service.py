@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import collections
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from aiohttp import web
+
+from .server import FakeServer
+
+
+# A canned response, or a function of the network name and params returning one
+Response = Union[Dict, Callable[[str, Dict], Dict]]
+
+
+class FakeAPIService(FakeServer):
+    """Serve the NMS network list and the API service of every network.
+
+    The NMS listens on the first port and each network's API service on a port of
+    its own, just like the primary controllers of a real deployment. ``getTopology``
+    returns the network's topology, ``isCtrlAlive`` returns an empty object and
+    other endpoints return their entry in ``responses``, or 404 if there is none.
+
+    Args:
+        topologies: The topologies, keyed by network name.
+        responses: The responses of other endpoints, keyed by endpoint name.
+        workers: The number of child processes to serve from, 0 to serve in-process.
+
+    Example:
+        >>> async with FakeAPIService({"A": generate_topology()}) as api_service:
+        ...     await APIServiceClient.start(api_service.config)
+        ...     topology = await APIServiceClient(timeout=1).request("A", "getTopology")
+    """
+
+    def __init__(
+        self,
+        topologies: Dict[str, Dict],
+        responses: Optional[Dict[str, Response]] = None,
+        workers: int = 0,
+    ) -> None:
+        super().__init__(len(topologies) + 1, workers)
+        self.topologies = topologies
+        self.responses: Dict[str, Response] = {
+            "getTopology": lambda network_name, params: self.topologies[network_name],
+            "isCtrlAlive": {},
+            **(responses or {}),
+        }
+        # The number of requests per network and endpoint
+        self.requests: Dict[Tuple[str, str], int] = collections.Counter()
+        self.app.add_routes(
+            [
+                web.get("/api/v1/networks", self._handle_networks),
+                web.post("/api/{endpoint}", self._handle_request),
+            ]
+        )
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        return {
+            "apiservice": {
+                "keycloak_enabled": False,
+                "nms": {"host": self.host, "port": self.port},
+            }
+        }
+
+    def _network_ports(self) -> Dict[int, str]:
+        ports = self.ports[1:]
+        return dict(zip(ports, self.topologies))
+
+    async def _handle_networks(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            [
+                {"name": name, "primary": {"api_ip": self.host, "api_port": port}}
+                for port, name in self._network_ports().items()
+            ]
+        )
+
+    async def _handle_request(self, request: web.Request) -> web.Response:
+        network_name = self._network_ports().get(self.local_port(request))
+        endpoint = request.match_info["endpoint"]
+        response = self.responses.get(endpoint)
+        if network_name is None or response is None:
+            raise web.HTTPNotFound()
+
+        self.requests[(network_name, endpoint)] += 1
+        if callable(response):
+            params = await request.json() if request.can_read_body else {}
+            response = response(network_name, params)
+
+        return web.json_response(response)
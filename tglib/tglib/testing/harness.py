@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Benchmark service jobs against the fake backends and a synthetic topology.
+
+Run a job coroutine function with JSON keyword arguments, e.g.::
+
+    python -m tglib.testing analytics.jobs:find_link_foliage \\
+        --links 10000 --sites 6000 --rounds 3 --kwargs '{"start_time_ms": ...}'
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import importlib
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import MetaData
+
+from ..clients.api_service_client import APIServiceClient
+from ..clients.prometheus_client import PrometheusClient
+from .api_service import FakeAPIService, Response
+from .kafka import FakeKafka
+from .mysql import FakeMySQL
+from .prometheus import FakePrometheus, Generator
+from .topology import generate_topology
+
+
+@dataclasses.dataclass
+class BenchmarkResult:
+    """The latency and memory usage of the rounds of a benchmark."""
+
+    name: str
+    latencies_s: List[float]
+    peak_memory_bytes: Optional[int] = None
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Return the min, median, p95 and max latencies, in seconds."""
+        return {
+            "min": min(self.latencies_s),
+            "median": statistics.median(self.latencies_s),
+            "p95": float(np.percentile(self.latencies_s, 95)),
+            "max": max(self.latencies_s),
+        }
+
+    def format(self) -> str:
+        """Return a one line summary of the result."""
+        latencies = " ".join(f"{k}={v:.3f}s" for k, v in self.stats.items())
+        summary = f"{self.name}: {len(self.latencies_s)} rounds, {latencies}"
+        if self.peak_memory_bytes is not None:
+            summary += f", peak_memory={self.peak_memory_bytes / 2 ** 20:.1f}MiB"
+        return summary
+
+
+async def benchmark(
+    func: Callable[..., Awaitable[Any]],
+    *args: Any,
+    rounds: int = 5,
+    warmup: int = 1,
+    trace_memory: bool = True,
+    **kwargs: Any,
+) -> BenchmarkResult:
+    """Time a coroutine function over a number of rounds.
+
+    Memory allocations are traced in an extra round, since :mod:`tracemalloc` slows
+    down the code under test.
+
+    Args:
+        func: The coroutine function to benchmark.
+        args: The positional arguments of ``func``.
+        rounds: The number of timed rounds.
+        warmup: The number of untimed rounds to run first, e.g. to fill caches.
+        trace_memory: Whether to measure the peak memory allocated by a round.
+        kwargs: The keyword arguments of ``func``.
+
+    Returns:
+        The latency of every round and the peak memory usage.
+
+    Raises:
+        ValueError: The value for ``rounds`` is not a positive integer.
+
+    Example:
+        >>> async with FakeBackends.from_size(num_links=10000):
+        ...     result = await benchmark(find_link_foliage, start_time_ms, 2, 5, 0.1, 600)
+        >>> print(result.format())
+    """
+    if rounds < 1:
+        raise ValueError(f"rounds must be a positive integer: {rounds}")
+
+    for _ in range(warmup):
+        await func(*args, **kwargs)
+
+    latencies_s = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await func(*args, **kwargs)
+        latencies_s.append(time.perf_counter() - start)
+
+    peak_memory_bytes = None
+    if trace_memory:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.clear_traces()
+            await func(*args, **kwargs)
+            peak_memory_bytes = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            if started:
+                tracemalloc.stop()
+
+    return BenchmarkResult(func.__qualname__, latencies_s, peak_memory_bytes)
+
+
+class FakeBackends:
+    """Run all of the fakes and point the tglib clients at them.
+
+    The :class:`~tglib.clients.prometheus_client.PrometheusClient` and
+    :class:`~tglib.clients.api_service_client.APIServiceClient` are started against
+    the fake servers, and the Kafka and MySQL client resources are replaced by the
+    in-memory stand-ins.
+
+    Args:
+        topologies: The topologies, keyed by network name.
+        generators: The Prometheus value generators, keyed by metric name.
+        responses: The API service responses, keyed by endpoint name.
+        metadata: The tables to create in the database.
+        workers: The number of child processes per fake server, 0 to serve
+            in-process.
+
+    Example:
+        >>> async with FakeBackends.from_size(num_links=10000) as backends:
+        ...     await generate_network_health_labels(int(time.time()), 3600)
+        ...     print(backends.prometheus.requests)
+    """
+
+    def __init__(
+        self,
+        topologies: Dict[str, Dict],
+        generators: Optional[Dict[str, Generator]] = None,
+        responses: Optional[Dict[str, Response]] = None,
+        metadata: Optional[MetaData] = None,
+        workers: int = 0,
+    ) -> None:
+        self.topologies = topologies
+        self.prometheus = FakePrometheus(topologies, generators, workers=workers)
+        self.api_service = FakeAPIService(topologies, responses, workers)
+        self.kafka = FakeKafka()
+        self.mysql = FakeMySQL(metadata)
+
+    @classmethod
+    def from_size(
+        cls,
+        num_networks: int = 1,
+        generators: Optional[Dict[str, Generator]] = None,
+        responses: Optional[Dict[str, Response]] = None,
+        metadata: Optional[MetaData] = None,
+        workers: int = 0,
+        **kwargs: Any,
+    ) -> "FakeBackends":
+        """Create the fakes for generated topologies.
+
+        Args:
+            num_networks: The number of networks.
+            generators: The Prometheus value generators, keyed by metric name.
+            responses: The API service responses, keyed by endpoint name.
+            metadata: The tables to create in the database.
+            workers: The number of child processes per fake server.
+            kwargs: The :func:`~tglib.testing.topology.generate_topology` arguments
+                of every network.
+        """
+        topologies = {}
+        for i in range(num_networks):
+            name = f"network-{i}"
+            topologies[name] = generate_topology(name, seed=i, **kwargs)
+
+        return cls(topologies, generators, responses, metadata, workers)
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """Return the tglib client configuration pointing at the fakes."""
+        return {**self.prometheus.config, **self.api_service.config}
+
+    async def start(self) -> None:
+        await asyncio.gather(self.prometheus.start(), self.api_service.start())
+        await PrometheusClient.start(self.config)
+        await APIServiceClient.start(self.config)
+        self.kafka.install()
+        self.mysql.install()
+
+    async def stop(self) -> None:
+        self.kafka.uninstall()
+        self.mysql.uninstall()
+        await asyncio.gather(PrometheusClient.stop(), APIServiceClient.stop())
+        await asyncio.gather(self.prometheus.stop(), self.api_service.stop())
+        # Don't leak the metrics written by the jobs into later runs
+        PrometheusClient._metrics = None
+
+    async def __aenter__(self) -> "FakeBackends":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+
+
+def _load(path: str) -> Any:
+    """Return the attribute at a ``module:attribute`` path."""
+    module, _, attribute = path.partition(":")
+    obj = importlib.import_module(module)
+    for name in attribute.split("."):
+        obj = getattr(obj, name)
+    return obj
+
+
+async def _run(args: argparse.Namespace) -> None:
+    func = _load(args.job)
+    backends = FakeBackends.from_size(
+        args.networks,
+        generators=_load(args.generators) if args.generators else None,
+        metadata=_load(args.metadata).metadata if args.metadata else None,
+        workers=args.workers,
+        num_sites=args.sites,
+        num_links=args.links,
+        cn_fraction=args.cn_fraction,
+        p2mp_fraction=args.p2mp_fraction,
+    )
+    async with backends:
+        if args.setup:
+            setup = _load(args.setup)()
+            if asyncio.iscoroutine(setup):
+                await setup
+
+        result = await benchmark(
+            func, rounds=args.rounds, warmup=args.warmup, **json.loads(args.kwargs)
+        )
+
+    print(json.dumps(dataclasses.asdict(result)) if args.json else result.format())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("job", help="The job coroutine function, as module:function")
+    parser.add_argument("--kwargs", default="{}", help="The job arguments as JSON")
+    parser.add_argument(
+        "--generators", help="The Prometheus value generators, as module:attribute"
+    )
+    parser.add_argument("--metadata", help="The declarative base, as module:Base")
+    parser.add_argument(
+        "--setup", help="A function to call once the fakes run, as module:function"
+    )
+    parser.add_argument("--networks", type=int, default=1)
+    parser.add_argument("--sites", type=int, default=6000)
+    parser.add_argument("--links", type=int, default=10000)
+    parser.add_argument("--cn-fraction", type=float, default=0.2)
+    parser.add_argument("--p2mp-fraction", type=float, default=0.3)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="The processes per fake server, 0 to serve from the benchmark process",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the raw result")
+    asyncio.run(_run(parser.parse_args()))
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict, Iterable, List, Optional, Set
+
+from aiokafka import ConsumerRecord, TopicPartition
+
+from ..clients.kafka_consumer import KafkaConsumer
+from ..clients.kafka_producer import KafkaProducer
+
+
+class FakeKafka:
+    """An in-memory Kafka broker with a single partition per topic.
+
+    :meth:`install` replaces the resources of the
+    :class:`~tglib.clients.kafka_producer.KafkaProducer` and
+    :class:`~tglib.clients.kafka_consumer.KafkaConsumer` with a producer and a
+    consumer connected to the broker, so that services can produce and consume
+    records without a Kafka cluster.
+
+    Example:
+        >>> kafka = FakeKafka()
+        >>> kafka.install()
+        >>> kafka.consumer.subscribe(["events"])
+        >>> await KafkaProducer().send_data("events", b"{}")
+        >>> kafka.topics["events"][0].value
+        b'{}'
+    """
+
+    def __init__(self) -> None:
+        self.topics: DefaultDict[str, List[ConsumerRecord]] = defaultdict(list)
+        self.producer = FakeProducer(self)
+        self.consumer = FakeConsumer(self)
+        self._waiters: List["asyncio.Future[None]"] = []
+
+    def install(self) -> None:
+        """Set the fake producer and consumer as the tglib Kafka client resources."""
+        KafkaProducer._producer = self.producer
+        KafkaConsumer._consumer = self.consumer
+
+    def uninstall(self) -> None:
+        """Reset the tglib Kafka client resources."""
+        KafkaProducer._producer = None
+        KafkaConsumer._consumer = None
+
+    def append(
+        self,
+        topic: str,
+        value: Any,
+        key: Any = None,
+        timestamp_ms: Optional[int] = None,
+    ) -> ConsumerRecord:
+        """Append a record to a topic and wake up the waiting consumers."""
+        records = self.topics[topic]
+        record = ConsumerRecord(
+            topic=topic,
+            partition=0,
+            offset=len(records),
+            timestamp=timestamp_ms or int(time.time() * 1000),
+            timestamp_type=0,
+            key=key,
+            value=value,
+            checksum=None,
+            serialized_key_size=len(key) if key is not None else -1,
+            serialized_value_size=len(value) if value is not None else -1,
+            headers=[],
+        )
+        records.append(record)
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+        return record
+
+    def wait_produced(self) -> "asyncio.Future[None]":
+        """Return a future that is done when the next record is appended."""
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        return waiter
+
+
+class FakeProducer:
+    """The subset of the ``AIOKafkaProducer`` API used by tglib, backed by a broker."""
+
+    def __init__(self, broker: FakeKafka) -> None:
+        self.broker = broker
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def flush(self) -> None:
+        pass
+
+    async def send(
+        self,
+        topic: str,
+        value: Any = None,
+        key: Any = None,
+        partition: Optional[int] = None,
+        timestamp_ms: Optional[int] = None,
+        headers: Any = None,
+    ) -> "asyncio.Future[ConsumerRecord]":
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(self.broker.append(topic, value, key, timestamp_ms))
+        return future
+
+    async def send_and_wait(self, *args: Any, **kwargs: Any) -> ConsumerRecord:
+        return await (await self.send(*args, **kwargs))
+
+
+class FakeConsumer:
+    """The subset of the ``AIOKafkaConsumer`` API used by tglib, backed by a broker.
+
+    Subscribing assigns partition 0 of every topic, starting from the beginning.
+    """
+
+    def __init__(self, broker: FakeKafka) -> None:
+        self.broker = broker
+        self.positions: Dict[TopicPartition, int] = {}
+        self.committed: Dict[TopicPartition, int] = {}
+        self.paused: Set[TopicPartition] = set()
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def subscribe(self, topics: Iterable[str]) -> None:
+        self.positions = {TopicPartition(topic, 0): 0 for topic in topics}
+
+    def assignment(self) -> Set[TopicPartition]:
+        return set(self.positions)
+
+    def pause(self, *partitions: TopicPartition) -> None:
+        self.paused.update(partitions)
+
+    def resume(self, *partitions: TopicPartition) -> None:
+        self.paused.difference_update(partitions)
+
+    def highwater(self, tp: TopicPartition) -> int:
+        return len(self.broker.topics[tp.topic])
+
+    async def position(self, tp: TopicPartition) -> int:
+        return self.positions[tp]
+
+    async def commit(self, offsets: Optional[Dict[TopicPartition, int]] = None) -> None:
+        self.committed.update(offsets or self.positions)
+
+    async def getmany(
+        self, timeout_ms: int = 0, max_records: Optional[int] = None
+    ) -> Dict[TopicPartition, List[ConsumerRecord]]:
+        """Return the next records of the unpaused partitions, waiting up to
+        ``timeout_ms`` milliseconds for any to be produced."""
+        batches = self._fetch(max_records)
+        if not batches and timeout_ms > 0:
+            try:
+                await asyncio.wait_for(self.broker.wait_produced(), timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                return {}
+            batches = self._fetch(max_records)
+
+        return batches
+
+    def _fetch(
+        self, max_records: Optional[int]
+    ) -> Dict[TopicPartition, List[ConsumerRecord]]:
+        batches = {}
+        remaining = max_records
+        for tp, position in self.positions.items():
+            if tp in self.paused or remaining == 0:
+                continue
+
+            records = self.broker.topics[tp.topic]
+            end = len(records) if remaining is None else position + remaining
+            batch = records[position:end]
+            if batch:
+                batches[tp] = batch
+                self.positions[tp] = position + len(batch)
+                if remaining is not None:
+                    remaining -= len(batch)
+
+        return batches
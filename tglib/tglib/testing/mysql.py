@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import contextlib
+from typing import Any, AsyncIterator, List, Optional
+
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.engine import Connection, ResultProxy, RowProxy
+from sqlalchemy.pool import StaticPool
+
+from ..clients.mysql_client import MySQLClient
+
+
+class FakeMySQL:
+    """An in-memory SQLite database standing in for the MySQL connection pool.
+
+    :meth:`install` replaces the engine of the
+    :class:`~tglib.clients.mysql_client.MySQLClient`, so that ``lease``,
+    ``bulk_insert`` and the ``execute``/``scalar``/``fetchall``/``first`` calls of
+    services run against SQLite.
+
+    Args:
+        metadata: The tables to create, e.g. the ``metadata`` of a declarative base.
+
+    Note:
+        Statements autocommit, so ``sa_conn.connection.commit()`` is a no-op.
+        ``MySQLClient.stream`` needs a MySQL server-side cursor and is not supported,
+        nor are MySQL-specific constructs such as ``on_duplicate_key_update``.
+
+    Example:
+        >>> mysql = FakeMySQL(Base.metadata)
+        >>> mysql.install()
+        >>> async with MySQLClient().lease() as sa_conn:
+        ...     await sa_conn.execute(insert(Table).values(name="test"))
+    """
+
+    def __init__(self, metadata: Optional[MetaData] = None) -> None:
+        # Share a single connection so that the database outlives every lease
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        self.dialect = self.engine.dialect
+        if metadata is not None:
+            metadata.create_all(self.engine)
+
+    def install(self) -> None:
+        """Set the database as the tglib MySQL client engine."""
+        MySQLClient._engine = self
+
+    def uninstall(self) -> None:
+        """Reset the tglib MySQL client engine."""
+        MySQLClient._engine = None
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator["FakeConnection"]:
+        with self.engine.connect() as conn:
+            yield FakeConnection(conn)
+
+    def close(self) -> None:
+        pass
+
+    async def wait_closed(self) -> None:
+        self.engine.dispose()
+
+
+class FakeConnection:
+    """The subset of the ``aiomysql.sa.SAConnection`` API used by services."""
+
+    def __init__(self, conn: Connection) -> None:
+        self._conn = conn
+
+    @property
+    def connection(self) -> "FakeConnection":
+        return self
+
+    async def execute(
+        self, query: Any, *multiparams: Any, **params: Any
+    ) -> "FakeResult":
+        return FakeResult(self._conn.execute(query, *multiparams, **params))
+
+    async def scalar(self, query: Any, *multiparams: Any, **params: Any) -> Any:
+        return self._conn.scalar(query, *multiparams, **params)
+
+    async def commit(self) -> None:
+        pass
+
+    async def rollback(self) -> None:
+        pass
+
+
+class FakeResult:
+    """The subset of the ``aiomysql.sa.ResultProxy`` API used by services."""
+
+    def __init__(self, result: ResultProxy) -> None:
+        self._result = result
+
+    @property
+    def rowcount(self) -> int:
+        return int(self._result.rowcount)
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return self._result.lastrowid  # type: ignore
+
+    async def fetchall(self) -> List[RowProxy]:
+        return list(self._result.fetchall())
+
+    async def fetchmany(self, size: Optional[int] = None) -> List[RowProxy]:
+        return list(self._result.fetchmany(size))
+
+    async def fetchone(self) -> Optional[RowProxy]:
+        return self._result.fetchone()
+
+    async def first(self) -> Optional[RowProxy]:
+        return self._result.first()
+
+    async def scalar(self) -> Any:
+        return self._result.scalar()
+
+    async def close(self) -> None:
+        self._result.close()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import collections
+import json
+import re
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple, cast
+
+import numpy as np
+from aiohttp import web
+
+from ..clients.prometheus_client import PrometheusClient
+from ..utils.registry import format_value
+from .server import FakeServer
+
+
+# Generate the values of a series, given its labels, at the scrape timestamps
+Generator = Callable[[Dict[str, str], np.ndarray], np.ndarray]
+# A series, as (labels, function of the evaluation timestamps to values)
+Series = Tuple[Dict[str, str], Callable[[np.ndarray], np.ndarray]]
+
+_FUNCTION_RE = re.compile(r"^([a-zA-Z_]\w*)\s*\(")
+_AGGREGATION_RE = re.compile(r"^[a-z_]+\s+(by|without)\s*\([^)]*\)\s*\(")
+_SELECTOR_RE = re.compile(
+    r"^([a-zA-Z_:][\w:]*)?\s*(?:\{(.*)\})?\s*(?:\[[^\]]*\])?$", re.DOTALL
+)
+_MATCHER_RE = re.compile(r'(\w+)\s*(=~|!~|!=|=)\s*"((?:[^"\\]|\\.)*)"')
+_IDENTIFIER_RE = re.compile(r"^[a-zA-Z_:][\w:]*$")
+
+
+def default_generator(labels: Dict[str, str], timestamps: np.ndarray) -> np.ndarray:
+    """Generate a stable integer level in [0, 100) per series with ±1 of noise.
+
+    The values are integers since many stats are indices (e.g. ``tx_power``), and
+    only depend on the labels and the timestamps, so repeated queries return the
+    same data.
+    """
+    seed = zlib.crc32(repr(sorted(labels.items())).encode())
+    noise = (timestamps.astype(np.int64) * 2654435761 + seed) % 3 - 1
+    return (seed % 100 + noise).astype(float)
+
+
+def link_label_sets(topologies: Dict[str, Dict]) -> List[Dict[str, str]]:
+    """Return the labels of the per-link, per-direction series of the topologies.
+
+    Args:
+        topologies: The topologies, keyed by network name.
+
+    Returns:
+        One label set per link direction, with the ``network``, ``linkName``,
+        ``linkDirection``, ``nodeName``, ``nodeMac`` and ``intervalSec`` labels.
+    """
+    label_sets = []
+    for network_name, topology in topologies.items():
+        for link in topology["links"]:
+            for direction in ("A", "Z"):
+                end = direction.lower()
+                label_sets.append(
+                    {
+                        "network": network_name,
+                        "linkName": link["name"],
+                        "linkDirection": direction,
+                        "nodeName": link[f"{end}_node_name"],
+                        "nodeMac": link[f"{end}_node_mac"],
+                        "intervalSec": "30",
+                    }
+                )
+
+    return label_sets
+
+
+class FakePrometheus(FakeServer):
+    """Serve generated series over the Prometheus HTTP API.
+
+    Every metric name exists for all of the ``label_sets``, which default to one
+    series per link direction of the topologies. The values are produced by the
+    metric's generator, or :func:`default_generator`, and are emitted every
+    ``scrape_interval_s`` seconds, so they are held between scrapes like real data.
+
+    A subset of PromQL is evaluated: selectors with label matchers and range
+    suffixes, ``or`` unions, ``label_replace`` and ``timestamp``. Other functions and
+    aggregations evaluate to their inner selector unchanged.
+
+    Args:
+        topologies: The topologies to generate series for, keyed by network name.
+        generators: The value generators, keyed by metric name.
+        label_sets: The labels of the series of every metric.
+        scrape_interval_s: The time between the emitted samples, in seconds.
+        workers: The number of child processes to serve from, 0 to serve in-process.
+
+    Example:
+        >>> topology = generate_topology(num_sites=5000, num_links=10000)
+        >>> rssi = lambda labels, ts: np.full(len(ts), -60.0)
+        >>> async with FakePrometheus({"A": topology}, {"rssi": rssi}) as prometheus:
+        ...     await PrometheusClient.start(prometheus.config)
+    """
+
+    def __init__(
+        self,
+        topologies: Dict[str, Dict],
+        generators: Optional[Dict[str, Generator]] = None,
+        label_sets: Optional[List[Dict[str, str]]] = None,
+        scrape_interval_s: int = 30,
+        workers: int = 0,
+    ) -> None:
+        super().__init__(workers=workers)
+        self.generators = generators or {}
+        self.label_sets = (
+            link_label_sets(topologies) if label_sets is None else label_sets
+        )
+        self.scrape_interval_s = scrape_interval_s
+        # The number of requests per API path
+        self.requests: Dict[str, int] = collections.Counter()
+        self.app.add_routes(
+            [
+                web.get("/api/v1/query", self._handle_query),
+                web.get("/api/v1/query_range", self._handle_query_range),
+                web.get("/api/v1/targets", self._handle_targets),
+            ]
+        )
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        return {"prometheus": {"host": self.host, "port": self.port}}
+
+    def evaluate(self, query: str) -> List[Series]:
+        """Evaluate a query into series that can be sampled at any timestamps.
+
+        Args:
+            query: The PromQL string query.
+
+        Returns:
+            The matching series.
+
+        Raises:
+            ValueError: The query is not supported.
+        """
+        query = query.strip()
+        parts = _split(query, " or ")
+        if len(parts) > 1:
+            series: Dict[Tuple, Series] = {}
+            for part in parts:
+                for labels, values in self.evaluate(part):
+                    series.setdefault(tuple(sorted(labels.items())), (labels, values))
+            return list(series.values())
+
+        function = _FUNCTION_RE.match(query)
+        if function is not None and _closing_paren(query, function.end() - 1) == -1:
+            start = function.end()
+            return self._apply(function.group(1), _split(query[start:-1], ","))
+
+        aggregation = _AGGREGATION_RE.match(query)
+        if (
+            aggregation is not None
+            and _closing_paren(query, aggregation.end() - 1) == -1
+        ):
+            start = aggregation.end()
+            return self.evaluate(query[start:-1])
+
+        return self._select(query)
+
+    def _apply(self, function: str, args: List[str]) -> List[Series]:
+        if function == "label_replace" and len(args) == 5:
+            dst, replacement, src, regex = [_unquote(arg) for arg in args[1:]]
+            pattern = re.compile(regex)
+            series = []
+            for labels, values in self.evaluate(args[0]):
+                match = pattern.fullmatch(labels.get(src, ""))
+                if match is not None:
+                    labels = {
+                        **labels,
+                        dst: match.expand(replacement.replace("$", "\\")),
+                    }
+                series.append((labels, values))
+            return series
+
+        series = []
+        for labels, values in self.evaluate(args[0]):
+            labels = {k: v for k, v in labels.items() if k != "__name__"}
+            if function == "timestamp":
+                values = self._emissions
+            series.append((labels, values))
+        return series
+
+    def _select(self, selector: str) -> List[Series]:
+        match = _SELECTOR_RE.match(selector)
+        if match is None or not (match.group(1) or match.group(2)):
+            raise ValueError(f"Unsupported query: {selector}")
+
+        names = [match.group(1)] if match.group(1) else []
+        matchers = []
+        for label, op, value in _MATCHER_RE.findall(match.group(2) or ""):
+            if label != "__name__":
+                matchers.append((label, op, value))
+            elif op == "=":
+                names.append(value)
+            elif op == "=~" and all(map(_IDENTIFIER_RE.match, value.split("|"))):
+                names += value.split("|")
+            else:
+                raise ValueError(f"Unsupported metric name matcher: {op}{value}")
+
+        series = []
+        for labels in self.label_sets:
+            if all(
+                _matches(labels.get(label, ""), op, value)
+                for label, op, value in matchers
+            ):
+                for name in names:
+                    named = {"__name__": name, **labels}
+                    series.append((named, self._sampler(name, named)))
+        return series
+
+    def _sampler(
+        self, name: str, labels: Dict[str, str]
+    ) -> Callable[[np.ndarray], np.ndarray]:
+        generator = self.generators.get(name, default_generator)
+        return lambda timestamps: generator(labels, self._emissions(timestamps))
+
+    def _emissions(self, timestamps: np.ndarray) -> np.ndarray:
+        """Return the time of the last scrape at or before each timestamp."""
+        return cast(np.ndarray, timestamps - timestamps % self.scrape_interval_s)
+
+    async def _handle_query(self, request: web.Request) -> web.Response:
+        self.requests[request.path] += 1
+        params = request.query
+        timestamp = float(params.get("time", time.time()))
+        try:
+            series = self.evaluate(params["query"])
+        except (KeyError, ValueError) as e:
+            return _error(str(e))
+
+        timestamps = np.array([timestamp])
+        result = [
+            {
+                "metric": labels,
+                "value": [timestamp, format_value(float(values(timestamps)[0]))],
+            }
+            for labels, values in series
+        ]
+        return web.json_response(
+            {"status": "success", "data": {"resultType": "vector", "result": result}}
+        )
+
+    async def _handle_query_range(self, request: web.Request) -> web.Response:
+        self.requests[request.path] += 1
+        params = request.query
+        try:
+            start, end = float(params["start"]), float(params["end"])
+            step = _parse_step(params["step"])
+            series = self.evaluate(params["query"])
+        except (KeyError, ValueError) as e:
+            return _error(str(e))
+
+        # Render the body directly, the samples dominate the size of the response
+        timestamps = np.arange(start, end + step / 2, step)
+        times = [format_value(t) for t in timestamps.tolist()]
+        result = []
+        for labels, values in series:
+            samples = ",".join(
+                f'[{t},"{value}"]'
+                for t, value in zip(times, _format_values(values(timestamps)))
+            )
+            result.append(f'{{"metric":{json.dumps(labels)},"values":[{samples}]}}')
+
+        return web.Response(
+            text='{"status":"success","data":{"resultType":"matrix","result":['
+            + ",".join(result)
+            + "]}}",
+            content_type="application/json",
+        )
+
+    async def _handle_targets(self, request: web.Request) -> web.Response:
+        self.requests[request.path] += 1
+        return web.json_response(
+            {"status": "success", "data": {"activeTargets": [], "droppedTargets": []}}
+        )
+
+
+def _split(expr: str, separator: str) -> List[str]:
+    """Split an expression on a separator outside of quotes and brackets."""
+    parts, depth, quoted, start, i = [], 0, False, 0, 0
+    while i < len(expr):
+        char = expr[i]
+        if char == '"' and (i == 0 or expr[i - 1] != "\\"):
+            quoted = not quoted
+        elif not quoted and char in "({[":
+            depth += 1
+        elif not quoted and char in ")}]":
+            depth -= 1
+        elif not quoted and depth == 0 and expr.startswith(separator, i):
+            parts.append(expr[start:i].strip())
+            start = i = i + len(separator)
+            continue
+        i += 1
+
+    parts.append(expr[start:].strip())
+    return parts
+
+
+def _closing_paren(expr: str, index: int) -> int:
+    """Return the index of the parenthesis closing the one at ``index``, counting
+    from the end of the expression (i.e. -1 if it closes at the end)."""
+    depth, quoted = 0, False
+    for i in range(index, len(expr)):
+        char = expr[i]
+        if char == '"' and expr[i - 1] != "\\":
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+            if depth == 0:
+                return i - len(expr)
+
+    raise ValueError(f"Unbalanced parentheses: {expr}")
+
+
+def _unquote(arg: str) -> str:
+    return arg.strip()[1:-1]
+
+
+def _matches(actual: str, op: str, value: str) -> bool:
+    if op == "=":
+        return actual == value
+    if op == "!=":
+        return actual != value
+    if op == "=~":
+        return re.fullmatch(value, actual) is not None
+    return re.fullmatch(value, actual) is None
+
+
+def _format_values(values: np.ndarray) -> List[str]:
+    """Format sample values like :func:`format_value`, vectorized."""
+    samples = list(map(repr, values.tolist()))
+    for i in np.flatnonzero(~np.isfinite(values) | (values == np.trunc(values))):
+        samples[i] = format_value(float(values[i]))
+    return samples
+
+
+def _parse_step(step: str) -> float:
+    try:
+        return float(step)
+    except ValueError:
+        return float(PrometheusClient.duration2seconds(step))
+
+
+def _error(msg: str) -> web.Response:
+    return web.json_response(
+        {"status": "error", "errorType": "bad_data", "error": msg}, status=400
+    )
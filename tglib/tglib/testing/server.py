@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import multiprocessing
+import socket
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+class FakeServer:
+    """Serve an :mod:`aiohttp` application on ephemeral localhost ports.
+
+    Subclasses add their routes to :attr:`app` and may listen on several ports, for
+    instance to tell apart the networks behind a single fake API service.
+
+    If ``workers`` is set, that many forked child processes accept the connections
+    on the listening sockets, so that the time and memory spent generating responses
+    are not attributed to the code under test. Any state the handlers record (e.g.
+    request counts) then stays in the child processes.
+
+    Args:
+        num_ports: The number of ports to listen on.
+        workers: The number of child processes to serve from, 0 to serve in-process.
+
+    Example:
+        >>> async with FakePrometheus(topologies) as prometheus:
+        ...     await PrometheusClient.start(prometheus.config)
+    """
+
+    host = "127.0.0.1"
+
+    def __init__(self, num_ports: int = 1, workers: int = 0) -> None:
+        self.app = web.Application()
+        self.num_ports = num_ports
+        self.workers = workers
+        self.ports: List[int] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._processes: List[multiprocessing.process.BaseProcess] = []
+
+    @property
+    def port(self) -> int:
+        """Return the first port the server listens on."""
+        return self.ports[0]
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """Return the tglib client configuration pointing at the server."""
+        raise NotImplementedError()
+
+    async def start(self) -> None:
+        """Start listening on :attr:`num_ports` ephemeral ports."""
+        socks = []
+        for _ in range(self.num_ports):
+            sock = socket.socket()
+            sock.bind((self.host, 0))
+            sock.listen(128)
+            socks.append(sock)
+            self.ports.append(sock.getsockname()[1])
+
+        if not self.workers:
+            await self._serve(socks)
+            return
+
+        # Connections are queued on the sockets until the workers accept them
+        ctx = multiprocessing.get_context("fork")
+        for _ in range(self.workers):
+            process = ctx.Process(target=self._run_worker, args=(socks,), daemon=True)
+            process.start()
+            self._processes.append(process)
+        for sock in socks:
+            sock.close()
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        for process in self._processes:
+            process.terminate()
+            process.join()
+        self._processes = []
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        self.ports = []
+
+    async def _serve(self, socks: List[socket.socket]) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        for sock in socks:
+            await web.SockSite(self._runner, sock).start()
+
+    def _run_worker(self, socks: List[socket.socket]) -> None:
+        """Serve forever on a new event loop, in a child process."""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(self._serve(socks))
+        loop.run_forever()
+
+    async def __aenter__(self) -> "FakeServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+
+    @staticmethod
+    def local_port(request: web.Request) -> int:
+        """Return the server port a request was received on."""
+        return int(request.transport.get_extra_info("sockname")[1])  # type: ignore
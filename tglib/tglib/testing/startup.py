@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Benchmark the cold start time and memory of service entry points.
+
+Every round imports the entry point module in a fresh interpreter, e.g.::
+
+    python -m tglib.testing.startup analytics.main optimizer_service.main --rounds 5
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .harness import BenchmarkResult
+
+
+# Run in the child interpreter, prints the import time, peak RSS and loaded modules
+_CHILD = """
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "import_s": elapsed,
+    "max_rss_bytes": max_rss if sys.platform == "darwin" else max_rss * 1024,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)$")
+
+
+@dataclasses.dataclass
+class StartupResult(BenchmarkResult):
+    """The cold start latency and peak RSS of an entry point module.
+
+    ``latencies_s`` holds the wall time of whole interpreter runs, while
+    ``import_latencies_s`` only covers the import of the module itself.
+    """
+
+    import_latencies_s: List[float] = dataclasses.field(default_factory=list)
+    modules: List[str] = dataclasses.field(default_factory=list)
+
+    def format(self) -> str:
+        """Return a one line summary of the result."""
+        import_s = sorted(self.import_latencies_s)[len(self.import_latencies_s) // 2]
+        return (
+            f"{super().format()}, median_import={import_s:.3f}s, "
+            f"{len(self.modules)} modules"
+        )
+
+
+def _run_child(module: str, env: Dict[str, str], *options: str) -> Tuple[Dict, str]:
+    """Import a module in a fresh interpreter and return its report and stderr."""
+    proc = subprocess.run(
+        [sys.executable, *options, "-c", _CHILD, module],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Failed to import {module}:\n{proc.stderr}")
+
+    return json.loads(proc.stdout.splitlines()[-1]), proc.stderr
+
+
+def measure_startup(module: str, rounds: int = 5, warmup: int = 1) -> StartupResult:
+    """Time the import of a module in fresh interpreters and record the peak RSS.
+
+    Hash randomization is disabled and the bytecode caches are warmed up first, so
+    repeated runs on the same machine are comparable.
+
+    Args:
+        module: The entry point module, e.g. ``analytics.main``.
+        rounds: The number of timed interpreter runs.
+        warmup: The number of untimed runs to fill the bytecode and page caches.
+
+    Returns:
+        The wall time of each run, the largest peak RSS and the loaded modules.
+
+    Raises:
+        RuntimeError: The module failed to import.
+        ValueError: The value for ``rounds`` is not a positive integer.
+
+    Example:
+        >>> print(measure_startup("analytics.main").format())
+        analytics.main: 5 rounds, min=0.512s ..., peak_memory=61.3MiB, ...
+    """
+    if rounds < 1:
+        raise ValueError(f"rounds must be a positive integer: {rounds}")
+
+    env = {**os.environ, "PYTHONHASHSEED": "0"}
+    for _ in range(warmup):
+        _run_child(module, env)
+
+    latencies_s, import_latencies_s = [], []
+    max_rss_bytes = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        report, _ = _run_child(module, env)
+        latencies_s.append(time.perf_counter() - start)
+        import_latencies_s.append(report["import_s"])
+        max_rss_bytes = max(max_rss_bytes, report["max_rss_bytes"])
+
+    return StartupResult(
+        module,
+        latencies_s,
+        max_rss_bytes,
+        import_latencies_s,
+        report["modules"],
+    )
+
+
+def slowest_imports(module: str, top: int = 10) -> List[Tuple[str, float]]:
+    """Return the top-level packages that take the longest to import with a module.
+
+    The time of a package is the sum of the self import times (from ``python -X
+    importtime``) of all of its modules, so that the dependencies of a package are
+    not counted against it.
+
+    Args:
+        module: The entry point module, e.g. ``analytics.main``.
+        top: The number of packages to return.
+
+    Returns:
+        The package names and import times in seconds, slowest first.
+    """
+    env = {**os.environ, "PYTHONHASHSEED": "0"}
+    _, stderr = _run_child(module, env, "-X", "importtime")
+
+    packages: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match is not None:
+            name = match.group(2).split(".", 1)[0]
+            packages[name] = packages.get(name, 0) + int(match.group(1)) / 1e6
+
+    return sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="+", help="The entry point modules")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "--top", type=int, default=0, help="Also list the N slowest packages to import"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the raw results")
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        result = measure_startup(module, args.rounds, args.warmup)
+        if args.json:
+            print(json.dumps(dataclasses.asdict(result)))
+        else:
+            print(result.format())
+
+        if args.top > 0:
+            for name, seconds in slowest_imports(module, args.top):
+                print(f"  {name}: {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
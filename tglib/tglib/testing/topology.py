@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import math
+import random
+from typing import Any, Dict, List, Set, Tuple
+
+
+# The Thrift NodeType and LinkType values
+NODE_TYPE_CN = 1
+NODE_TYPE_DN = 2
+LINK_TYPE_WIRELESS = 1
+NODE_STATUS_ONLINE = 2
+
+
+def generate_topology(
+    name: str = "synthetic",
+    num_sites: int = 100,
+    num_links: int = 150,
+    cn_fraction: float = 0.2,
+    p2mp_fraction: float = 0.3,
+    nodes_per_dn_site: int = 4,
+    num_pops: int = 1,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Generate a random topology in ``getTopology`` form.
+
+    A fraction ``cn_fraction`` of the sites host a single CN and the others host
+    ``nodes_per_dn_site`` DNs, one per sector. The first ``num_pops`` sites are POP
+    sites. The DN sites are first connected into a spanning tree, every CN is then
+    connected to a DN, and the remaining links are added between random pairs of DN
+    sites. When a link is added at a DN site, it reuses the site's busiest node with probability
+    ``p2mp_fraction`` (forming point-to-multipoint sectors) or else its least used
+    node. All of the nodes are online and all of the links are wireless and alive.
+
+    Args:
+        name: The topology name.
+        num_sites: The number of sites.
+        num_links: The number of wireless links.
+        cn_fraction: The fraction of sites with a CN.
+        p2mp_fraction: The probability that a link joins an already used sector.
+        nodes_per_dn_site: The number of DN nodes per DN site.
+        num_pops: The number of DN sites with POP nodes.
+        seed: The random seed, the same arguments always generate the same topology.
+
+    Returns:
+        The topology as a Python dictionary.
+
+    Raises:
+        ValueError: The number of links cannot connect all of the sites, or exceeds
+            the number of possible DN site pairs.
+
+    Example:
+        >>> topology = generate_topology(num_sites=5000, num_links=10000)
+        >>> len(topology["links"])
+        10000
+    """
+    rng = random.Random(seed)
+    num_cn_sites = int(num_sites * cn_fraction)
+    num_dn_sites = num_sites - num_cn_sites
+    min_links = num_dn_sites - 1 + num_cn_sites
+    max_links = num_dn_sites * (num_dn_sites - 1) // 2 + num_cn_sites
+    if num_dn_sites < 1 or not min_links <= num_links <= max_links:
+        raise ValueError(
+            f"{num_links} links cannot connect {num_dn_sites} DN and "
+            f"{num_cn_sites} CN sites"
+        )
+
+    sites: List[Dict[str, Any]] = []
+    nodes: List[Dict[str, Any]] = []
+    # The node indices of each site
+    site_nodes: List[List[int]] = []
+    # Spread the sites over a grid of about 200m squares around Menlo Park
+    side = math.ceil(math.sqrt(num_sites))
+    for i in range(num_sites):
+        site_name = f"site-{i}"
+        sites.append(
+            {
+                "name": site_name,
+                "location": {
+                    "latitude": 37.4847 + (i // side) * 0.0018,
+                    "longitude": -122.1477 + (i % side) * 0.0023,
+                    "altitude": rng.uniform(10, 50),
+                    "accuracy": 1.0,
+                },
+            }
+        )
+
+        is_dn = i < num_dn_sites
+        site_nodes.append([])
+        for j in range(nodes_per_dn_site if is_dn else 1):
+            mac = _mac(len(nodes) + 1)
+            site_nodes[-1].append(len(nodes))
+            nodes.append(
+                {
+                    "name": f"{site_name}.{j}",
+                    "node_type": NODE_TYPE_DN if is_dn else NODE_TYPE_CN,
+                    "is_primary": j == 0,
+                    "mac_addr": mac,
+                    "pop_node": i < num_pops,
+                    "status": NODE_STATUS_ONLINE,
+                    "wlan_mac_addrs": [mac],
+                    "site_name": site_name,
+                    "ant_azimuth": 0.0,
+                    "ant_elevation": 0.0,
+                }
+            )
+
+    links: List[Dict[str, Any]] = []
+    linked_sites: Set[Tuple[int, int]] = set()
+    degrees = [0] * len(nodes)
+
+    def pick_node(site: int) -> int:
+        candidates = site_nodes[site]
+        if rng.random() < p2mp_fraction:
+            return max(candidates, key=degrees.__getitem__)
+        return min(candidates, key=degrees.__getitem__)
+
+    def add_link(a_site: int, z_site: int) -> None:
+        linked_sites.add((min(a_site, z_site), max(a_site, z_site)))
+        a_index, z_index = pick_node(a_site), pick_node(z_site)
+        degrees[a_index] += 1
+        degrees[z_index] += 1
+        a_node, z_node = sorted([nodes[a_index], nodes[z_index]], key=_name)
+        links.append(
+            {
+                "name": f"link-{a_node['name']}-{z_node['name']}",
+                "a_node_name": a_node["name"],
+                "z_node_name": z_node["name"],
+                "link_type": LINK_TYPE_WIRELESS,
+                "is_alive": True,
+                "linkup_attempts": 1,
+                "a_node_mac": a_node["mac_addr"],
+                "z_node_mac": z_node["mac_addr"],
+            }
+        )
+
+    # Grow a spanning tree of the DN sites from the first site, then attach the CNs
+    for site in range(1, num_dn_sites):
+        add_link(rng.randrange(site), site)
+    for site in range(num_dn_sites, num_sites):
+        add_link(rng.randrange(num_dn_sites), site)
+
+    while len(links) < num_links:
+        a_site, z_site = rng.sample(range(num_dn_sites), 2)
+        if (min(a_site, z_site), max(a_site, z_site)) not in linked_sites:
+            add_link(a_site, z_site)
+
+    return {"name": name, "nodes": nodes, "links": links, "sites": sites}
+
+
+def _name(node: Dict[str, Any]) -> str:
+    return str(node["name"])
+
+
+def _mac(n: int) -> str:
+    return ":".join(f"{b:02x}" for b in n.to_bytes(6, "big"))
@@ -6,17 +6,34 @@
 # LICENSE file in the root directory of this source tree.
 
 import collections
-import copy
-from typing import Dict
+from copy import deepcopy
+from typing import Any, Dict, Tuple
 
 
-def deep_update(dst: Dict, src: Dict, join_lists: bool = False) -> None:
+_IMMUTABLE_TYPES = (str, int, float, bool, type(None))
+
+
+class _Missing:
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+# The value of a key that is absent on one side of a diff
+MISSING: Any = _Missing()
+
+
+def deep_update(
+    dst: Dict, src: Dict, join_lists: bool = False, copy: bool = True
+) -> None:
     """Perform an in-place deep merge of ``src`` into ``dst``.
 
     Args:
         dst: The destination dictionary.
         src: The source dictionary.
         join_lists: Flag to join lists instead of overwriting them.
+        copy: Flag to copy the containers of ``src`` that are put in ``dst``. Pass
+            ``False`` if ``src`` is discarded afterwards (e.g. freshly decoded JSON),
+            to share its values instead.
 
     Example:
         >>> src = {'foo': {'bar': 'baz'}}
@@ -33,10 +50,72 @@ def deep_update(dst: Dict, src: Dict, join_lists: bool = False) -> None:
     for k, v in src.items():
         if k in dst:
             if isinstance(v, dict) and isinstance(dst[k], collections.abc.Mapping):
-                deep_update(dst[k], v, join_lists)
-            elif join_lists and isinstance(v, list) and isinstance(dst[k], list):
+                deep_update(dst[k], v, join_lists, copy)
+                continue
+            if join_lists and isinstance(v, list) and isinstance(dst[k], list):
                 dst[k] = dst[k] + v
-            else:
-                dst[k] = copy.deepcopy(v)
-        else:
-            dst[k] = copy.deepcopy(v)
+                continue
+
+        # Scalars are immutable, so they never need to be copied
+        if copy and not isinstance(v, _IMMUTABLE_TYPES):
+            v = deepcopy(v)
+        dst[k] = v
+
+
+def deep_diff(old: Dict, new: Dict) -> Dict[Tuple[str, ...], Tuple[Any, Any]]:
+    """Return the values that differ between two nested dictionaries.
+
+    Nested dictionaries are compared key by key, all other values (including lists)
+    are compared as a whole. Values of different types differ even if they compare
+    equal, e.g. ``1`` and ``true``.
+
+    Args:
+        old: The old dictionary.
+        new: The new dictionary.
+
+    Returns:
+        A dictionary of key paths to the ``(old, new)`` values at that path. Added
+        and removed keys have a :data:`MISSING` old and new value, respectively.
+
+    Example:
+        >>> old = {"foo": {"bar": 1, "baz": [2]}, "qux": 3}
+        >>> new = {"foo": {"bar": 1, "baz": [2, 3]}, "quux": 4}
+        >>> deep_diff(old, new)
+        {('foo', 'baz'): ([2], [2, 3]), ('qux',): (3, MISSING), ('quux',): (MISSING, 4)}
+    """
+    changes: Dict[Tuple[str, ...], Tuple[Any, Any]] = {}
+    _diff(old, new, (), changes)
+    return changes
+
+
+def _diff(
+    old: Dict,
+    new: Dict,
+    path: Tuple[str, ...],
+    changes: Dict[Tuple[str, ...], Tuple[Any, Any]],
+) -> None:
+    for k, old_value in old.items():
+        new_value = new.get(k, MISSING)
+        if old_value is new_value:
+            continue
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            _diff(old_value, new_value, path + (k,), changes)
+        elif not _equal(old_value, new_value):
+            changes[path + (k,)] = (old_value, new_value)
+
+    for k, new_value in new.items():
+        if k not in old:
+            changes[path + (k,)] = (MISSING, new_value)
+
+
+def _equal(old: Any, new: Any) -> bool:
+    """Compare two values by type too, since e.g. ``1 == True`` in Python."""
+    if type(old) is not type(new):
+        return False
+    if isinstance(old, (list, tuple)):
+        return len(old) == len(new) and all(map(_equal, old, new))
+    if isinstance(old, dict):
+        return old.keys() == new.keys() and all(
+            _equal(v, new[k]) for k, v in old.items()
+        )
+    return bool(old == new)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import contextlib
+import time
+import weakref
+from collections import defaultdict
+from typing import Any, AsyncIterator, DefaultDict, Dict, List, Tuple
+
+from .registry import Family, merge_families
+
+
+# All live limiters, for exporting their gauges on the /metrics route
+_limiters: "weakref.WeakSet[ConcurrencyLimiter]" = weakref.WeakSet()
+
+
+class ConcurrencyLimiter:
+    """Bound the number of concurrent operations per key (e.g. per host).
+
+    Every key gets its own :class:`asyncio.Semaphore` on first use. The limiter
+    also tracks the number of in-flight and queued operations as well as the time
+    spent waiting for a free slot, per key.
+
+    Args:
+        name: The name of the limited backend, used as the metric name prefix.
+        label: The label name of the keys (e.g. ``host``, ``network``).
+        limit: The maximum number of concurrent operations per key.
+
+    Raises:
+        ValueError: The value for ``limit`` is not a positive integer.
+
+    Example:
+        >>> limiter = ConcurrencyLimiter("api_service", "network", 10)
+        >>> async with limiter.acquire("network A"):
+        ...     await do_request()
+    """
+
+    def __init__(self, name: str, label: str, limit: int) -> None:
+        if not isinstance(limit, int) or limit < 1:
+            raise ValueError(f"Concurrency limit must be a positive integer: {limit}")
+
+        self.name = name
+        self.label = label
+        self.limit = limit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: DefaultDict[str, int] = defaultdict(int)
+        self._queued: DefaultDict[str, int] = defaultdict(int)
+        self._wait_sum: DefaultDict[str, float] = defaultdict(float)
+        self._wait_count: DefaultDict[str, int] = defaultdict(int)
+        _limiters.add(self)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, key: str) -> AsyncIterator[None]:
+        """Wait for a free slot for ``key`` and hold it for the duration of the block.
+
+        Args:
+            key: The key to limit on.
+        """
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = self._semaphores[key] = asyncio.Semaphore(self.limit)
+
+        self._queued[key] += 1
+        start = time.monotonic()
+        try:
+            await semaphore.acquire()
+        finally:
+            self._queued[key] -= 1
+
+        self._wait_sum[key] += time.monotonic() - start
+        self._wait_count[key] += 1
+        self._in_flight[key] += 1
+        try:
+            yield
+        finally:
+            self._in_flight[key] -= 1
+            semaphore.release()
+
+    def collect(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Return the current gauges and queue wait totals of every key.
+
+        Returns:
+            A list of (metric name, labels, value) tuples.
+        """
+        return [
+            sample for _, _, samples in self.collect_families() for sample in samples
+        ]
+
+    def collect_families(self) -> List[Family]:
+        """Return the current gauges and queue wait totals, grouped by metric family.
+
+        Returns:
+            A list of (family name, OpenMetrics type, samples) tuples.
+        """
+        prefix = f"tglib_{self.name}"
+        in_flight: List[Tuple[str, Dict[str, Any], float]] = []
+        queued: List[Tuple[str, Dict[str, Any], float]] = []
+        queue_wait: List[Tuple[str, Dict[str, Any], float]] = []
+        for key in self._semaphores:
+            labels = {self.label: key}
+            in_flight.append((f"{prefix}_in_flight", labels, self._in_flight[key]))
+            queued.append((f"{prefix}_queued", labels, self._queued[key]))
+            queue_wait += [
+                (f"{prefix}_queue_wait_seconds_sum", labels, self._wait_sum[key]),
+                (f"{prefix}_queue_wait_seconds_count", labels, self._wait_count[key]),
+            ]
+
+        return [
+            (f"{prefix}_in_flight", "gauge", in_flight),
+            (f"{prefix}_queued", "gauge", queued),
+            (f"{prefix}_queue_wait_seconds", "summary", queue_wait),
+        ]
+
+
+def collect_all() -> List[Tuple[str, Dict[str, str], float]]:
+    """Return the samples of all of the live :class:`ConcurrencyLimiter` objects.
+
+    Returns:
+        A list of (metric name, labels, value) tuples.
+    """
+    return [sample for limiter in list(_limiters) for sample in limiter.collect()]
+
+
+def collect_families() -> List[Family]:
+    """Return the samples of all of the live limiters, grouped by metric family.
+
+    Returns:
+        A list of (family name, OpenMetrics type, samples) tuples.
+    """
+    return merge_families(
+        family for limiter in list(_limiters) for family in limiter.collect_families()
+    )
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..exceptions import ConfigError
+from .metrics import Counter, Gauge, Histogram
+
+
+# The quantiles of the recent lag samples to export
+QUANTILES = (0.5, 0.9, 0.99, 1.0)
+
+_lag = Histogram(
+    "tglib_event_loop_lag_seconds",
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+_recent_lag = Gauge("tglib_event_loop_recent_lag_seconds")
+_tasks = Gauge("tglib_event_loop_tasks")
+_stalls = Counter("tglib_event_loop_stalls_total")
+_slowest = Gauge("tglib_event_loop_slowest_callback_seconds")
+
+_monitor: Optional["LoopMonitor"] = None
+
+
+class LoopMonitor:
+    """Sample the event loop lag and capture the code paths that block the loop.
+
+    A timer is scheduled on the loop every ``interval_s`` seconds and the lag is the
+    delay between when it was due and when it ran. Every sample is recorded in a
+    histogram, and the quantiles of the samples of the last ``window_s`` seconds and
+    the number of running tasks are exported as gauges.
+
+    If ``slow_callback_duration_s`` is set, a watchdog thread captures the stack of
+    the loop thread whenever the timer is overdue by that long, i.e. whenever a
+    single callback blocks the loop. The stack is logged, and the longest stalls are
+    exported per blocking code location, keeping the ``max_slow_callbacks`` slowest.
+    The value is also applied to ``loop.slow_callback_duration`` for the built-in
+    asyncio debug mode reports.
+
+    Args:
+        loop: The event loop to monitor.
+        interval_s: The time between lag samples, in seconds.
+        window_s: The time span of the exported lag quantiles, in seconds.
+        slow_callback_duration_s: The loop stall duration to capture stacks after.
+        max_slow_callbacks: The number of slowest code locations to export.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        interval_s: float = 0.5,
+        window_s: float = 60,
+        slow_callback_duration_s: Optional[float] = None,
+        max_slow_callbacks: int = 10,
+    ) -> None:
+        self.loop = loop
+        self.interval_s = interval_s
+        self.slow_callback_duration_s = slow_callback_duration_s
+        self.max_slow_callbacks = max_slow_callbacks
+        # The slowest stall duration per blocking code location
+        self.slowest: Dict[str, float] = {}
+        self._window: Deque[float] = collections.deque(
+            maxlen=max(int(window_s / interval_s), 1)
+        )
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._due = 0.0
+        self._loop_thread_id = 0
+        # The location, stack and timer due time of the current stall, set by the
+        # watchdog thread
+        self._stall: Optional[Tuple[str, List[str], float]] = None
+        self._stopped = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling, and start the watchdog thread if it is enabled."""
+        self._loop_thread_id = threading.get_ident()
+        self._schedule()
+
+        if self.slow_callback_duration_s is not None:
+            self.loop.slow_callback_duration = self.slow_callback_duration_s
+            self._watchdog = threading.Thread(
+                target=self._watch, name="tglib-loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    def stop(self) -> None:
+        """Stop sampling and the watchdog thread."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        self._stopped.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    def _schedule(self) -> None:
+        self._due = time.monotonic() + self.interval_s
+        self._handle = self.loop.call_later(self.interval_s, self._sample)
+
+    def _sample(self) -> None:
+        """Record the lag of the timer, and the duration of any captured stall."""
+        lag = max(time.monotonic() - self._due, 0)
+        _lag.observe(lag)
+        self._window.append(lag)
+        for quantile, value in zip(QUANTILES, np.quantile(self._window, QUANTILES)):
+            _recent_lag.set(float(value), {"quantile": str(quantile)})
+        _tasks.set(len(asyncio.all_tasks(self.loop)))
+
+        # Drop a stall captured for an earlier timer, which has already run
+        stall, self._stall = self._stall, None
+        if stall is not None and stall[2] == self._due:
+            location, stack, _ = stall
+            _stalls.inc()
+            logging.warning(
+                f"The event loop was blocked for {lag:.3f}s at {location}:\n"
+                + "".join(stack)
+            )
+            self._record_slowest(location, lag)
+
+        self._schedule()
+
+    def _record_slowest(self, location: str, duration_s: float) -> None:
+        """Keep the ``max_slow_callbacks`` longest stall durations by location."""
+        if duration_s <= self.slowest.get(location, 0):
+            return
+
+        self.slowest[location] = duration_s
+        _slowest.set(duration_s, {"location": location})
+        if len(self.slowest) > self.max_slow_callbacks:
+            fastest = min(self.slowest, key=self.slowest.__getitem__)
+            del self.slowest[fastest]
+            _slowest.remove({"location": fastest})
+
+    def _watch(self) -> None:
+        """Capture the loop thread's stack once per stall, from another thread."""
+        threshold_s = self.slow_callback_duration_s or 0
+        captured_due = None
+        while not self._stopped.wait(threshold_s / 2):
+            due = self._due
+            if due == captured_due or time.monotonic() - due < threshold_s:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+
+            stack = traceback.extract_stack(frame)
+            top = stack[-1]
+            location = f"{top.filename}:{top.lineno} {top.name}"
+            self._stall = (location, traceback.format_list(stack), due)
+            captured_due = due
+
+
+async def start(config: Dict[str, Any]) -> None:
+    """Start monitoring the running event loop.
+
+    The optional ``loop_monitor`` configuration section accepts ``interval_s``
+    (defaults to 0.5), ``window_s`` (defaults to 60), ``slow_callback_duration_s``
+    (disabled by default) and ``max_slow_callbacks`` (defaults to 10). Setting
+    ``enabled`` to ``false`` turns the monitor off.
+
+    Args:
+        config: The service configuration.
+
+    Raises:
+        ConfigError: The ``loop_monitor`` configuration section is invalid.
+    """
+    global _monitor
+
+    params = dict(config.get("loop_monitor", {}))
+    if not params.pop("enabled", True):
+        return
+
+    for key in ["interval_s", "window_s", "slow_callback_duration_s"]:
+        value = params.get(key)
+        if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+            raise ConfigError(f"Value for '{key}' is not a positive number")
+
+    max_slow_callbacks = params.get("max_slow_callbacks", 10)
+    if not isinstance(max_slow_callbacks, int) or max_slow_callbacks < 1:
+        raise ConfigError("Value for 'max_slow_callbacks' is not a positive integer")
+
+    try:
+        _monitor = LoopMonitor(asyncio.get_running_loop(), **params)
+    except TypeError as e:
+        raise ConfigError("Invalid 'loop_monitor' params") from e
+
+    _monitor.start()
+
+
+async def stop() -> None:
+    """Stop monitoring the event loop."""
+    global _monitor
+
+    if _monitor is not None:
+        _monitor.stop()
+        _monitor = None
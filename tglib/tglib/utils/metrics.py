@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import bisect
+import contextlib
+import time
+import weakref
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+from .registry import Family, format_value, merge_families
+
+
+# All live collectors, for exporting their samples on the /metrics route
+_collectors: "weakref.WeakSet[Union[Counter, Gauge, Histogram]]" = weakref.WeakSet()
+
+# The default histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+    600,
+)
+
+
+class Counter:
+    """Count events per label set, exported as a monotonically increasing counter.
+
+    Args:
+        name: The metric name, conventionally ending in ``_total``.
+
+    Example:
+        >>> errors = Counter("tglib_foo_errors_total")
+        >>> errors.inc({"host": "a"})
+        >>> errors.collect()
+        [('tglib_foo_errors_total', {'host': 'a'}, 1)]
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.family = name[: -len("_total")] if name.endswith("_total") else name
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        _collectors.add(self)
+
+    def inc(self, labels: Dict[str, str] = {}, value: float = 1) -> None:
+        """Increment the counter of a label set.
+
+        Args:
+            labels: The labels and values in Python dictionary form.
+            value: The amount to increment by.
+        """
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + value
+
+    def collect(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Return the current value of every label set.
+
+        Returns:
+            A list of (metric name, labels, value) tuples.
+        """
+        return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Gauge:
+    """Track the current value per label set, exported as a gauge.
+
+    Args:
+        name: The metric name.
+
+    Example:
+        >>> in_flight = Gauge("tglib_foo_in_flight")
+        >>> in_flight.set(3, {"host": "a"})
+        >>> in_flight.collect()
+        [('tglib_foo_in_flight', {'host': 'a'}, 3)]
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.family = name
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        _collectors.add(self)
+
+    def set(self, value: float, labels: Dict[str, str] = {}) -> None:
+        """Set the value of a label set.
+
+        Args:
+            value: The current value.
+            labels: The labels and values in Python dictionary form.
+        """
+        self._values[tuple(sorted(labels.items()))] = value
+
+    def remove(self, labels: Dict[str, str] = {}) -> None:
+        """Stop exporting a label set.
+
+        Args:
+            labels: The labels and values in Python dictionary form.
+        """
+        self._values.pop(tuple(sorted(labels.items())), None)
+
+    def collect(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Return the current value of every label set.
+
+        Returns:
+            A list of (metric name, labels, value) tuples.
+        """
+        return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Count observations per label set into preaggregated buckets.
+
+    Observing a value costs a binary search and two additions. The cumulative
+    ``_bucket``, ``_sum`` and ``_count`` series are only computed on collection.
+
+    Args:
+        name: The metric name, without the ``_bucket``, ``_sum`` or ``_count`` suffix.
+        buckets: The bucket upper bounds. A ``+Inf`` bucket is always added.
+
+    Example:
+        >>> latency = Histogram("tglib_foo_latency_seconds")
+        >>> with latency.time({"host": "a"}):
+        ...     do_work()
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.family = name
+        self.buckets = sorted(buckets)
+        self._labels = [format_value(float(bound)) for bound in self.buckets] + ["+Inf"]
+        self._counts: Dict[Tuple[Tuple[str, str], ...], List[int]] = {}
+        self._sums: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        _collectors.add(self)
+
+    def observe(self, value: float, labels: Dict[str, str] = {}) -> None:
+        """Record a single observation for a label set.
+
+        Args:
+            value: The observed value.
+            labels: The labels and values in Python dictionary form.
+        """
+        key = tuple(sorted(labels.items()))
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * len(self._labels)
+            self._sums[key] = 0
+
+        # Bucket upper bounds are inclusive
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextlib.contextmanager
+    def time(self, labels: Dict[str, str] = {}) -> Iterator[None]:
+        """Observe the duration of the block, in seconds.
+
+        Args:
+            labels: The labels and values in Python dictionary form.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, labels)
+
+    def collect(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Return the cumulative buckets, sum, and count of every label set.
+
+        Returns:
+            A list of (metric name, labels, value) tuples.
+        """
+        samples: List[Tuple[str, Dict[str, str], float]] = []
+        for key, counts in self._counts.items():
+            labels = dict(key)
+            cumulative = 0
+            for le, count in zip(self._labels, counts):
+                cumulative += count
+                samples.append(
+                    (f"{self.name}_bucket", {**labels, "le": le}, cumulative)
+                )
+
+            samples += [
+                (f"{self.name}_sum", labels, self._sums[key]),
+                (f"{self.name}_count", labels, cumulative),
+            ]
+
+        return samples
+
+
+def collect_all() -> List[Tuple[str, Dict[str, str], float]]:
+    """Return the samples of all of the live :class:`Counter`, :class:`Gauge` and
+    :class:`Histogram` objects.
+
+    Returns:
+        A list of (metric name, labels, value) tuples.
+    """
+    return [sample for collector in list(_collectors) for sample in collector.collect()]
+
+
+def collect_families() -> List[Family]:
+    """Return the samples of all of the live collectors, grouped by metric family.
+
+    Returns:
+        A list of (family name, OpenMetrics type, samples) tuples.
+    """
+    return merge_families(
+        (collector.family, collector.type, collector.collect())
+        for collector in list(_collectors)
+    )
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import concurrent.futures
+import functools
+import importlib
+import logging
+import multiprocessing
+import os
+import pickle
+from multiprocessing import resource_tracker  # type: ignore
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from ..exceptions import ConfigError
+from .metrics import Histogram
+
+
+# Buffers of at least this many bytes are passed through shared memory
+SHM_THRESHOLD_BYTES = 1 << 20
+
+# Keep the default pool small, the CPU count of the host is not the container's
+DEFAULT_MAX_WORKERS = min(os.cpu_count() or 1, 4)
+
+_durations = Histogram("tglib_process_pool_task_duration_seconds")
+_executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_futures: Set[concurrent.futures.Future] = set()
+
+# A serialized object, as (pickle payload, [(shared memory name, size)])
+Serialized = Tuple[bytes, List[Tuple[str, int]]]
+
+
+async def start(config: Dict[str, Any]) -> None:
+    """Start and warm up the process pool if the configuration has one.
+
+    The optional ``process_pool`` configuration section accepts ``max_workers``
+    (defaults to :data:`DEFAULT_MAX_WORKERS`), ``start_method`` (defaults to ``forkserver``)
+    and ``preload``, a list of modules to import in every worker. All of the workers
+    are spawned and have imported the ``preload`` modules before this returns.
+
+    Args:
+        config: The service configuration.
+
+    Raises:
+        ConfigError: The ``process_pool`` configuration section is invalid.
+    """
+    global _executor
+
+    params = config.get("process_pool")
+    if params is None:
+        return
+
+    max_workers = params.get("max_workers", DEFAULT_MAX_WORKERS)
+    if not isinstance(max_workers, int) or max_workers < 1:
+        raise ConfigError(f"'max_workers' must be a positive integer: {max_workers}")
+
+    try:
+        context = multiprocessing.get_context(params.get("start_method", "forkserver"))
+    except ValueError as e:
+        raise ConfigError("Invalid process pool 'start_method'") from e
+
+    preload = params.get("preload", [])
+    _executor = _create_executor(max_workers, context, preload)
+
+    # Run one task per worker to make sure all of them are ready
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *[loop.run_in_executor(_executor, os.getpid) for _ in range(max_workers)]
+    )
+    logging.info(f"Started the process pool with {max_workers} worker(s)")
+
+
+async def stop() -> None:
+    """Shut down the process pool, waiting for the running tasks to finish.
+
+    Tasks that have not been handed to a worker yet are cancelled.
+    """
+    global _executor
+
+    if _executor is None:
+        return
+
+    executor, _executor = _executor, None
+    for future in list(_futures):
+        future.cancel()
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, functools.partial(executor.shutdown, wait=True))
+
+
+async def run_cpu_bound(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run a CPU-bound function in the process pool without blocking the event loop.
+
+    The function, arguments and result are pickled with protocol 5. Contiguous
+    buffers (e.g. :mod:`numpy` arrays) of at least :data:`SHM_THRESHOLD_BYTES` bytes
+    are passed out-of-band through shared memory instead of through the pool's pipes.
+
+    Args:
+        fn: A module-level function, so that it can be pickled by reference.
+        *args: The positional arguments to pass to ``fn``.
+        **kwargs: The keyword arguments to pass to ``fn``.
+
+    Returns:
+        The return value of ``fn``.
+
+    Example:
+        >>> connectivity = await run_cpu_bound(analyze_connectivity, im_data, 30)
+
+    Note:
+        If the ``process_pool`` configuration section is missing, a default pool is
+        created on first use. Cancelling the call cancels the task if it has not
+        started yet, a running task cannot be interrupted.
+    """
+    executor = _get_executor()
+    payload, segments = _dumps((fn, args, kwargs))
+    future = executor.submit(_call, payload, _names(segments))
+    _futures.add(future)
+    future.add_done_callback(_futures.discard)
+
+    try:
+        with _durations.time({"function": fn.__qualname__}):
+            result_payload, result_segments = await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(_discard_result)
+        raise
+    finally:
+        for shm, _ in segments:
+            shm.close()
+            shm.unlink()
+
+    return _loads(result_payload, result_segments)
+
+
+def _get_executor() -> concurrent.futures.ProcessPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        logging.warning("Creating a default process pool on first use")
+        context = multiprocessing.get_context("forkserver")
+        _executor = _create_executor(DEFAULT_MAX_WORKERS, context, [])
+
+    return _executor
+
+
+def _create_executor(
+    max_workers: int, context: Any, preload: List[str]
+) -> concurrent.futures.ProcessPoolExecutor:
+    # Share the parent's tracker so that segments outlive the worker creating them
+    resource_tracker.ensure_running()
+
+    # Log from the workers like from the parent
+    root = logging.getLogger()
+    log_config: Dict[str, Any] = {"level": root.level}
+    if root.handlers and root.handlers[0].formatter is not None:
+        formatter = root.handlers[0].formatter
+        log_config.update(format=formatter._fmt, datefmt=formatter.datefmt)
+
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers,
+        mp_context=context,
+        initializer=_initialize,
+        initargs=(preload, log_config),
+    )
+
+
+def _initialize(modules: List[str], log_config: Dict[str, Any]) -> None:
+    """Configure logging and import the ``modules`` in a new worker."""
+    logging.basicConfig(**log_config)
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _call(payload: bytes, segments: List[Tuple[str, int]]) -> Serialized:
+    """Run the serialized function call in a worker and serialize its result."""
+    shms = [SharedMemory(name) for name, _ in segments]
+    try:
+        return _call_with_buffers(payload, shms, segments)
+    finally:
+        for shm in shms:
+            try:
+                shm.close()
+            except BufferError:
+                # The arguments are still referenced (e.g. by a traceback)
+                pass
+
+
+def _call_with_buffers(
+    payload: bytes, shms: List[SharedMemory], segments: List[Tuple[str, int]]
+) -> Serialized:
+    buffers = [shm.buf[:size] for shm, (_, size) in zip(shms, segments)]
+    fn, args, kwargs = pickle.loads(payload, buffers=buffers)
+    result, result_segments = _dumps(fn(*args, **kwargs))
+    for shm, _ in result_segments:
+        shm.close()
+
+    return result, _names(result_segments)
+
+
+def _dumps(obj: Any) -> Tuple[bytes, List[Tuple[SharedMemory, int]]]:
+    """Pickle ``obj``, copying its large buffers into new shared memory segments."""
+    segments: List[Tuple[SharedMemory, int]] = []
+
+    def buffer_callback(buffer: pickle.PickleBuffer) -> bool:
+        raw = buffer.raw()
+        size = raw.nbytes
+        if size < SHM_THRESHOLD_BYTES:
+            return True
+
+        shm = SharedMemory(create=True, size=size)
+        shm.buf[:size] = raw
+        segments.append((shm, size))
+        return False
+
+    try:
+        return pickle.dumps(obj, protocol=5, buffer_callback=buffer_callback), segments
+    except BaseException:
+        for shm, _ in segments:
+            shm.close()
+            shm.unlink()
+        raise
+
+
+def _loads(payload: bytes, segments: List[Tuple[str, int]]) -> Any:
+    """Unpickle ``payload``, copying its buffers out of the shared memory segments."""
+    buffers = []
+    for name, size in segments:
+        shm = SharedMemory(name)
+        buffers.append(bytearray(shm.buf[:size]))
+        shm.close()
+        shm.unlink()
+
+    return pickle.loads(payload, buffers=buffers)
+
+
+def _names(segments: List[Tuple[SharedMemory, int]]) -> List[Tuple[str, int]]:
+    return [(shm.name, size) for shm, size in segments]
+
+
+def _discard_result(future: concurrent.futures.Future) -> None:
+    """Free the shared memory of a result that nobody is waiting for anymore."""
+    if future.cancelled() or future.exception() is not None:
+        return
+
+    _, segments = future.result()
+    for name, _ in segments:
+        shm = SharedMemory(name)
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import collections
+import cProfile
+import sys
+import threading
+import time
+import tracemalloc
+from types import FrameType
+from typing import Any, Dict, List, Optional
+
+
+async def sample_stacks(seconds: float, interval_s: float = 0.005) -> Dict[str, int]:
+    """Sample the stack of the event loop thread for a number of seconds.
+
+    The samples are taken from a separate thread, so the event loop keeps running
+    and the overhead is a stack walk every ``interval_s`` seconds.
+
+    Args:
+        seconds: The sampling duration.
+        interval_s: The time between samples, in seconds.
+
+    Returns:
+        The number of samples per stack, in the collapsed stack format of flame graph
+        tools (``root;...;leaf``).
+
+    Example:
+        >>> stacks = await sample_stacks(10)
+        >>> print(format_collapsed(stacks))
+    """
+    loop = asyncio.get_running_loop()
+    thread_id = threading.get_ident()
+    return await loop.run_in_executor(
+        None, _sample_thread, thread_id, seconds, interval_s
+    )
+
+
+def _sample_thread(thread_id: int, seconds: float, interval_s: float) -> Dict[str, int]:
+    stacks: Dict[str, int] = collections.Counter()
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            stacks[_collapse(frame)] += 1
+
+        # Drop the frame reference before sleeping
+        frame = None
+        time.sleep(interval_s)
+
+    return dict(stacks)
+
+
+def _collapse(frame: Optional[FrameType]) -> str:
+    names: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+        frame = frame.f_back
+
+    return ";".join(reversed(names))
+
+
+def format_collapsed(stacks: Dict[str, int]) -> str:
+    """Render sampled stacks in the collapsed stack format, most frequent first.
+
+    Args:
+        stacks: The number of samples per stack, from :func:`sample_stacks`.
+
+    Returns:
+        One ``stack count`` line per stack, e.g. for ``flamegraph.pl``.
+    """
+    ranked = sorted(stacks.items(), key=lambda item: item[1], reverse=True)
+    return "".join(f"{stack} {count}\n" for stack, count in ranked)
+
+
+async def profile(seconds: float) -> cProfile.Profile:
+    """Run :mod:`cProfile` on the event loop thread for a number of seconds.
+
+    Unlike :func:`sample_stacks`, every function call is recorded, which is exact
+    but slows the service down while profiling.
+
+    Args:
+        seconds: The profiling duration.
+
+    Returns:
+        The profiler, for rendering with :mod:`pstats` or dumping to a file.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+
+    return profiler
+
+
+async def trace_memory(
+    seconds: float, limit: int = 25, key_type: str = "lineno", frames: int = 1
+) -> List[Dict[str, Any]]:
+    """Compare two :mod:`tracemalloc` snapshots taken a number of seconds apart.
+
+    Memory allocations are traced during the interval only, unless tracing was
+    already started (e.g. with ``PYTHONTRACEMALLOC``).
+
+    Args:
+        seconds: The time between the snapshots.
+        limit: The number of allocation sites with the largest growth to return.
+        key_type: How to group allocations: ``filename``, ``lineno`` or
+            ``traceback``.
+        frames: The number of frames to record per allocation, if tracing is started.
+
+    Returns:
+        The allocation sites with the largest growth in size.
+
+    Raises:
+        ValueError: The value for ``key_type`` is invalid.
+    """
+    if key_type not in ("filename", "lineno", "traceback"):
+        raise ValueError(f"Invalid key_type: {key_type}")
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    # Hide the allocations of tracemalloc itself
+    exclude = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(exclude).compare_to(
+        before.filter_traces(exclude), key_type
+    )
+    return [
+        {
+            "traceback": stat.traceback.format(),
+            "size": stat.size,
+            "size_diff": stat.size_diff,
+            "count": stat.count,
+            "count_diff": stat.count_diff,
+        }
+        for stat in diff[:limit]
+    ]
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import math
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+
+# A metric family, as (name, OpenMetrics type, [(sample name, labels, value)])
+Family = Tuple[str, str, List[Tuple[str, Dict[str, Any], float]]]
+
+
+def format_value(value: float) -> str:
+    """Format a sample value for the Prometheus exposition formats.
+
+    Args:
+        value: The sample value.
+
+    Returns:
+        The value as a string, using the ``NaN``, ``+Inf``, and ``-Inf`` spellings.
+
+    Example:
+        >>> format_value(3.0)
+        '3'
+        >>> format_value(float("inf"))
+        '+Inf'
+    """
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def merge_families(families: Iterable[Family]) -> List[Family]:
+    """Merge the samples of the families sharing a name.
+
+    Args:
+        families: The metric families, possibly exported by several collectors.
+
+    Returns:
+        One family per name, in order of first appearance.
+    """
+    merged: Dict[str, Family] = {}
+    for name, metric_type, samples in families:
+        if name in merged:
+            merged[name][2].extend(samples)
+        else:
+            merged[name] = (name, metric_type, list(samples))
+
+    return list(merged.values())
+
+
+class SeriesRegistry:
+    """Store the latest sample of every series written between scrapes.
+
+    Each distinct series is interned once: its exposition prefix (the metric name and
+    label set) is rendered on first write and assigned a slot. Values and timestamps
+    are kept in preallocated :mod:`numpy` arrays indexed by slot, so repeated writes
+    of the same series only update two array cells. Series that have not been
+    written for ``max_idle_polls`` consecutive scrapes are evicted.
+
+    In OpenMetrics form, the samples are grouped by metric name and every group is
+    preceded by a ``# TYPE <name> unknown`` line, since the metric types are not
+    known.
+
+    Args:
+        format_series: The function to render a metric name and labels with.
+        capacity: The number of slots to preallocate.
+        max_idle_polls: The number of scrapes after which an idle series is evicted.
+
+    Example:
+        >>> registry = SeriesRegistry(PrometheusClient.format_query)
+        >>> registry.set("foo", {"bar": "baz"}, 1, None)
+        >>> registry.drain()
+        ['foo{bar="baz"} 1']
+    """
+
+    def __init__(
+        self,
+        format_series: Callable[[str, Dict[str, Any]], str],
+        capacity: int = 1024,
+        max_idle_polls: int = 10,
+    ) -> None:
+        self.format_series = format_series
+        self.capacity = capacity
+        self.max_idle_polls = max_idle_polls
+        self.clear()
+
+    def __len__(self) -> int:
+        """Return the number of series written since the last scrape."""
+        return int(np.count_nonzero(self._written[: len(self._series)]))
+
+    def set(
+        self,
+        name: str,
+        labels: Dict[str, Any],
+        value: Union[int, float],
+        time: Optional[int],
+    ) -> None:
+        """Record the latest sample of a series, overwriting any previous value.
+
+        Args:
+            name: The metric name.
+            labels: The labels and values in Python dictionary form.
+            value: The sample value.
+            time: The sample timestamp in milliseconds, if any.
+        """
+        key: Hashable
+        try:
+            key = (name, tuple(labels.items()))
+            slot = self._slots.get(key)
+        except TypeError:
+            # Unhashable label values are keyed by their rendered form instead
+            key = self.format_series(name, labels)
+            slot = self._slots.get(key)
+
+        if slot is None:
+            slot = self._intern(key, self.format_series(name, labels), name)
+
+        self._values[slot] = value
+        self._times[slot] = time or -1
+        self._written[slot] = True
+        self._last_poll[slot] = self._polls
+
+    def drain(self, openmetrics: bool = False) -> List[str]:
+        """Render and clear all of the series written since the last scrape.
+
+        Args:
+            openmetrics: Flag to render in OpenMetrics form.
+
+        Returns:
+            The samples in exposition text form, one per series.
+        """
+        return list(self.drain_lazily(openmetrics))
+
+    def drain_lazily(
+        self, openmetrics: bool = False, chunk_size: int = 1024
+    ) -> Iterator[str]:
+        """Clear all of the series written since the last scrape and render them lazily.
+
+        The samples are snapshotted when called, so writes made while the iterator is
+        consumed belong to the next scrape. Only ``chunk_size`` samples at a time are
+        converted from the slot arrays and rendered.
+
+        Args:
+            openmetrics: Flag to render in OpenMetrics form.
+            chunk_size: The number of samples to render at a time.
+
+        Returns:
+            An iterator of the samples in exposition text form, one per series.
+        """
+        size = len(self._series)
+        slots = np.flatnonzero(self._written[:size])
+        values = self._values[slots]
+        times = self._times[slots]
+        families = None
+        if openmetrics:
+            # The samples of a metric family must be contiguous
+            order = np.argsort(self._families[slots], kind="stable")
+            slots, values, times = slots[order], values[order], times[order]
+            families = self._families[slots]
+
+        # Compaction replaces the series list, so the snapshot stays consistent
+        series = self._series
+        self._written[:size] = False
+        self._polls += 1
+
+        idle = self._polls - self._last_poll[:size] > self.max_idle_polls
+        if np.count_nonzero(idle) > size // 2:
+            self._compact(~idle)
+
+        return self._render(
+            series, self._family_names, slots, values, times, families, chunk_size
+        )
+
+    @staticmethod
+    def _render(
+        series: List[str],
+        family_names: List[str],
+        slots: np.ndarray,
+        values: np.ndarray,
+        times: np.ndarray,
+        families: Optional[np.ndarray],
+        chunk_size: int,
+    ) -> Iterator[str]:
+        openmetrics = families is not None
+        if families is None:
+            families = np.zeros(len(slots), dtype=np.int64)
+
+        prev_family = -1
+        for start in range(0, len(slots), chunk_size):
+            end = start + chunk_size
+            for slot, value, time, family in zip(
+                slots[start:end].tolist(),
+                values[start:end].tolist(),
+                times[start:end].tolist(),
+                families[start:end].tolist(),
+            ):
+                if openmetrics and family != prev_family:
+                    yield f"# TYPE {family_names[family]} unknown"
+                    prev_family = family
+
+                line = f"{series[slot]} {format_value(value)}"
+                if time >= 0:
+                    line += f" {time / 1e3:.3f}" if openmetrics else f" {time}"
+                yield line
+
+    def clear(self) -> None:
+        """Discard all of the series."""
+        self._slots: Dict[Hashable, int] = {}
+        self._slots_by_series: Dict[str, int] = {}
+        self._series: List[str] = []
+        self._values = np.zeros(self.capacity, dtype=np.float64)
+        # Timestamps in milliseconds, -1 if the scrape time should be used
+        self._times = np.full(self.capacity, -1, dtype=np.int64)
+        self._written = np.zeros(self.capacity, dtype=bool)
+        self._last_poll = np.zeros(self.capacity, dtype=np.int64)
+        self._polls = 0
+        # The metric name of every slot, as an index into the family names
+        self._families = np.zeros(self.capacity, dtype=np.int64)
+        self._family_ids: Dict[str, int] = {}
+        self._family_names: List[str] = []
+
+    def _intern(self, key: Hashable, series: str, name: str) -> int:
+        """Assign a slot to a new series, reusing it if it renders identically."""
+        slot = self._slots_by_series.get(series)
+        if slot is None:
+            slot = len(self._series)
+            if slot == len(self._values):
+                self._grow(max(2 * slot, 1))
+            self._series.append(series)
+            self._slots_by_series[series] = slot
+
+            family = self._family_ids.get(name)
+            if family is None:
+                family = self._family_ids[name] = len(self._family_names)
+                self._family_names.append(name)
+            self._families[slot] = family
+
+        self._slots[key] = slot
+        return slot
+
+    def _grow(self, capacity: int) -> None:
+        """Resize the slot arrays to ``capacity``."""
+        size = len(self._series)
+
+        def resize(array: np.ndarray, fill: Any) -> np.ndarray:
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:size] = array[:size]
+            return grown
+
+        self._values = resize(self._values, 0)
+        self._times = resize(self._times, -1)
+        self._written = resize(self._written, False)
+        self._last_poll = resize(self._last_poll, 0)
+        self._families = resize(self._families, 0)
+
+    def _compact(self, keep: np.ndarray) -> None:
+        """Evict the series not in ``keep`` and renumber the remaining slots."""
+        kept = np.flatnonzero(keep)
+        renumber = {int(old): new for new, old in enumerate(kept)}
+        self._series = [self._series[slot] for slot in kept]
+        self._slots = {
+            key: renumber[slot] for key, slot in self._slots.items() if slot in renumber
+        }
+        self._slots_by_series = {series: i for i, series in enumerate(self._series)}
+        for name in ["_values", "_times", "_written", "_last_poll", "_families"]:
+            array = getattr(self, name)
+            compacted = np.zeros_like(array)
+            compacted[: len(kept)] = array[kept]
+            setattr(self, name, compacted)
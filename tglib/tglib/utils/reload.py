@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from ..exceptions import RestartRequiredError
+from .dict import deep_diff
+
+
+Changes = Dict[Tuple[str, ...], Tuple[Any, Any]]
+ConfigCallback = Callable[[Dict, Changes], Awaitable[None]]
+
+_listeners: List[Tuple[List[Tuple[str, ...]], ConfigCallback]] = []
+
+
+def on_config_change(callback: ConfigCallback, *keys: str) -> None:
+    """Register a coroutine function to apply service config changes live.
+
+    When the service config is changed through the ``/config`` routes, the service
+    is only restarted if some of the changed keys are not covered by a callback.
+    Otherwise, each callback is invoked with the new service config and the changes
+    under its keys (as returned by :func:`~tglib.utils.dict.deep_diff`), and the
+    service keeps running with its warm state. A callback that cannot apply the
+    changes raises :exc:`~tglib.exceptions.RestartRequiredError` to restart the
+    service instead.
+
+    Args:
+        callback: The coroutine function to call.
+        keys: The dot-separated paths of the keys handled by ``callback``. Changes
+            to nested keys of a path are handled too.
+
+    Raises:
+        ValueError: No keys were given.
+
+    Example:
+        >>> async def update_periods(config: Dict, changes: Changes) -> None:
+        ...     for name, pipeline in config["pipelines"].items():
+        ...         pipelines[name]["period_s"] = pipeline["period_s"]
+        >>> on_config_change(update_periods, "pipelines")
+    """
+    if not keys:
+        raise ValueError("At least one config key is required")
+
+    _listeners.append(([tuple(key.split(".")) for key in keys], callback))
+
+
+async def apply_config_change(old: Dict, new: Dict) -> bool:
+    """Apply the changes between two service configs with the registered callbacks.
+
+    Args:
+        old: The current service config.
+        new: The new service config.
+
+    Returns:
+        True if there were no changes or all of them were applied live, False if
+        the service must restart to apply them.
+    """
+    changes = deep_diff(old, new)
+
+    handled: Dict[int, Changes] = {}
+    for path, change in changes.items():
+        covered = False
+        for i, (prefixes, _) in enumerate(_listeners):
+            if any(path[: len(prefix)] == prefix for prefix in prefixes):
+                handled.setdefault(i, {})[path] = change
+                covered = True
+
+        if not covered:
+            logging.info(f"Config key '{'.'.join(path)}' cannot be applied live")
+            return False
+
+    for i, listener_changes in handled.items():
+        try:
+            await _listeners[i][1](new, listener_changes)
+        except RestartRequiredError as e:
+            logging.info(f"Config change cannot be applied live: {e}")
+            return False
+        except Exception:
+            logging.exception("Failed to apply the config change live")
+            return False
+
+    return True
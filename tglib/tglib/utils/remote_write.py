@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import collections
+import logging
+import struct
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+import aiohttp
+
+
+try:
+    import snappy
+
+    _SNAPPY_ENABLED = True
+except ImportError:
+    _SNAPPY_ENABLED = False
+
+
+# A single sample, as (sorted label pairs, timestamp in milliseconds, value)
+Sample = Tuple[Tuple[Tuple[str, str], ...], int, float]
+
+
+def _varint(n: int) -> bytes:
+    """Encode an integer as a protobuf base 128 varint."""
+    n &= 0xFFFFFFFFFFFFFFFF
+    out = bytearray()
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _length_delimited(field: int, payload: bytes) -> bytes:
+    """Encode a protobuf length-delimited field."""
+    return _varint(field << 3 | 2) + _varint(len(payload)) + payload
+
+
+def encode_write_request(samples: Iterable[Sample]) -> bytes:
+    """Encode samples as an uncompressed remote write ``WriteRequest`` protobuf.
+
+    Samples of the same series are grouped into one ``TimeSeries`` message, in
+    timestamp order.
+
+    Args:
+        samples: The samples to encode.
+
+    Returns:
+        The serialized ``WriteRequest`` message.
+    """
+    series: Dict[Tuple[Tuple[str, str], ...], List[Tuple[int, float]]] = {}
+    for labels, timestamp, value in samples:
+        series.setdefault(labels, []).append((timestamp, value))
+
+    request = bytearray()
+    for labels, points in series.items():
+        timeseries = bytearray()
+        for name, label_value in labels:
+            timeseries += _length_delimited(
+                1,
+                _length_delimited(1, name.encode())
+                + _length_delimited(2, label_value.encode()),
+            )
+        for timestamp, value in sorted(points):
+            # Sample.value is a double (field 1), Sample.timestamp an int64 (field 2)
+            sample = b"\x09" + struct.pack("<d", value) + b"\x10" + _varint(timestamp)
+            timeseries += _length_delimited(2, sample)
+
+        request += _length_delimited(1, bytes(timeseries))
+
+    return bytes(request)
+
+
+class RemoteWriter:
+    """Push samples to a Prometheus remote write endpoint in batches.
+
+    Samples are queued and sent in snappy-compressed batches of at most
+    ``batch_size`` samples, every ``flush_interval_s`` seconds or as soon as a full
+    batch is queued. Batches that fail with a server or connection error are put
+    back at the front of the queue and retried with exponential backoff. The queue
+    holds at most ``max_queue_size`` samples, the oldest ones are dropped first.
+
+    Args:
+        url: The remote write endpoint URL.
+        session: The HTTP client session to send the requests with.
+        batch_size: The maximum number of samples per request.
+        flush_interval_s: The maximum time between requests, in seconds.
+        max_queue_size: The maximum number of queued samples.
+        max_backoff_s: The maximum delay between retries, in seconds.
+        timeout_s: The request timeout, in seconds.
+
+    Raises:
+        RuntimeError: The ``python-snappy`` package is not installed.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session: aiohttp.ClientSession,
+        batch_size: int = 500,
+        flush_interval_s: float = 5,
+        max_queue_size: int = 100000,
+        max_backoff_s: float = 60,
+        timeout_s: float = 10,
+    ) -> None:
+        if not _SNAPPY_ENABLED:
+            raise RuntimeError("Remote write requires the 'python-snappy' package")
+
+        self.url = url
+        self.session = session
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_queue_size = max_queue_size
+        self.max_backoff_s = max_backoff_s
+        self.timeout_s = timeout_s
+        self.stats: Dict[str, int] = {"sent": 0, "failed": 0, "dropped": 0}
+        self._queue: Deque[Sample] = collections.deque()
+        self._full_batch = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(
+        self,
+        name: str,
+        labels: Dict[str, Any],
+        value: Union[int, float],
+        timestamp_ms: int,
+    ) -> None:
+        """Queue a single sample to be sent.
+
+        Args:
+            name: The metric name.
+            labels: The labels and values in Python dictionary form.
+            value: The sample value.
+            timestamp_ms: The sample timestamp, in milliseconds.
+        """
+        label_pairs = [("__name__", name)]
+        for label, label_value in labels.items():
+            if isinstance(label_value, bool):
+                label_value = str(label_value).lower()
+            label_pairs.append((label, str(label_value)))
+
+        self._queue.append((tuple(sorted(label_pairs)), timestamp_ms, float(value)))
+        self._trim()
+        if len(self._queue) >= self.batch_size:
+            self._full_batch.set()
+
+    def start(self) -> None:
+        """Start sending the queued samples in the background."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background sender and make a last attempt to send the queue."""
+        if self._task is not None:
+            try:
+                self._task.cancel()
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+    async def flush(self) -> bool:
+        """Send all of the queued samples.
+
+        Returns:
+            ``True`` if the queue was emptied, ``False`` if a batch must be retried.
+        """
+        while self._queue:
+            size = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(size)]
+            try:
+                sent = await self._send(batch)
+            except asyncio.CancelledError:
+                # Keep the in-flight batch for the next flush
+                self._queue.extendleft(reversed(batch))
+                raise
+
+            if not sent:
+                # Retry the batch first and make room for it by dropping the oldest
+                self._queue.extendleft(reversed(batch))
+                self._trim()
+                return False
+
+        self._full_batch.clear()
+        return True
+
+    def _trim(self) -> None:
+        """Drop the oldest samples in excess of ``max_queue_size``."""
+        while len(self._queue) > self.max_queue_size:
+            self._queue.popleft()
+            self.stats["dropped"] += 1
+
+    async def _run(self) -> None:
+        backoff_s = self.flush_interval_s
+        while True:
+            try:
+                await asyncio.wait_for(self._full_batch.wait(), backoff_s)
+            except asyncio.TimeoutError:
+                pass
+
+            if await self.flush():
+                backoff_s = self.flush_interval_s
+            else:
+                backoff_s = min(backoff_s * 2, self.max_backoff_s)
+                logging.warning(f"Retrying remote write in {backoff_s}s")
+                # Do not wake up early for full batches while backing off
+                self._full_batch.clear()
+
+    async def _send(self, batch: List[Sample]) -> bool:
+        """Send a batch of samples, returning ``False`` if it should be retried."""
+        data = snappy.compress(encode_write_request(batch))
+        headers = {
+            "Content-Encoding": "snappy",
+            "Content-Type": "application/x-protobuf",
+            "X-Prometheus-Remote-Write-Version": "0.1.0",
+        }
+        try:
+            async with self.session.post(
+                self.url, data=data, headers=headers, timeout=self.timeout_s
+            ) as resp:
+                if resp.status < 300:
+                    self.stats["sent"] += len(batch)
+                    return True
+
+                if resp.status < 500 and resp.status != 429:
+                    # The request is malformed and retrying will not help
+                    logging.error(
+                        f"Remote write to {self.url} rejected: "
+                        f"{resp.reason} ({resp.status})"
+                    )
+                    self.stats["failed"] += len(batch)
+                    return True
+
+                logging.error(
+                    f"Remote write to {self.url} failed: {resp.reason} ({resp.status})"
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            logging.exception(f"Remote write to {self.url} failed")
+
+        return False
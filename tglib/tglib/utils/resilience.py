@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import aiohttp
+
+from ..exceptions import CircuitOpenError, ClientRuntimeError, ConfigError
+from .metrics import Counter, Gauge
+
+
+T = TypeVar("T")
+
+
+class RetryBudget:
+    """Bound the retries to a fraction of the requests, plus a minimum rate.
+
+    Every request deposits ``ratio`` tokens and every retry withdraws one. The
+    balance also refills at ``min_per_s`` tokens per second so that a service with
+    little traffic can still retry, and is capped at ``max_balance`` to bound the
+    bursts of retries once a backend fails.
+
+    Args:
+        ratio: The number of retries allowed per request.
+        min_per_s: The number of retries allowed per second regardless of traffic.
+        max_balance: The maximum number of retries to save up.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_per_s: float = 1.0, max_balance: float = 10
+    ) -> None:
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.max_balance = max_balance
+        self._balance = min(min_per_s, max_balance)
+        self._updated = time.monotonic()
+
+    def _refill(self, tokens: float = 0) -> None:
+        now = time.monotonic()
+        refill = (now - self._updated) * self.min_per_s + tokens
+        self._balance = min(self._balance + refill, self.max_balance)
+        self._updated = now
+
+    def deposit(self) -> None:
+        """Record a request."""
+        self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        """Spend a token for a retry.
+
+        Returns:
+            True if the retry is allowed, False if the budget is exhausted.
+        """
+        self._refill()
+        if self._balance < 1:
+            return False
+
+        self._balance -= 1
+        return True
+
+
+class CircuitBreaker:
+    """Fail fast for the keys (e.g. backends) that failed repeatedly.
+
+    A key's circuit opens after ``failure_threshold`` consecutive failures, and all
+    requests are then rejected for ``reset_timeout_s`` seconds. After that, a single
+    probe request is let through: the circuit closes if it succeeds and opens again
+    if it fails.
+
+    Args:
+        name: The name of the guarded backend, used as the metric name prefix.
+        label: The label name of the keys (e.g. ``host``, ``network``).
+        failure_threshold: The number of consecutive failures that opens a circuit.
+        reset_timeout_s: The time to reject requests for, in seconds.
+
+    Example:
+        >>> breaker = CircuitBreaker("api_service", "network", 5, 30)
+        >>> breaker.check("network A")
+        >>> breaker.record_failure("network A")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        label: str,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 30,
+    ) -> None:
+        self.name = name
+        self.label = label
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        # The start time of the probe request of half-open circuits
+        self._probes: Dict[str, float] = {}
+        self._open = Gauge(f"tglib_{name}_circuit_open")
+        self._rejections = Counter(f"tglib_{name}_circuit_rejections_total")
+
+    def is_open(self, key: str) -> bool:
+        """Return whether the circuit of a key is open or half-open."""
+        return key in self._opened_at
+
+    def check(self, key: str) -> None:
+        """Let a request through, or reject it if the circuit of the key is open.
+
+        Args:
+            key: The key of the request.
+
+        Raises:
+            CircuitOpenError: The circuit of the key is open.
+        """
+        opened_at = self._opened_at.get(key)
+        if opened_at is None:
+            return
+
+        now = time.monotonic()
+        probe = self._probes.get(key)
+        # A probe that never completed (e.g. was cancelled) expires
+        if now - opened_at >= self.reset_timeout_s and (
+            probe is None or now - probe >= self.reset_timeout_s
+        ):
+            self._probes[key] = now
+            return
+
+        self._rejections.inc({self.label: key})
+        raise CircuitOpenError(self.name, key)
+
+    def record_success(self, key: str) -> None:
+        """Close the circuit of a key."""
+        self._failures.pop(key, None)
+        self._probes.pop(key, None)
+        if self._opened_at.pop(key, None) is not None:
+            self._open.set(0, {self.label: key})
+
+    def record_failure(self, key: str) -> None:
+        """Count a failure, and open the circuit of the key at the threshold."""
+        failures = self._failures[key] = self._failures.get(key, 0) + 1
+        if self._probes.pop(key, None) is not None or (
+            failures >= self.failure_threshold and key not in self._opened_at
+        ):
+            self._opened_at[key] = time.monotonic()
+            self._open.set(1, {self.label: key})
+
+
+class ResiliencePolicy:
+    """Retry, hedge and circuit-break the requests to a set of backends.
+
+    Only idempotent requests are retried and hedged. A failed request is retried
+    up to ``max_retries`` times after a jittered exponential backoff, as long as the
+    :class:`RetryBudget` allows. If ``hedge_after_s`` is set, a second, hedged
+    request is sent when the first has not completed after that long, and the first
+    successful response wins. Hedges are paid for from the retry budget too.
+
+    Transport errors, timeouts and ``5xx`` responses count as failures towards the
+    backend's :class:`CircuitBreaker`; other errors (e.g. ``4xx`` responses) are
+    raised as is.
+
+    Args:
+        name: The name of the backend, used as the metric name prefix.
+        label: The label name of the backend keys (e.g. ``host``, ``network``).
+        max_retries: The maximum number of retries per request.
+        backoff_s: The base of the exponential backoff, in seconds.
+        max_backoff_s: The maximum backoff, in seconds.
+        hedge_after_s: The time to wait before hedging a request, in seconds.
+        budget: The retry budget.
+        breaker: The circuit breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        label: str,
+        max_retries: int = 1,
+        backoff_s: float = 0.1,
+        max_backoff_s: float = 2,
+        hedge_after_s: Optional[float] = None,
+        budget: Optional[RetryBudget] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.label = label
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.hedge_after_s = hedge_after_s
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker(name, label)
+        self._retries = Counter(f"tglib_{name}_retries_total")
+        self._hedges = Counter(f"tglib_{name}_hedges_total")
+
+    @classmethod
+    def from_config(
+        cls, name: str, label: str, params: Dict[str, Any]
+    ) -> "ResiliencePolicy":
+        """Create a policy from the params of a client's config section.
+
+        The optional params are ``max_retries`` (defaults to 1), ``retry_backoff_s``
+        (defaults to 0.1), ``retry_backoff_max_s`` (defaults to 2),
+        ``retry_budget_ratio`` (defaults to 0.2), ``retry_budget_min_per_s``
+        (defaults to 1), ``hedge_after_s`` (disabled by default),
+        ``circuit_failure_threshold`` (defaults to 5) and
+        ``circuit_reset_timeout_s`` (defaults to 30).
+
+        Args:
+            name: The name of the backend, used as the metric name prefix.
+            label: The label name of the backend keys.
+            params: The client config params.
+
+        Raises:
+            ConfigError: One of the params is invalid.
+        """
+        values = {
+            "max_retries": params.get("max_retries", 1),
+            "retry_backoff_s": params.get("retry_backoff_s", 0.1),
+            "retry_backoff_max_s": params.get("retry_backoff_max_s", 2),
+            "retry_budget_ratio": params.get("retry_budget_ratio", 0.2),
+            "retry_budget_min_per_s": params.get("retry_budget_min_per_s", 1),
+            "circuit_failure_threshold": params.get("circuit_failure_threshold", 5),
+            "circuit_reset_timeout_s": params.get("circuit_reset_timeout_s", 30),
+        }
+        hedge_after_s = params.get("hedge_after_s")
+        if hedge_after_s is not None:
+            values["hedge_after_s"] = hedge_after_s
+
+        for key, value in values.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise ConfigError(f"Value for '{key}' is not a number")
+            if value < 0:
+                raise ConfigError(f"Value for '{key}' is negative")
+        if not isinstance(values["max_retries"], int):
+            raise ConfigError("Value for 'max_retries' is not an integer")
+        threshold = values["circuit_failure_threshold"]
+        if not isinstance(threshold, int) or threshold < 1:
+            raise ConfigError(
+                "Value for 'circuit_failure_threshold' is not a positive integer"
+            )
+
+        return cls(
+            name,
+            label,
+            int(values["max_retries"]),
+            values["retry_backoff_s"],
+            values["retry_backoff_max_s"],
+            hedge_after_s,
+            RetryBudget(values["retry_budget_ratio"], values["retry_budget_min_per_s"]),
+            CircuitBreaker(
+                name,
+                label,
+                int(values["circuit_failure_threshold"]),
+                values["circuit_reset_timeout_s"],
+            ),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Return the "full jitter" backoff before a retry, in seconds."""
+        return random.uniform(0, min(self.max_backoff_s, self.backoff_s * 2**attempt))
+
+    async def run(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[T]],
+        idempotent: bool = True,
+        is_failure: Callable[[T], bool] = lambda result: False,
+        transient: Optional[Callable[[ClientRuntimeError], bool]] = None,
+    ) -> T:
+        """Run a request to a backend under the policy.
+
+        Args:
+            key: The backend of the request.
+            func: The coroutine function sending the request, called once per try.
+            idempotent: Whether the request can be retried and hedged.
+            is_failure: Whether a response is a backend failure, e.g. an overload
+                error. Failed responses are retried, and the last one is returned.
+            transient: Whether an error is worth retrying, defaults to
+                :func:`is_transient`. Other errors are raised right away and are not
+                counted as backend failures.
+
+        Returns:
+            The result of ``func``.
+
+        Raises:
+            CircuitOpenError: The circuit of the backend is open.
+            ClientRuntimeError: The request failed.
+        """
+        transient = transient or is_transient
+        self.breaker.check(key)
+        self.budget.deposit()
+
+        attempt = 0
+        while True:
+            error: Optional[ClientRuntimeError] = None
+            try:
+                if idempotent and self.hedge_after_s is not None:
+                    result = await self._hedge(key, func, self.hedge_after_s, transient)
+                else:
+                    result = await func()
+            except ClientRuntimeError as e:
+                if not transient(e):
+                    # The backend is up, but rejected the request
+                    self.breaker.record_success(key)
+                    raise
+                error = e
+            else:
+                if not is_failure(result):
+                    self.breaker.record_success(key)
+                    return result
+
+            self.breaker.record_failure(key)
+            if (
+                not idempotent
+                or attempt >= self.max_retries
+                or not self.budget.withdraw()
+            ):
+                if error is not None:
+                    raise error
+                return result
+
+            self._retries.inc({self.label: key})
+            await asyncio.sleep(self.backoff(attempt))
+            attempt += 1
+            try:
+                self.breaker.check(key)
+            except CircuitOpenError as e:
+                raise e from error
+
+    async def _hedge(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[T]],
+        delay_s: float,
+        transient: Callable[[ClientRuntimeError], bool],
+    ) -> T:
+        """Send a second request if the first is slow, and return the first success."""
+        tasks: List["asyncio.Future[T]"] = [asyncio.ensure_future(func())]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=delay_s)
+            if not done and self.budget.withdraw():
+                self._hedges.inc({self.label: key})
+                tasks.append(asyncio.ensure_future(func()))
+
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    if isinstance(error, ClientRuntimeError) and not transient(error):
+                        # The other try is bound to fail the same way
+                        raise error
+                if not pending:
+                    # Every try failed, raise the error of the first one
+                    return tasks[0].result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+def is_transient(error: ClientRuntimeError) -> bool:
+    """Return whether a client error is worth retrying.
+
+    Args:
+        error: The error raised by a request.
+
+    Returns:
+        True for transport errors, timeouts and ``5xx`` responses.
+    """
+    cause = error.__cause__
+    if isinstance(cause, aiohttp.ClientResponseError):
+        return cause.status >= 500
+    return isinstance(cause, (aiohttp.ClientError, asyncio.TimeoutError))
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import enum
+import functools
+import inspect
+import logging
+import math
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .metrics import Counter, Histogram
+
+
+_durations = Histogram("tglib_scheduler_job_duration_seconds")
+_lateness = Histogram(
+    "tglib_scheduler_job_lateness_seconds",
+    (0.001, 0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+_runs = Counter("tglib_scheduler_job_runs_total")
+
+
+class Timing(enum.Enum):
+    """Enumerate the job timing options.
+
+    Attributes:
+        FIXED_RATE: Runs start every period, regardless of how long each run takes.
+        FIXED_DELAY: Runs start one period after the previous run finished.
+    """
+
+    FIXED_RATE = "fixed_rate"
+    FIXED_DELAY = "fixed_delay"
+
+
+@dataclasses.dataclass
+class Job:
+    """Struct for representing a periodic job and its scheduling options."""
+
+    name: str
+    func: Callable
+    period_s: float
+    timing: Timing = Timing.FIXED_RATE
+    deadline_s: Optional[float] = None
+    jitter_s: float = 0
+    skip_if_running: bool = True
+    executor: Optional[concurrent.futures.Executor] = None
+    params: Dict[str, Any] = dataclasses.field(default_factory=dict)
+    running: Set[asyncio.Future] = dataclasses.field(default_factory=set)
+
+
+def job_options(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Parse the optional scheduling fields of a pipeline configuration.
+
+    Args:
+        config: The pipeline configuration, with optional ``timing``, ``deadline_s``,
+            ``jitter_s`` and ``skip_if_running`` fields.
+
+    Returns:
+        The keyword arguments to :meth:`Scheduler.add_job`.
+
+    Raises:
+        ValueError: The value for ``timing`` is not a :class:`Timing` value.
+    """
+    return {
+        "timing": Timing(config.get("timing", Timing.FIXED_RATE.value)),
+        "deadline_s": config.get("deadline_s"),
+        "jitter_s": config.get("jitter_s", 0),
+        "skip_if_running": config.get("skip_if_running", True),
+    }
+
+
+class Scheduler:
+    """Run jobs periodically and guard against overruns.
+
+    Every job is called with its scheduled start time, in seconds since the epoch,
+    followed by its keyword ``params``. Coroutine functions and plain functions are
+    both supported. Plain functions can be run in a thread or process pool executor
+    so that CPU-bound jobs do not block the event loop.
+
+    A fixed-rate job whose previous run is still going when the next one is due is
+    skipped, unless ``skip_if_running`` is unset. Runs that exceed their deadline are
+    cancelled. Run durations and start lateness are exported as histograms and run
+    outcomes as counters, labeled by job name.
+
+    Args:
+        max_concurrency: The maximum number of runs in progress across all jobs.
+
+    Example:
+        >>> async def count_nodes(start_time: float, network_name: str) -> None:
+        ...     ...
+        >>> scheduler = Scheduler(max_concurrency=5)
+        >>> scheduler.add_job("count_nodes", count_nodes, 60, params={"network_name": "A"})
+        >>> await scheduler.run()
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None) -> None:
+        self.max_concurrency = max_concurrency
+        self.jobs: List[Job] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable,
+        period_s: float,
+        timing: Timing = Timing.FIXED_RATE,
+        deadline_s: Optional[float] = None,
+        jitter_s: float = 0,
+        skip_if_running: bool = True,
+        executor: Optional[concurrent.futures.Executor] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Add a periodic job to the scheduler.
+
+        Args:
+            name: The job name, used in logs and as the ``job`` metric label.
+            func: The function to run, called as ``func(start_time, **params)``.
+            period_s: The time between runs, in seconds.
+            timing: Whether the period is measured between starts or from the end of
+                the previous run.
+            deadline_s: The maximum duration of a run, in seconds.
+            jitter_s: The maximum random delay added to each start, in seconds.
+            skip_if_running: Flag to skip a fixed-rate run while the previous one is
+                still going.
+            executor: The executor to run ``func`` in, if it is a plain function.
+            params: The keyword arguments to pass to ``func``.
+
+        Raises:
+            ValueError: The value for ``period_s``, ``deadline_s`` or ``jitter_s`` is
+                out of range.
+
+        Note:
+            A run in a thread or process pool cannot be interrupted, so exceeding the
+            deadline only stops waiting for its result.
+        """
+        _validate(period_s, deadline_s, jitter_s)
+        self.jobs.append(
+            Job(
+                name,
+                func,
+                period_s,
+                timing,
+                deadline_s,
+                jitter_s,
+                skip_if_running,
+                executor,
+                params or {},
+            )
+        )
+
+    def update_job(
+        self,
+        name: str,
+        period_s: float,
+        timing: Timing = Timing.FIXED_RATE,
+        deadline_s: Optional[float] = None,
+        jitter_s: float = 0,
+        skip_if_running: bool = True,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Change the schedule and params of a job without interrupting its runs.
+
+        The changes apply from the next run, e.g. to reload the configuration of a
+        running service. The arguments are the same as :meth:`add_job`.
+
+        Raises:
+            KeyError: There is no job named ``name``.
+            ValueError: The value for ``period_s``, ``deadline_s`` or ``jitter_s`` is
+                out of range.
+        """
+        _validate(period_s, deadline_s, jitter_s)
+        for job in self.jobs:
+            if job.name == name:
+                job.period_s = period_s
+                job.timing = timing
+                job.deadline_s = deadline_s
+                job.jitter_s = jitter_s
+                job.skip_if_running = skip_if_running
+                job.params = params or {}
+                return
+
+        raise KeyError(f"No job named '{name}'")
+
+    async def run(self) -> None:
+        """Run all of the jobs until cancelled."""
+        if self.max_concurrency is not None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        try:
+            await asyncio.gather(*[self._schedule(job) for job in self.jobs])
+        finally:
+            for job in self.jobs:
+                for future in job.running:
+                    future.cancel()
+
+    async def _schedule(self, job: Job) -> None:
+        """Start runs of ``job`` on time until cancelled."""
+        next_time = time.time()
+        while True:
+            start_time = next_time + random.uniform(0, job.jitter_s)
+            await asyncio.sleep(start_time - time.time())
+
+            if job.timing == Timing.FIXED_DELAY:
+                await self._run(job, next_time, start_time)
+                next_time = time.time() + job.period_s
+                continue
+
+            if job.running and job.skip_if_running:
+                logging.warning(f"Skipping '{job.name}', the previous run is late")
+                _runs.inc({"job": job.name, "status": "skipped"})
+            else:
+                future = asyncio.ensure_future(self._run(job, next_time, start_time))
+                job.running.add(future)
+                future.add_done_callback(job.running.discard)
+
+            # Skip the ticks that were missed entirely (e.g. the loop was blocked)
+            next_time += job.period_s
+            missed = math.floor((time.time() - next_time) / job.period_s)
+            if missed > 0:
+                logging.warning(f"Skipping {missed} run(s) of '{job.name}'")
+                _runs.inc({"job": job.name, "status": "skipped"}, missed)
+                next_time += missed * job.period_s
+
+    async def _run(self, job: Job, scheduled_time: float, start_time: float) -> None:
+        """Run ``job`` once within its deadline and record the outcome."""
+        labels = {"job": job.name}
+        if self._semaphore is None:
+            await self._run_once(job, scheduled_time, start_time, labels)
+        else:
+            async with self._semaphore:
+                await self._run_once(job, scheduled_time, start_time, labels)
+
+    async def _run_once(
+        self, job: Job, scheduled_time: float, start_time: float, labels: Dict
+    ) -> None:
+        _lateness.observe(max(time.time() - start_time, 0), labels)
+        logging.info(f"Starting the '{job.name}' job")
+
+        status = "success"
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._call(job, scheduled_time), job.deadline_s)
+            logging.info(f"Finished running the '{job.name}' job")
+        except asyncio.TimeoutError:
+            status = "timeout"
+            logging.error(
+                f"The '{job.name}' job exceeded its {job.deadline_s}s deadline"
+            )
+        except Exception:
+            status = "error"
+            logging.exception(f"The '{job.name}' job failed")
+
+        _durations.observe(time.monotonic() - start, labels)
+        _runs.inc({**labels, "status": status})
+
+    async def _call(self, job: Job, scheduled_time: float) -> None:
+        if job.executor is not None:
+            loop = asyncio.get_running_loop()
+            func = functools.partial(job.func, scheduled_time, **job.params)
+            await loop.run_in_executor(job.executor, func)
+            return
+
+        result = job.func(scheduled_time, **job.params)
+        if inspect.isawaitable(result):
+            await result
+
+
+def _validate(period_s: float, deadline_s: Optional[float], jitter_s: float) -> None:
+    if period_s <= 0:
+        raise ValueError(f"Job period must be positive: {period_s}")
+    if deadline_s is not None and deadline_s <= 0:
+        raise ValueError(f"Job deadline must be positive: {deadline_s}")
+    if jitter_s < 0:
+        raise ValueError(f"Job jitter cannot be negative: {jitter_s}")
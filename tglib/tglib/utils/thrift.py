@@ -5,12 +5,30 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Callable, Protocol
+from typing import Any, Callable, Dict, Protocol
 
 from thrift.protocol import TBinaryProtocol, TJSONProtocol, TProtocol
+from thrift.Thrift import TType
 from thrift.transport import TTransport
 
 
+try:
+    from thrift.protocol import fastbinary  # noqa: F401
+
+    FASTBINARY_ENABLED = True
+except ImportError:
+    FASTBINARY_ENABLED = False
+
+
+# Reusable protocol factories. The binary factory uses the C ``fastbinary`` codec when
+# it is available and falls back to the pure-Python protocol otherwise.
+binary_protocol_factory = TBinaryProtocol.TBinaryProtocolAcceleratedFactory()
+json_protocol_factory = TJSONProtocol.TJSONProtocolFactory()
+
+# Thrift types whose Python values need converting between thrift and plain objects
+_NESTED_TYPES = {TType.STRUCT, TType.LIST, TType.SET, TType.MAP}
+
+
 class Thrift(Protocol):
     """User-defined protocol class for representing thrift Python objects.
 
@@ -56,7 +74,7 @@ def binary2thrift(base: Callable, serialized: bytes) -> Thrift:
             name="test")
     """
     transport = TTransport.TMemoryBuffer(serialized)
-    protocol = TBinaryProtocol.TBinaryProtocol(transport)
+    protocol = binary_protocol_factory.getProtocol(transport)
     thrift_obj: Thrift = base()
     thrift_obj.read(protocol)
     return thrift_obj
@@ -79,7 +97,7 @@ def json2thrift(base: Callable, serialized: bytes) -> Thrift:
             name="test")
     """
     transport = TTransport.TMemoryBuffer(serialized)
-    protocol = TJSONProtocol.TJSONProtocol(transport)
+    protocol = json_protocol_factory.getProtocol(transport)
     thrift_obj: Thrift = base()
     thrift_obj.read(protocol)
     return thrift_obj
@@ -101,7 +119,7 @@ def thrift2binary(thrift_obj: Thrift) -> bytes:
         b"\\x0b\\x00\\x01\\x00\\x00\\x00\\x04test\\x00"
     """
     transport = TTransport.TMemoryBuffer()
-    protocol = TBinaryProtocol.TBinaryProtocol(transport)
+    protocol = binary_protocol_factory.getProtocol(transport)
     thrift_obj.write(protocol)
     value: bytes = transport.getvalue()
     return value
@@ -123,7 +141,107 @@ def thrift2json(thrift_obj: Thrift) -> bytes:
         b"{'1':{'str':'test'}}"
     """
     transport = TTransport.TMemoryBuffer()
-    protocol = TJSONProtocol.TJSONProtocol(transport)
+    protocol = json_protocol_factory.getProtocol(transport)
     thrift_obj.write(protocol)
     value: bytes = transport.getvalue()
     return value
+
+
+def thrift2dict(thrift_obj: Thrift) -> Dict[str, Any]:
+    """Convert a thrift object into a plain Python dictionary.
+
+    The output is keyed by field name, like the ``TSimpleJSONProtocol`` encoding, but
+    is built directly from the ``thrift_spec`` of the object without serializing to
+    JSON and parsing it back. Unset fields are omitted and sets are converted to lists.
+
+    Args:
+        thrift_obj: A Python thrift object.
+
+    Returns:
+        The thrift object in Python dictionary form.
+
+    Example:
+        >>> node = Node()
+        >>> node.name = "test"
+        >>> thrift2dict(node)
+        {'name': 'test'}
+    """
+    output: Dict[str, Any] = {}
+    for spec in thrift_obj.thrift_spec:  # type: ignore
+        if spec is None:
+            continue
+
+        _, ttype, name, args, _ = spec
+        value = getattr(thrift_obj, name)
+        if value is not None:
+            output[name] = _to_plain(value, ttype, args)
+
+    return output
+
+
+def dict2thrift(base: Callable, data: Dict[str, Any]) -> Thrift:
+    """Convert a plain Python dictionary into a thrift object.
+
+    This is the inverse of :func:`thrift2dict`. Keys that are not fields of ``base``
+    are ignored.
+
+    Args:
+        base: The thrift class type (e.g. ``Node``, ``IperfOptions``).
+        data: The thrift object in Python dictionary form.
+
+    Returns:
+        A thrift object of type ``base`` built from ``data``.
+
+    Example:
+        >>> dict2thrift(Node, {"name": "test"})
+        Node(
+            name="test")
+    """
+    thrift_obj: Thrift = base()
+    for spec in thrift_obj.thrift_spec:  # type: ignore
+        if spec is None:
+            continue
+
+        _, ttype, name, args, _ = spec
+        value = data.get(name)
+        if value is not None:
+            setattr(thrift_obj, name, _from_plain(value, ttype, args))
+
+    return thrift_obj
+
+
+def _to_plain(value: Any, ttype: int, args: Any) -> Any:
+    """Convert a thrift field value into its plain Python form."""
+    if ttype not in _NESTED_TYPES:
+        return value
+    if ttype == TType.STRUCT:
+        return thrift2dict(value)
+    if ttype == TType.MAP:
+        ktype, kargs, vtype, vargs = args[:4]
+        return {
+            _to_plain(k, ktype, kargs): _to_plain(v, vtype, vargs)
+            for k, v in value.items()
+        }
+
+    etype, eargs = args[:2]
+    if etype not in _NESTED_TYPES:
+        return list(value)
+    return [_to_plain(v, etype, eargs) for v in value]
+
+
+def _from_plain(value: Any, ttype: int, args: Any) -> Any:
+    """Convert a plain Python value into its thrift field form."""
+    if ttype not in _NESTED_TYPES:
+        return value
+    if ttype == TType.STRUCT:
+        return dict2thrift(args[0], value)
+    if ttype == TType.MAP:
+        ktype, kargs, vtype, vargs = args[:4]
+        return {
+            _from_plain(k, ktype, kargs): _from_plain(v, vtype, vargs)
+            for k, v in value.items()
+        }
+
+    etype, eargs = args[:2]
+    values = [_from_plain(v, etype, eargs) for v in value]
+    return set(values) if ttype == TType.SET else values
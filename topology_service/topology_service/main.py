@@ -7,104 +7,65 @@
 
 import asyncio
 import copy
-import dataclasses
 import json
 import logging
 import sys
-import time
-from typing import Any, Dict, NoReturn
+from typing import Any, Dict, List
 
 from tglib import init
 from tglib.clients import APIServiceClient, MySQLClient, PrometheusClient
 from tglib.exceptions import ClientRuntimeError
+from tglib.utils.scheduler import Scheduler, job_options
 
 from . import jobs
 from .routes import routes
 
 
-@dataclasses.dataclass
-class Job:
-    """Struct for representing pipeline job configurations."""
-
-    name: str
-    start_time_ms: int
-    params: Dict
-
-
-async def produce(
-    queue: asyncio.Queue, name: str, pipeline: Dict[str, Any]
-) -> NoReturn:
-    """Add jobs from the pipeline configuration to the shared queue."""
+async def run_pipeline(start_time: float, pipeline_jobs: List[Dict[str, Any]]) -> None:
+    """Fetch the latest topologies and run the pipeline jobs with them."""
     client = APIServiceClient(timeout=2)
 
-    while True:
-        start_time = time.time()
-
-        logging.info("Fetching topologies for all networks from API service")
-        topologies = await client.request_all("getTopology", return_exceptions=True)
-        for network_name, topology in list(topologies.items()):
-            if isinstance(topology, ClientRuntimeError):
-                logging.error(f"Failed to fetch topology for {network_name}")
-                del topologies[network_name]
-
-        tasks = [
-            queue.put(
-                Job(
-                    name=job["name"],
-                    start_time_ms=int(round(start_time * 1e3)),
-                    params={
-                        **job.get("params", {}),
-                        "topologies": copy.deepcopy(topologies),
-                    },
-                )
-            )
-            for job in pipeline.get("jobs", [])
-            if job.get("enabled", False)
-        ]
-
-        # Add the jobs to the queue
-        await asyncio.gather(*tasks)
-
-        # Sleep until next invocation period
-        sleep_time = start_time + pipeline["period"] - time.time()
-
-        logging.info(
-            f"Done enqueuing jobs in '{name}'. "
-            f"Added {len(tasks)} job(s) to the queue. Sleeping for {sleep_time}s"
+    logging.info("Fetching topologies for all networks from API service")
+    topologies = await client.request_all("getTopology", return_exceptions=True)
+    for network_name, topology in list(topologies.items()):
+        if isinstance(topology, ClientRuntimeError):
+            logging.error(f"Failed to fetch topology for {network_name}")
+            del topologies[network_name]
+
+    # Every job gets its own copy of the topologies since they may be modified
+    start_time_ms = int(round(start_time * 1e3))
+    coros = [
+        getattr(jobs, job["name"])(
+            start_time_ms,
+            **job.get("params", {}),
+            topologies=copy.deepcopy(topologies),
         )
+        for job in pipeline_jobs
+    ]
 
-        await asyncio.sleep(sleep_time)
-
-
-async def consume(queue: asyncio.Queue) -> NoReturn:
-    """Consume and run a job from the shared queue."""
-    while True:
-        # Wait for a job from the producers
-        job = await queue.get()
-        logging.info(f"Starting the '{job.name}' job")
-
-        # Execute the job
-        function = getattr(jobs, job.name)
-        await function(job.start_time_ms, **job.params)
-        logging.info(f"Finished running the '{job.name}' job")
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    for job, result in zip(pipeline_jobs, results):
+        if isinstance(result, Exception):
+            logging.error(f"The '{job['name']}' job failed", exc_info=result)
 
 
 async def async_main(config: Dict[str, Any]) -> None:
     logging.info("#### Starting the 'topology_service' ####")
     logging.debug(f"service config: {config}")
 
-    q: asyncio.Queue = asyncio.Queue()
-
-    # Create producer coroutines
-    producers = [
-        produce(q, name, pipeline) for name, pipeline in config["pipelines"].items()
-    ]
-
-    # Create consumer coroutines
-    consumers = [consume(q) for _ in range(config["num_consumers"])]
+    scheduler = Scheduler(config["max_concurrent_jobs"])
+    for name, pipeline in config["pipelines"].items():
+        pipeline_jobs = [job for job in pipeline.get("jobs", []) if job.get("enabled")]
+        scheduler.add_job(
+            name,
+            run_pipeline,
+            pipeline["period"],
+            params={"pipeline_jobs": pipeline_jobs},
+            **job_options(pipeline),
+        )
 
-    # Start the producer and consumer coroutines
-    await asyncio.gather(*producers, *consumers)
+    # Run every pipeline on its own period
+    await scheduler.run()
 
 
 def main() -> None: